@@ -1,19 +1,80 @@
 import asyncio
 import logging
-from typing import List
+import os
+import socket
+import time
+import uuid
+import zlib
+from typing import Any, Callable, Dict, List, Optional
 
 from ...domain.entities.integration_event import IntegrationEvent
 from ...domain.services.integration_service import IntegrationService
+from .recent_event_filter import RecentEventFilter
 
 
 class EventHandler:
-    def __init__(self, integration_service: IntegrationService):
+    def __init__(self, integration_service: IntegrationService, max_concurrent_events: int = 10,
+                 batch_size: int = 100, batch_linger_ms: float = 50, queue_max_size: int = 10000,
+                 high_watermark: Optional[int] = None, low_watermark: Optional[int] = None,
+                 durable_queue: bool = False, lease_seconds: float = 300, claim_interval: float = 1.0,
+                 dedup_window: int = 100000):
         self.integration_service = integration_service
+        self.event_repository = integration_service.event_repository
         self.logger = logging.getLogger(__name__)
-        self._processing_queue = asyncio.Queue()
         self._is_processing = False
+        
+        # Carriles ordenados: los eventos de un mismo registro van siempre al mismo
+        # carril y se procesan en serie; carriles distintos avanzan en paralelo
+        self.max_concurrent_events = max(1, max_concurrent_events)
+        
+        # El límite es sobre el total y no por carril: con claves sesgadas un carril
+        # caliente podría llenarse y bloquear la ingesta sin que el total llegue a la
+        # marca alta, y entonces el webhook quedaría colgado en lugar de responder 429
+        self.queue_max_size = max(self.max_concurrent_events, queue_max_size)
+        self._lanes: List[asyncio.Queue] = [asyncio.Queue() for _ in range(self.max_concurrent_events)]
+        self._queue_slots = asyncio.Semaphore(self.queue_max_size)
+        self._workers: List[asyncio.Task] = []
+        self._worker_metrics: Dict[int, Dict[str, Any]] = {}
+        
+        # Micro-lotes: cada worker junta hasta batch_size eventos o espera batch_linger_ms
+        self.batch_size = max(1, batch_size)
+        self.batch_linger = max(0.0, batch_linger_ms) / 1000
+        
+        # Contrapresión con histéresis: se activa al superar la marca alta y no se
+        # libera hasta bajar de la marca baja, para no oscilar alrededor de un umbral
+        self.high_watermark = min(high_watermark or int(self.queue_max_size * 0.8), self.queue_max_size)
+        self.low_watermark = min(low_watermark if low_watermark is not None else self.queue_max_size // 2,
+                                 self.high_watermark)
+        self._backpressure = False
+        self._backpressure_activations = 0
+        self.backpressure_handlers: List[Callable[[bool], None]] = []
+        
+        # Cola persistente: la ingesta escribe en SQLite y un reclamador alimenta los
+        # carriles con filas tomadas bajo lease; un lease vencido vuelve a reclamarse
+        self.durable_queue = durable_queue
+        self.lease_seconds = lease_seconds
+        self.claim_interval = claim_interval
+        self.claim_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._claimer: Optional[asyncio.Task] = None
+        self._lease_heartbeat: Optional[asyncio.Task] = None
+        self._is_claiming = False
+        self._claim_wakeup = asyncio.Event()
+        self._claimed_events = 0
+        # Reclamados que siguen en los carriles o en proceso: solo sus leases se renuevan
+        self._leased_event_ids = set()
+        # El reclamador llena los carriles solo hasta la marca baja: con backlog en la base
+        # no debe activar por sí solo la contrapresión y frenar una ingesta que no existe
+        self.claim_target = max(1, self.low_watermark)
+        
+        # Deduplicación en la ingesta: las reentregas de event_ids recientes se confirman
+        # sin escribir en la base ni llamar a Odoo
+        self.recent_events = RecentEventFilter(max_size=dedup_window)
+        
+        # Eventos ya guardados que vuelven a los carriles en memoria (reintentos vencidos):
+        # se procesan como persistidos para no tomarlos por reentregas duplicadas
+        self._stored_event_ids = set()
     
-    async def handle_event(self, event: IntegrationEvent) -> None:
+    async def handle_event(self, event: IntegrationEvent) -> bool:
         """
         Maneja un evento de integración individual
         """
@@ -27,15 +88,109 @@ class EventHandler:
             else:
                 self.logger.error(f"Failed to handle event {event.event_id}: {result.message}")
             
+            return result.success
+            
         except Exception as e:
             self.logger.error(f"Error handling event {event.event_id}: {str(e)}")
+            return False
+    
+    async def submit_event(self, event: IntegrationEvent) -> bool:
+        """
+        Punto de entrada de la ingesta: persiste el evento en la cola o lo encola en memoria
+        """
+        if self.recent_events.is_duplicate(event.event_id):
+            self.logger.debug(f"Ignored duplicate event {event.event_id}")
+            return True
+        
+        if not self.durable_queue:
+            await self.queue_event(event)
+            self.recent_events.add(event.event_id)
+            return True
+        
+        if not await self.event_repository.enqueue_event(event):
+            return False
+        
+        self.recent_events.add(event.event_id)
+        self._claim_wakeup.set()
+        return True
     
     async def queue_event(self, event: IntegrationEvent) -> None:
         """
         Añade un evento a la cola de procesamiento
         """
-        await self._processing_queue.put(event)
-        self.logger.debug(f"Queued event {event.event_id} for processing")
+        lane = self._get_lane_index(event)
+        # Solo bloquea con la cola entera llena, muy por encima de la marca alta
+        await self._queue_slots.acquire()
+        self._lanes[lane].put_nowait(event)
+        self.logger.debug(f"Queued event {event.event_id} for processing in lane {lane}")
+        
+        self._update_backpressure()
+    
+    async def requeue_events(self, events: List[IntegrationEvent]) -> None:
+        """
+        Devuelve a la cola eventos ya guardados que vuelven a estar pendientes
+        """
+        if self.durable_queue:
+            # Las filas ya están en pending: el reclamador las toma bajo lease
+            self._claim_wakeup.set()
+            return
+        
+        for event in events:
+            self._stored_event_ids.add(event.event_id)
+            await self.queue_event(event)
+    
+    def on_backpressure_changed(self, handler: Callable[[bool], None]) -> None:
+        """
+        Registra un handler que recibe True al activarse la contrapresión y False al liberarse
+        """
+        self.backpressure_handlers.append(handler)
+    
+    def is_backpressured(self) -> bool:
+        """
+        Indica si la cola superó la marca alta y aún no bajó de la marca baja
+        """
+        return self._backpressure
+    
+    def _update_backpressure(self) -> None:
+        """
+        Recalcula el estado de contrapresión y notifica los cambios
+        """
+        queue_size = self.get_queue_size()
+        
+        if not self._backpressure and queue_size >= self.high_watermark:
+            self._backpressure = True
+            self._backpressure_activations += 1
+            self.logger.warning(f"Event queue above high watermark ({queue_size}/{self.queue_max_size}), applying backpressure")
+        elif self._backpressure and queue_size <= self.low_watermark:
+            self._backpressure = False
+            self.logger.info(f"Event queue below low watermark ({queue_size}/{self.queue_max_size}), releasing backpressure")
+        else:
+            return
+        
+        for handler in self.backpressure_handlers:
+            try:
+                handler(self._backpressure)
+            except Exception as e:
+                self.logger.error(f"Error in backpressure handler: {str(e)}")
+    
+    def _get_lane_index(self, event: IntegrationEvent) -> int:
+        """
+        Calcula el carril de un evento a partir de (entity_type, id del registro origen)
+        """
+        key = self._get_record_key(event).encode('utf-8')
+        return zlib.crc32(key) % len(self._lanes)
+    
+    def _get_record_key(self, event: IntegrationEvent) -> str:
+        """
+        Identifica el registro origen de un evento como "entity_type:id"
+        """
+        data = event.payload.data if event.payload and event.payload.data else {}
+        record_key = data.get('id')
+        if record_key is None:
+            # Sin id de origen no hay orden que preservar
+            record_key = event.event_id
+        
+        return f"{event.entity_type.value}:{record_key}"
     
     async def start_processing(self) -> None:
         """
@@ -46,52 +201,272 @@ class EventHandler:
             return
         
         self._is_processing = True
-        self.logger.info("Started event processing")
+        self._workers = [
+            asyncio.create_task(self._worker(worker_id))
+            for worker_id in range(len(self._lanes))
+        ]
+        self.logger.info(f"Started event processing with {len(self._lanes)} ordered lanes")
+        
+        if self.durable_queue:
+            self._is_claiming = True
+            self._claimer = asyncio.create_task(self._claim_loop())
+            self._lease_heartbeat = asyncio.create_task(self._renew_leases())
+            self.logger.info(f"Claiming events from the durable queue as {self.claim_owner}")
+        
+        await asyncio.gather(*self._workers, return_exceptions=True)
+    
+    async def _claim_loop(self) -> None:
+        """
+        Reclama eventos persistidos y los reparte en los carriles hasta la marca baja
+        """
+        while self._is_claiming:
+            self._claim_wakeup.clear()
+            limit = min(self.claim_target - self.get_queue_size(), self.batch_size * len(self._lanes))
+            claimed = []
+            
+            try:
+                if limit > 0:
+                    claimed = await self.event_repository.claim_events(
+                        self.claim_owner, limit=limit, lease_seconds=self.lease_seconds
+                    )
+                    for event in claimed:
+                        # Un lease propio vencido se reclama de nuevo: si el evento sigue en
+                        # un carril no se encola dos veces
+                        if event.event_id in self._leased_event_ids:
+                            continue
+                        self._leased_event_ids.add(event.event_id)
+                        await self.queue_event(event)
+                    self._claimed_events += len(claimed)
+            except Exception as e:
+                self.logger.error(f"Error claiming events: {str(e)}")
+            
+            # Página completa: probablemente quedan más filas pendientes
+            if claimed and len(claimed) == limit:
+                continue
+            
+            try:
+                await asyncio.wait_for(self._claim_wakeup.wait(), timeout=self.claim_interval)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _renew_leases(self) -> None:
+        """
+        Prorroga los leases de lo reclamado mientras espera en los carriles o se procesa
+        """
+        # El lease se toma al pasar la fila al carril, no al empezar a procesarla: sin
+        # renovarlo, un evento que espera más de lease_seconds con Odoo lento vencería
+        # y otro proceso lo aplicaría por segunda vez
+        interval = max(0.1, self.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            if not self._leased_event_ids:
+                continue
+            
+            try:
+                await self.event_repository.extend_leases(
+                    self.claim_owner, list(self._leased_event_ids), lease_seconds=self.lease_seconds
+                )
+            except Exception as e:
+                self.logger.error(f"Error extending event leases: {str(e)}")
+    
+    async def _worker(self, worker_id: int) -> None:
+        """
+        Worker que drena su carril en micro-lotes, respetando el orden de llegada
+        """
+        lane = self._lanes[worker_id]
+        metrics = self._worker_metrics[worker_id] = {
+            'worker_id': worker_id,
+            'processed': 0,
+            'failed': 0,
+            'batches': 0,
+            'busy': False,
+            'current_event_id': None,
+            'total_processing_time': 0.0
+        }
         
         while self._is_processing:
             try:
                 # Esperar por un evento con timeout
-                event = await asyncio.wait_for(self._processing_queue.get(), timeout=1.0)
-                
-                # Procesar el evento
-                await self.handle_event(event)
-                
-                # Marcar la tarea como completada
-                self._processing_queue.task_done()
-                
+                event = await asyncio.wait_for(lane.get(), timeout=1.0)
             except asyncio.TimeoutError:
                 # Timeout normal, continuar el loop
                 continue
+            
+            batch = await self._collect_batch(lane, event)
+            for _ in batch:
+                self._queue_slots.release()
+            self._update_backpressure()
+            
+            metrics['busy'] = True
+            metrics['current_event_id'] = batch[0].event_id
+            metrics['batches'] += 1
+            started_at = time.monotonic()
+            
+            try:
+                # Procesar el lote
+                succeeded = await self._process_batch(batch, persisted=self.durable_queue)
+                metrics['processed'] += succeeded
+                metrics['failed'] += len(batch) - succeeded
             except Exception as e:
-                self.logger.error(f"Error in event processing loop: {str(e)}")
-                await asyncio.sleep(1)  # Esperar antes de continuar
+                metrics['failed'] += len(batch)
+                self.logger.error(f"Error in event worker {worker_id}: {str(e)}")
+            finally:
+                metrics['total_processing_time'] += time.monotonic() - started_at
+                metrics['busy'] = False
+                metrics['current_event_id'] = None
+                # Terminado, con éxito o no: si la fila sigue en processing su lease vence
+                self._leased_event_ids.difference_update(event.event_id for event in batch)
+                
+                # Marcar las tareas como completadas
+                for _ in batch:
+                    lane.task_done()
+                
+                self._update_backpressure()
+    
+    async def _collect_batch(self, lane: asyncio.Queue, first_event: IntegrationEvent) -> List[IntegrationEvent]:
+        """
+        Junta eventos del carril hasta completar batch_size o agotar el tiempo de espera
+        """
+        batch = [first_event]
+        deadline = time.monotonic() + self.batch_linger
+        
+        while len(batch) < self.batch_size:
+            # Lo que ya está en cola se toma sin esperar
+            if not lane.empty():
+                batch.append(lane.get_nowait())
+                continue
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            
+            try:
+                batch.append(await asyncio.wait_for(lane.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        return batch
+    
+    async def _process_batch(self, batch: List[IntegrationEvent], persisted: bool = False) -> int:
+        """
+        Procesa un micro-lote y devuelve cuántos eventos se sincronizaron con éxito
+        """
+        succeeded = 0
+        
+        for segment in self._split_batch(batch):
+            # Dentro de un segmento cada registro aparece una sola vez, así que
+            # los grupos (entity_type, event_type) pueden enviarse en paralelo
+            groups: Dict[tuple, List[IntegrationEvent]] = {}
+            for event in segment:
+                stored = persisted or event.event_id in self._stored_event_ids
+                groups.setdefault((event.entity_type, event.event_type, stored), []).append(event)
+            
+            results = await asyncio.gather(
+                *(self.integration_service.process_integration_events(group, persisted=stored)
+                  for (_, _, stored), group in groups.items()),
+                return_exceptions=True
+            )
+            self._stored_event_ids.difference_update(event.event_id for event in segment)
+            
+            for group, result in zip(groups.values(), results):
+                if isinstance(result, Exception):
+                    self.logger.error(f"Error processing batch of {len(group)} events: {str(result)}")
+                    continue
+                
+                for event in group:
+                    sync_result = result.get(event.event_id)
+                    if sync_result and sync_result.success:
+                        succeeded += 1
+                    else:
+                        self.logger.error(f"Failed to handle event {event.event_id}: "
+                                          f"{sync_result.message if sync_result else 'No result'}")
+        
+        return succeeded
+    
+    def _split_batch(self, batch: List[IntegrationEvent]) -> List[List[IntegrationEvent]]:
+        """
+        Parte un lote en segmentos consecutivos sin registros repetidos
+        """
+        segments: List[List[IntegrationEvent]] = [[]]
+        seen_keys = set()
+        
+        for event in batch:
+            key = self._get_record_key(event)
+            if key in seen_keys:
+                # Un segundo evento del mismo registro debe esperar al anterior
+                segments.append([])
+                seen_keys = set()
+            
+            seen_keys.add(key)
+            segments[-1].append(event)
+        
+        return segments
     
-    async def stop_processing(self) -> None:
+    async def stop_processing(self, drain_timeout: float = 30.0) -> None:
         """
         Detiene el procesamiento de eventos
         """
+        # Dejar de reclamar antes de drenar, o los carriles nunca se vaciarían
+        if self._claimer:
+            self._is_claiming = False
+            self._claim_wakeup.set()
+            await asyncio.gather(self._claimer, return_exceptions=True)
+            self._claimer = None
+        
+        # Esperar a que los workers procesen los eventos pendientes antes de detenerlos
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(lane.join() for lane in self._lanes)),
+                timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Stopping with {self.get_queue_size()} events still queued")
+        
         self._is_processing = False
-        self.logger.info("Stopped event processing")
         
-        # Esperar a que se procesen los eventos pendientes
-        await self._processing_queue.join()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+        
+        # Los leases se renuevan hasta que los workers terminan de drenar
+        if self._lease_heartbeat:
+            self._lease_heartbeat.cancel()
+            await asyncio.gather(self._lease_heartbeat, return_exceptions=True)
+            self._lease_heartbeat = None
+        
+        # Devolver a la cola lo reclamado y no procesado, sin esperar a que venza el lease
+        if self.durable_queue:
+            await self.event_repository.release_events(self.claim_owner)
+            self._leased_event_ids.clear()
+        
+        self.logger.info("Stopped event processing")
     
     async def process_pending_events(self) -> int:
         """
         Procesa eventos pendientes desde el repositorio
         """
-        from ...infrastructure.persistence.event_repository_impl import EventRepositoryImpl
-        
-        event_repo = EventRepositoryImpl()
-        pending_events = await event_repo.get_pending_events(limit=100)
+        if self.durable_queue:
+            # Los pendientes son precisamente lo que el reclamador toma de la cola
+            self._claim_wakeup.set()
+            self.logger.info("Pending events will be claimed from the durable queue")
+            return 0
         
+        # Se recorre todo el backlog por páginas, en micro-lotes y sin cargarlo en memoria
         processed_count = 0
-        for event in pending_events:
-            try:
-                await self.handle_event(event)
-                processed_count += 1
-            except Exception as e:
-                self.logger.error(f"Failed to process pending event {event.event_id}: {str(e)}")
+        batch: List[IntegrationEvent] = []
+        try:
+            async for event in self.event_repository.iter_pending(page_size=self.batch_size):
+                batch.append(event)
+                if len(batch) >= self.batch_size:
+                    await self._process_batch(batch, persisted=True)
+                    processed_count += len(batch)
+                    batch = []
+            
+            if batch:
+                await self._process_batch(batch, persisted=True)
+                processed_count += len(batch)
+        except Exception as e:
+            self.logger.error(f"Failed to process pending events: {str(e)}")
         
         self.logger.info(f"Processed {processed_count} pending events")
         return processed_count
@@ -102,16 +477,10 @@ class EventHandler:
         """
         self.logger.info(f"Handling batch of {len(events)} events")
         
-        tasks = []
-        for event in events:
-            task = asyncio.create_task(self.handle_event(event))
-            tasks.append(task)
-        
-        # Esperar a que se completen todos los eventos
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        success_count = sum(1 for result in results if not isinstance(result, Exception))
-        error_count = len(results) - success_count
+        success_count = 0
+        for offset in range(0, len(events), self.batch_size):
+            success_count += await self._process_batch(events[offset:offset + self.batch_size])
+        error_count = len(events) - success_count
         
         self.logger.info(f"Batch processing complete: {success_count} success, {error_count} errors")
     
@@ -119,7 +488,48 @@ class EventHandler:
         """
         Obtiene el tamaño actual de la cola de procesamiento
         """
-        return self._processing_queue.qsize()
+        return sum(lane.qsize() for lane in self._lanes)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Obtiene las métricas del pool de workers
+        """
+        workers = []
+        for metrics in self._worker_metrics.values():
+            handled = metrics['processed'] + metrics['failed']
+            workers.append({
+                **metrics,
+                'lane_depth': self._lanes[metrics['worker_id']].qsize(),
+                'avg_batch_size': round(handled / metrics['batches'], 2) if metrics['batches'] else 0.0,
+                'avg_processing_time': round(metrics['total_processing_time'] / handled, 4) if handled else 0.0
+            })
+        
+        # El sesgo compara el carril más cargado con la media: ~1.0 indica buen reparto
+        lane_depths = [lane.qsize() for lane in self._lanes]
+        mean_depth = sum(lane_depths) / len(lane_depths)
+        
+        return {
+            'workers': len(self._lanes),
+            'busy_workers': sum(1 for metrics in self._worker_metrics.values() if metrics['busy']),
+            'queue_size': self.get_queue_size(),
+            'queue_max_size': self.queue_max_size,
+            'high_watermark': self.high_watermark,
+            'low_watermark': self.low_watermark,
+            'backpressure': self._backpressure,
+            'backpressure_activations': self._backpressure_activations,
+            'durable_queue': self.durable_queue,
+            'claimed': self._claimed_events,
+            'dedup': self.recent_events.get_metrics(),
+            'lane_depths': lane_depths,
+            'max_lane_depth': max(lane_depths),
+            'lane_skew': round(max(lane_depths) / mean_depth, 2) if mean_depth else 0.0,
+            'processed': sum(metrics['processed'] for metrics in self._worker_metrics.values()),
+            'failed': sum(metrics['failed'] for metrics in self._worker_metrics.values()),
+            'batches': sum(metrics['batches'] for metrics in self._worker_metrics.values()),
+            'batch_size': self.batch_size,
+            'batch_linger_ms': self.batch_linger * 1000,
+            'per_worker': workers
+        }
     
     def is_processing(self) -> bool:
         """
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from typing import Any, Dict
+
+
+class RecentEventFilter:
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        
+        # event_ids recibidos hace poco, en orden LRU; solo evita trabajo, la
+        # autoridad sobre los duplicados es el índice único de la base
+        self._event_ids: "OrderedDict[str, None]" = OrderedDict()
+        
+        self.duplicates = 0
+        self.accepted = 0
+        self.evictions = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+    
+    def is_duplicate(self, event_id: str) -> bool:
+        if event_id not in self._event_ids:
+            return False
+        
+        self._event_ids.move_to_end(event_id)
+        self.duplicates += 1
+        return True
+    
+    def add(self, event_id: str) -> None:
+        self.accepted += 1
+        if not self.enabled:
+            return
+        
+        self._event_ids[event_id] = None
+        self._event_ids.move_to_end(event_id)
+        
+        while len(self._event_ids) > self.max_size:
+            self._event_ids.popitem(last=False)
+            self.evictions += 1
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        received = self.duplicates + self.accepted
+        return {
+            'size': len(self._event_ids),
+            'max_size': self.max_size,
+            'accepted': self.accepted,
+            'duplicates': self.duplicates,
+            'duplicate_rate': round(self.duplicates / received, 4) if received else 0.0,
+            'evictions': self.evictions
+        }
@@ -4,12 +4,17 @@ from typing import Dict, Any, List
 from datetime import datetime, timedelta
 
 from ...domain.entities.integration_event import IntegrationEvent, EntityType
+from ...domain.entities.event_view import EventProjection
 from ...domain.services.integration_service import IntegrationService
+from .event_handler import EventHandler
 
 
 class SyncHandler:
-    def __init__(self, integration_service: IntegrationService):
+    def __init__(self, integration_service: IntegrationService, event_handler: EventHandler,
+                 batch_size: int = 100):
         self.integration_service = integration_service
+        self.event_handler = event_handler
+        self.batch_size = max(1, batch_size)
         self.logger = logging.getLogger(__name__)
     
     async def handle_full_sync(self, entity_type: EntityType, data_batch: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -26,29 +31,31 @@ class SyncHandler:
                 'errors': []
             }
             
-            for data in data_batch:
+            # Los registros se envían en lotes para aprovechar las cargas masivas en Odoo
+            for offset in range(0, len(data_batch), self.batch_size):
+                chunk = data_batch[offset:offset + self.batch_size]
+                sync_events = [self._create_sync_event(entity_type, data) for data in chunk]
+                
                 try:
-                    # Crear evento de sincronización
-                    sync_event = self._create_sync_event(entity_type, data)
+                    batch_results = await self.integration_service.process_integration_events(sync_events)
                     
-                    # Procesar el evento
-                    result = await self.integration_service.process_integration_event(sync_event)
-                    
-                    if result.success:
-                        results['success'] += 1
-                    else:
-                        results['failed'] += 1
-                        results['errors'].append({
-                            'record_id': data.get('id'),
-                            'error': result.message
-                        })
+                    for data, sync_event in zip(chunk, sync_events):
+                        result = batch_results[sync_event.event_id]
+                        if result.success:
+                            results['success'] += 1
+                        else:
+                            results['failed'] += 1
+                            results['errors'].append({
+                                'record_id': data.get('id'),
+                                'error': result.message
+                            })
                         
                 except Exception as e:
-                    results['failed'] += 1
-                    results['errors'].append({
+                    results['failed'] += len(chunk)
+                    results['errors'].extend({
                         'record_id': data.get('id'),
                         'error': str(e)
-                    })
+                    } for data in chunk)
             
             self.logger.info(f"Full sync completed for {entity_type.value}: {results['success']} success, {results['failed']} failed")
             return results
@@ -67,29 +74,23 @@ class SyncHandler:
         Maneja una sincronización incremental desde una fecha específica
         """
         try:
-            from ...infrastructure.persistence.event_repository_impl import EventRepositoryImpl
-            
             self.logger.info(f"Starting incremental sync for {entity_type.value} since {since}")
             
-            event_repo = EventRepositoryImpl()
-            
-            # Obtener eventos desde la fecha especificada
-            all_events = await event_repo.get_events_by_entity_type(entity_type.value, limit=1000)
-            recent_events = [
-                event for event in all_events 
-                if event.timestamp >= since
-            ]
+            event_repo = self.integration_service.event_repository
             
             results = {
-                'total': len(recent_events),
+                'total': 0,
                 'success': 0,
                 'failed': 0,
                 'errors': []
             }
             
-            for event in recent_events:
+            # El filtro por fecha se resuelve en SQL y los eventos llegan por páginas
+            async for event in event_repo.get_events_since(entity_type.value, since):
+                results['total'] += 1
                 try:
-                    result = await self.integration_service.process_integration_event(event)
+                    # Se actualiza en su sitio para no reaparecer más adelante en la iteración
+                    result = await self.integration_service.process_integration_event(event, persisted=True)
                     
                     if result.success:
                         results['success'] += 1
@@ -121,78 +122,71 @@ class SyncHandler:
     
     async def handle_retry_failed_events(self, max_retries: int = 3) -> Dict[str, Any]:
         """
-        Reintenta eventos fallidos
+        Reintenta a demanda los eventos fallidos, sin esperar a que venza su backoff
         """
         try:
-            from ...infrastructure.persistence.event_repository_impl import EventRepositoryImpl
-            
             self.logger.info("Starting retry of failed events")
             
-            event_repo = EventRepositoryImpl()
-            failed_events = await event_repo.get_failed_events(limit=100)
+            event_repo = self.integration_service.event_repository
             
             results = {
-                'total': len(failed_events),
-                'success': 0,
-                'failed': 0,
+                'total': 0,
+                'requeued': 0,
                 'skipped': 0,
                 'errors': []
             }
             
-            for event in failed_events:
-                try:
-                    # Verificar si el evento ha excedido el número máximo de reintentos
-                    retry_count = event.context.retry_count if event.context else 0
-                    
-                    if retry_count >= max_retries:
-                        results['skipped'] += 1
-                        continue
-                    
-                    # Incrementar contador de reintentos
-                    if event.context:
-                        event.context.retry_count += 1
-                    
-                    # Procesar el evento
-                    result = await self.integration_service.process_integration_event(event)
-                    
-                    if result.success:
-                        results['success'] += 1
-                    else:
-                        results['failed'] += 1
-                        results['errors'].append({
-                            'event_id': event.event_id,
-                            'error': result.message
-                        })
-                        
-                except Exception as e:
-                    results['failed'] += 1
-                    results['errors'].append({
-                        'event_id': event.event_id,
-                        'error': str(e)
-                    })
-            
-            self.logger.info(f"Retry completed: {results['success']} success, {results['failed']} failed, {results['skipped']} skipped")
+            # Se recorren todos los fallidos por páginas, no solo los primeros 100. Los que se
+            # reintentan vuelven a pending y los procesa el EventHandler como cualquier otro:
+            # bajo lease con la cola persistente, sin competir con el scheduler ni con otros
+            # procesos por el mismo evento
+            event_ids: List[str] = []
+            async for view in event_repo.iter_failed(projection=EventProjection.METADATA):
+                results['total'] += 1
+                
+                # El contador viene de la columna persistida; al reencolarse se incrementa
+                if view.retry_count >= max_retries:
+                    results['skipped'] += 1
+                    continue
+                
+                event_ids.append(view.event_id)
+                if len(event_ids) >= self.batch_size:
+                    results['requeued'] += await self._requeue_failed(event_ids)
+                    event_ids = []
+            
+            if event_ids:
+                results['requeued'] += await self._requeue_failed(event_ids)
+            
+            self.logger.info(f"Retry requested: {results['requeued']} requeued, {results['skipped']} skipped")
             return results
             
         except Exception as e:
             self.logger.error(f"Error in retry failed events: {str(e)}")
             return {
                 'total': 0,
-                'success': 0,
-                'failed': 0,
+                'requeued': 0,
                 'skipped': 0,
                 'errors': [{'error': str(e)}]
             }
     
+    async def _requeue_failed(self, event_ids: List[str]) -> int:
+        """
+        Devuelve a pending un tramo de fallidos y se los entrega al EventHandler
+        """
+        # Un evento que el scheduler reencoló mientras tanto ya no está en failed y no se
+        # devuelve aquí, así que nunca se encola dos veces
+        requeued = await self.integration_service.event_repository.requeue_failed_events(event_ids)
+        if requeued:
+            await self.event_handler.requeue_events(requeued)
+        return len(requeued)
+    
     async def cleanup_old_events(self, days_old: int = 30) -> int:
         """
         Limpia eventos antiguos del repositorio
         """
         try:
-            from ...infrastructure.persistence.event_repository_impl import EventRepositoryImpl
-            
             cutoff_date = datetime.now() - timedelta(days=days_old)
-            event_repo = EventRepositoryImpl()
+            event_repo = self.integration_service.event_repository
             
             deleted_count = await event_repo.cleanup_old_events(cutoff_date)
             
@@ -1,18 +1,25 @@
 import asyncio
+import concurrent.futures
 import logging
 from typing import Optional, Dict, Any
 from datetime import datetime
 
 from ...domain.entities.integration_event import IntegrationEvent
+from ...domain.entities.event_view import EventProjection
 from ...domain.services.integration_service import IntegrationService
+from ...domain.services.retry_policy import RetryPolicy
 from ...domain.interfaces.signalr_client import ISignalRClient
 from ...domain.interfaces.webhook_client import IWebhookClient
 from ...infrastructure.signalr.signalr_client_impl import SignalRClientImpl
 from ...infrastructure.http.webhook_client import WebhookClientImpl
 from ...infrastructure.odoo.odoo_client import OdooClientImpl
+from ...infrastructure.persistence.event_codec import create_event_codec
 from ...infrastructure.persistence.event_repository_impl import EventRepositoryImpl
+from ...infrastructure.persistence.sqlite_database import SqliteDatabase
+from ...infrastructure.persistence.external_id_repository_impl import ExternalIdRepositoryImpl
 from ..handlers.event_handler import EventHandler
 from ..handlers.sync_handler import SyncHandler
+from .retry_scheduler import RetryScheduler
 
 
 class IntegrationOrchestrator:
@@ -24,16 +31,23 @@ class IntegrationOrchestrator:
         self.signalr_client: Optional[ISignalRClient] = None
         self.webhook_client: Optional[IWebhookClient] = None
         self.odoo_client: Optional[OdooClientImpl] = None
+        self.database: Optional[SqliteDatabase] = None
         self.event_repository: Optional[EventRepositoryImpl] = None
+        self.external_id_repository: Optional[ExternalIdRepositoryImpl] = None
         
         # Servicios y handlers
         self.integration_service: Optional[IntegrationService] = None
         self.event_handler: Optional[EventHandler] = None
         self.sync_handler: Optional[SyncHandler] = None
+        self.retry_scheduler: Optional[RetryScheduler] = None
         
         # Estado
         self.is_running = False
         self._tasks = []
+        self._processing_task: Optional[asyncio.Task] = None
+        self._backpressure_tasks = set()
+        self._signalr_hold_timeout = 30.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
     
     async def initialize(self) -> bool:
         """
@@ -43,17 +57,51 @@ class IntegrationOrchestrator:
             self.logger.info("Initializing Integration Orchestrator")
             
             # Inicializar repositorio de eventos
+            database_config = self.config.get('database', {})
+            
+            # Conexiones SQLite compartidas por todos los repositorios del archivo
+            self.database = SqliteDatabase(
+                db_path=database_config.get('path', 'integration_events.db'),
+                read_pool_size=database_config.get('read_pool_size', 4),
+                pragmas=database_config.get('pragmas')
+            )
+            
+            group_commit_config = database_config.get('group_commit', {})
+            codec_config = database_config.get('event_codec', {})
             self.event_repository = EventRepositoryImpl(
-                db_path=self.config.get('database', {}).get('path', 'integration_events.db')
+                db_path=database_config.get('path', 'integration_events.db'),
+                group_commit_interval_ms=group_commit_config.get('interval_ms', 10),
+                group_commit_max_ops=group_commit_config.get('max_ops', 256),
+                database=self.database,
+                partition_interval=database_config.get('partition_interval', 'week'),
+                codec=create_event_codec(
+                    codec_config.get('format', 'json'),
+                    compress_min_size=codec_config.get('compress_min_size', 4096),
+                    compression_level=codec_config.get('compression_level', 6)
+                )
             )
             
+            # Espejo local de external_ids en la misma base de datos SQLite
+            mirror_config = database_config.get('external_id_mirror', {})
+            if mirror_config.get('enabled', True):
+                self.external_id_repository = ExternalIdRepositoryImpl(
+                    db_path=database_config.get('path', 'integration_events.db'),
+                    database=self.database
+                )
+            
             # Inicializar cliente Odoo
             odoo_config = self.config.get('odoo', {})
             self.odoo_client = OdooClientImpl(
                 url=odoo_config.get('url'),
                 database=odoo_config.get('database'),
                 username=odoo_config.get('username'),
-                password=odoo_config.get('password')
+                password=odoo_config.get('password'),
+                timeout=odoo_config.get('timeout', 30),
+                max_connections=odoo_config.get('max_connections', 20),
+                batch_size=odoo_config.get('batch_size', 500),
+                protocol=odoo_config.get('protocol', 'xmlrpc'),
+                external_id_cache_size=odoo_config.get('external_id_cache', {}).get('max_size', 10000),
+                external_id_cache_ttl=odoo_config.get('external_id_cache', {}).get('ttl', 300)
             )
             
             # Conectar a Odoo
@@ -61,15 +109,53 @@ class IntegrationOrchestrator:
                 self.logger.error("Failed to connect to Odoo")
                 return False
             
+            # Sonda de salud en segundo plano: /status reporta su resultado cacheado
+            monitoring_config = self.config.get('monitoring', {})
+            self.odoo_client.start_health_probe(monitoring_config.get('health_check_interval', 60))
+            
             # Inicializar servicio de integración
+            sync_config = self.config.get('sync', {})
+            retry_policy = RetryPolicy(
+                max_attempts=sync_config.get('retry_attempts', 3),
+                base_delay=sync_config.get('retry_delay', 5),
+                max_delay=sync_config.get('retry_max_delay', 3600),
+                jitter=sync_config.get('retry_jitter', 0.5)
+            )
             self.integration_service = IntegrationService(
                 odoo_repository=self.odoo_client,
-                event_repository=self.event_repository
+                event_repository=self.event_repository,
+                external_id_repository=self.external_id_repository,
+                retry_policy=retry_policy
             )
             
             # Inicializar handlers
-            self.event_handler = EventHandler(self.integration_service)
-            self.sync_handler = SyncHandler(self.integration_service)
+            self.event_handler = EventHandler(
+                self.integration_service,
+                max_concurrent_events=sync_config.get('max_concurrent_events', 10),
+                batch_size=sync_config.get('batch_size', 100),
+                batch_linger_ms=sync_config.get('batch_linger_ms', 50),
+                queue_max_size=sync_config.get('queue_max_size', 10000),
+                high_watermark=sync_config.get('queue_high_watermark'),
+                low_watermark=sync_config.get('queue_low_watermark'),
+                durable_queue=sync_config.get('durable_queue', True),
+                lease_seconds=sync_config.get('lease_seconds', 300),
+                claim_interval=sync_config.get('claim_interval', 1.0),
+                dedup_window=sync_config.get('dedup_window', 100000)
+            )
+            self.event_handler.on_backpressure_changed(self._handle_backpressure_changed)
+            self.sync_handler = SyncHandler(
+                self.integration_service,
+                self.event_handler,
+                batch_size=sync_config.get('batch_size', 100)
+            )
+            self.retry_scheduler = RetryScheduler(
+                self.event_repository,
+                self.event_handler,
+                batch_size=sync_config.get('batch_size', 100),
+                max_idle=retry_policy.base_delay
+            )
+            # Un fallo nuevo puede vencer antes que el próximo reintento conocido
+            self.integration_service.on_retry_scheduled(self.retry_scheduler.wake)
             
             # Inicializar clientes de comunicación
             await self._initialize_communication_clients()
@@ -88,7 +174,8 @@ class IntegrationOrchestrator:
         # Inicializar cliente SignalR si está configurado
         signalr_config = self.config.get('signalr')
         if signalr_config and signalr_config.get('enabled', False):
-            self.signalr_client = SignalRClientImpl()
+            self._signalr_hold_timeout = signalr_config.get('hold_timeout', 30)
+            self.signalr_client = SignalRClientImpl(hold_timeout=self._signalr_hold_timeout)
             self.signalr_client.on_event_received(self._handle_signalr_event)
             self.signalr_client.on_connection_error(self._handle_signalr_error)
             self.signalr_client.on_disconnected(self._handle_signalr_disconnected)
@@ -96,8 +183,10 @@ class IntegrationOrchestrator:
         # Inicializar cliente Webhook si está configurado
         webhook_config = self.config.get('webhook')
         if webhook_config and webhook_config.get('enabled', False):
-            self.webhook_client = WebhookClientImpl()
+            self.webhook_client = WebhookClientImpl(retry_after=webhook_config.get('retry_after', 5))
             self.webhook_client.on_event_received(self._handle_webhook_event)
+            self.webhook_client.on_status_requested(self.get_status)
+            self.webhook_client.on_backpressure_check(self.event_handler.is_backpressured)
     
     async def start(self) -> None:
         """
@@ -111,6 +200,10 @@ class IntegrationOrchestrator:
             self.logger.info("Starting Integration Orchestrator")
             self.is_running = True
             
+            # Los callbacks de SignalR llegan desde el hilo de signalrcore y deben
+            # reenviarse a este loop
+            self._loop = asyncio.get_running_loop()
+            
             # Inicializar si no se ha hecho
             if not self.integration_service:
                 if not await self.initialize():
@@ -118,8 +211,11 @@ class IntegrationOrchestrator:
             
             # Iniciar procesamiento de eventos
             if self.event_handler:
-                task = asyncio.create_task(self.event_handler.start_processing())
-                self._tasks.append(task)
+                self._processing_task = asyncio.create_task(self.event_handler.start_processing())
+            
+            # Devolver a la cola los fallidos cuyo backoff venció
+            if self.retry_scheduler:
+                self.retry_scheduler.start()
             
             # Conectar cliente SignalR
             if self.signalr_client:
@@ -144,6 +240,14 @@ class IntegrationOrchestrator:
                 self._tasks.append(task)
                 self.logger.info(f"Webhook server started on {host}:{port}")
             
+            # Precargar el espejo de external_ids sin bloquear el arranque
+            mirror_config = self.config.get('database', {}).get('external_id_mirror', {})
+            if self.external_id_repository and mirror_config.get('warm_on_startup', True):
+                task = asyncio.create_task(self.integration_service.warm_external_id_mirror(
+                    mirror_config.get('warm_modules', ['__import__'])
+                ))
+                self._tasks.append(task)
+            
             # Procesar eventos pendientes
             if self.event_handler:
                 await self.event_handler.process_pending_events()
@@ -167,20 +271,16 @@ class IntegrationOrchestrator:
             self.logger.info("Stopping Integration Orchestrator")
             self.is_running = False
             
-            # Detener procesamiento de eventos
-            if self.event_handler:
-                await self.event_handler.stop_processing()
-            
-            # Desconectar cliente SignalR
+            # Primero se corta la ingesta: un evento aceptado después de cerrar la base
+            # reabriría el writer, y en memoria quedaría en carriles sin workers
             if self.signalr_client:
                 await self.signalr_client.stop_listening()
                 await self.signalr_client.disconnect()
             
-            # Detener servidor webhook
             if self.webhook_client:
                 await self.webhook_client.stop_server()
             
-            # Cancelar tareas en ejecución
+            # Cancelar tareas en ejecución (servidor webhook, precarga del espejo)
             for task in self._tasks:
                 if not task.done():
                     task.cancel()
@@ -191,6 +291,25 @@ class IntegrationOrchestrator:
             
             self._tasks.clear()
             
+            # Sin nuevos reintentos mientras se drena la cola
+            if self.retry_scheduler:
+                await self.retry_scheduler.stop()
+            
+            # Detener procesamiento de eventos
+            if self.event_handler:
+                await self.event_handler.stop_processing()
+            
+            if self._processing_task:
+                await asyncio.gather(self._processing_task, return_exceptions=True)
+                self._processing_task = None
+            
+            # Confirmar las escrituras que queden en el group commit
+            if self.event_repository:
+                await self.event_repository.close()
+            
+            if self.database:
+                await self.database.close()
+            
             # Desconectar de Odoo
             if self.odoo_client:
                 await self.odoo_client.disconnect()
@@ -206,17 +325,67 @@ class IntegrationOrchestrator:
         """
         self.logger.debug(f"Received SignalR event: {event.event_id}")
         
-        if self.event_handler:
-            asyncio.create_task(self.event_handler.queue_event(event))
+        if not (self.event_handler and self._loop):
+            return
+        
+        future = asyncio.run_coroutine_threadsafe(self.event_handler.submit_event(event), self._loop)
+        future.add_done_callback(lambda done: self._log_signalr_submit(event, done))
+        
+        # El hilo de signalrcore espera (con límite) a que el evento quede encolado: con la
+        # cola llena deja de leer del socket y la entrega se frena en lugar de acumularse
+        try:
+            future.result(timeout=self._signalr_hold_timeout)
+        except concurrent.futures.TimeoutError:
+            self.logger.warning(f"SignalR event {event.event_id} still waiting to be queued after "
+                                f"{self._signalr_hold_timeout}s")
+        except Exception:
+            # Ya registrado por el callback
+            pass
+    
+    def _log_signalr_submit(self, event: IntegrationEvent, future: concurrent.futures.Future) -> None:
+        """
+        Registra los eventos de SignalR que no pudieron encolarse
+        """
+        if future.cancelled():
+            self.logger.error(f"Submission of SignalR event {event.event_id} was cancelled")
+        elif future.exception():
+            self.logger.error(f"Failed to submit SignalR event {event.event_id}: {str(future.exception())}")
+        elif not future.result():
+            self.logger.error(f"Failed to enqueue SignalR event {event.event_id}")
     
-    def _handle_webhook_event(self, event: IntegrationEvent) -> None:
+    async def _handle_webhook_event(self, event: IntegrationEvent) -> None:
         """
         Maneja eventos recibidos via Webhook
         """
         self.logger.debug(f"Received Webhook event: {event.event_id}")
         
-        if self.event_handler:
-            asyncio.create_task(self.event_handler.queue_event(event))
+        # Se espera a la escritura en la cola para confirmar al emisor solo lo persistido
+        if self.event_handler and not await self.event_handler.submit_event(event):
+            raise Exception(f"Failed to enqueue event {event.event_id}")
+    
+    def _handle_backpressure_changed(self, active: bool) -> None:
+        """
+        Pausa el consumo de SignalR mientras la cola está saturada
+        """
+        if not self.signalr_client:
+            return
+        
+        if active:
+            task = asyncio.create_task(self.signalr_client.pause_listening())
+        else:
+            task = asyncio.create_task(self.signalr_client.resume_listening())
+        
+        # Se guarda la referencia hasta que termina: el loop solo guarda referencias débiles
+        self._backpressure_tasks.add(task)
+        task.add_done_callback(self._backpressure_task_done)
+    
+    def _backpressure_task_done(self, task: asyncio.Task) -> None:
+        """
+        Libera la referencia de la tarea y registra si falló
+        """
+        self._backpressure_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            self.logger.error(f"Error toggling SignalR consumption: {str(task.exception())}")
     
     def _handle_signalr_error(self, error: str) -> None:
         """
@@ -245,15 +414,28 @@ class IntegrationOrchestrator:
         
         if self.signalr_client:
             status['signalr_connected'] = await self.signalr_client.is_connected()
+            status['signalr_paused'] = self.signalr_client.is_paused()
         
         if self.webhook_client:
             status['webhook_running'] = self.webhook_client.is_running()
         
         if self.odoo_client:
             status['odoo_connected'] = await self.odoo_client.is_connected()
+            status['odoo_connection'] = self.odoo_client.get_connection_status()
+            status['external_id_cache'] = self.odoo_client.get_cache_metrics()
+        
+        if self.event_repository:
+            status['event_store'] = self.event_repository.get_metrics()
+            # Solo metadatos: el estado no necesita decodificar el payload
+            oldest_pending = await self.event_repository.get_pending_events(limit=1, projection=EventProjection.METADATA)
+            status['event_store']['oldest_pending_at'] = oldest_pending[0].timestamp.isoformat() if oldest_pending else None
         
         if self.event_handler:
             status['queue_size'] = self.event_handler.get_queue_size()
+            status['event_processing'] = self.event_handler.get_metrics()
+        
+        if self.retry_scheduler:
+            status['retry_scheduler'] = self.retry_scheduler.get_metrics()
         
         return status
     
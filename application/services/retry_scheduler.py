@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ...domain.interfaces.event_repository import IEventRepository
+from ..handlers.event_handler import EventHandler
+
+
+class RetryScheduler:
+    def __init__(self, event_repository: IEventRepository, event_handler: EventHandler,
+                 batch_size: int = 100, max_idle: float = 5.0):
+        self.event_repository = event_repository
+        self.event_handler = event_handler
+        self.batch_size = max(1, batch_size)
+        # Un fallo nuevo puede vencer antes que el próximo conocido, así que el
+        # scheduler nunca duerme más de max_idle segundos seguidos
+        self.max_idle = max(0.1, max_idle)
+        self.logger = logging.getLogger(__name__)
+        
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._next_retry_at: Optional[datetime] = None
+        self._requeued_events = 0
+        self._cycles = 0
+    
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+        self.logger.info("Retry scheduler started")
+    
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self.logger.info("Retry scheduler stopped")
+    
+    def wake(self) -> None:
+        """
+        Fuerza una revisión inmediata de los reintentos vencidos
+        """
+        self._wakeup.set()
+    
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            self._cycles += 1
+            requeued = []
+            
+            try:
+                requeued = await self.event_repository.requeue_due_retries(limit=self.batch_size)
+                if requeued:
+                    self._requeued_events += len(requeued)
+                    self.logger.info(f"Requeued {len(requeued)} failed events for retry")
+                    # Solo los reencolados: recorrer todos los pendientes volvería a aplicar los
+                    # que ya esperan en los carriles o se están procesando
+                    await self.event_handler.requeue_events(requeued)
+            except Exception as e:
+                self.logger.error(f"Error requeuing failed events: {str(e)}")
+            
+            # Lote completo: probablemente quedan más vencidos
+            if len(requeued) >= self.batch_size:
+                continue
+            
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=await self._seconds_until_next_retry())
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _seconds_until_next_retry(self) -> float:
+        self._next_retry_at = await self.event_repository.get_next_retry_at()
+        if self._next_retry_at is None:
+            return self.max_idle
+        
+        # Con un vencido que no se pudo reencolar se espera al menos un segundo
+        seconds = (self._next_retry_at - datetime.now()).total_seconds()
+        return min(self.max_idle, max(1.0, seconds))
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'running': bool(self._task and not self._task.done()),
+            'cycles': self._cycles,
+            'requeued_events': self._requeued_events,
+            'next_retry_at': self._next_retry_at.isoformat() if self._next_retry_at else None
+        }
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de serialización de eventos para el almacén SQLite
+
+Compara el esquema anterior (tres columnas con json.dumps(__dict__) y tres json.loads al
+leer) con los codecs de event_codec sobre un único blob, con y sin compresión, para un
+payload pequeño y otro grande.
+
+Uso:
+    python benchmarks/bench_event_codec.py --events 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+import types
+from pathlib import Path
+
+# Los módulos del repositorio usan imports relativos entre capas, así que el repositorio
+# se registra como paquete para poder importarlos desde un script suelto
+adapter = types.ModuleType('adapter')
+adapter.__path__ = [str(Path(__file__).resolve().parent.parent)]
+sys.modules['adapter'] = adapter
+
+from adapter.domain.entities.integration_event import IntegrationEvent, SourceSystem, Payload, Context
+from adapter.infrastructure.persistence import event_codec
+from adapter.infrastructure.persistence.event_codec import JsonEventCodec, create_event_codec
+
+
+def build_event(index: int, lines: int) -> IntegrationEvent:
+    # Sin metadata ni header: el esquema anterior no puede serializar esos dataclasses
+    return IntegrationEvent.from_dict({
+        'event_type': 'Update',
+        'entity_type': 'Invoice',
+        'event_id': f"evt-{index:08d}",
+        'timestamp': '2024-05-01T12:30:45Z',
+        'source_system': {'erp_name': 'erp', 'instance_id': '1'},
+        'payload': {'data': {
+            'id': index,
+            'partner_id': 42,
+            'invoice_date': '2024-05-01',
+            'lines': [
+                {'product_id': line, 'quantity': 2, 'price_unit': 10.5, 'name': f"Producto {line}"}
+                for line in range(lines)
+            ]
+        }},
+        'context': {'retry_count': 0}
+    })
+
+
+class LegacyCodec:
+    """
+    Reproduce el acceso anterior: una columna JSON por parte del evento
+    """
+    
+    def encode(self, event: IntegrationEvent) -> tuple:
+        return (
+            json.dumps(event.source_system.__dict__) if event.source_system else None,
+            json.dumps(event.payload.__dict__) if event.payload else None,
+            json.dumps(event.context.__dict__) if event.context else None
+        )
+    
+    def decode(self, columns: tuple, event: IntegrationEvent) -> IntegrationEvent:
+        source_system, payload, context = columns
+        return IntegrationEvent(
+            event_type=event.event_type,
+            entity_type=event.entity_type,
+            event_id=event.event_id,
+            timestamp=event.timestamp,
+            source_system=SourceSystem(**json.loads(source_system)) if source_system else None,
+            payload=Payload(**json.loads(payload)) if payload else None,
+            context=Context(**json.loads(context)) if context else None
+        )
+    
+    @staticmethod
+    def size(columns: tuple) -> int:
+        return sum(len(column.encode('utf-8')) for column in columns if column)
+
+
+class StdlibJsonCodec(JsonEventCodec):
+    """
+    Codec json forzando la biblioteca estándar, para aislar la ganancia de orjson
+    """
+    
+    def dumps(self, value):
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    
+    def loads(self, data):
+        return json.loads(data)
+
+
+class BlobCodec:
+    def __init__(self, codec):
+        self.codec = codec
+    
+    def encode(self, event: IntegrationEvent) -> bytes:
+        return self.codec.encode(event)
+    
+    def decode(self, blob: bytes, event: IntegrationEvent) -> IntegrationEvent:
+        return self.codec.decode_event(
+            blob, event.event_type.value, event.entity_type.value, event.event_id, event.timestamp.isoformat()
+        )
+    
+    @staticmethod
+    def size(blob: bytes) -> int:
+        return len(blob)
+
+
+def measure(label: str, codec, events: list) -> None:
+    started_at = time.perf_counter()
+    encoded = [codec.encode(event) for event in events]
+    encode_time = time.perf_counter() - started_at
+    
+    started_at = time.perf_counter()
+    for value, event in zip(encoded, events):
+        codec.decode(value, event)
+    decode_time = time.perf_counter() - started_at
+    
+    mean_size = sum(codec.size(value) for value in encoded) / len(encoded)
+    print(f"  {label:<28} encode {encode_time / len(events) * 1e6:8.2f} us   "
+          f"decode {decode_time / len(events) * 1e6:8.2f} us   {mean_size:9.0f} bytes")
+
+
+def run(events_count: int) -> None:
+    codecs = [
+        ('json.dumps(__dict__) x3', LegacyCodec()),
+        ('json (stdlib)', BlobCodec(StdlibJsonCodec(compress_min_size=0))),
+        ('json (stdlib) + zlib', BlobCodec(StdlibJsonCodec(compress_min_size=1)))
+    ]
+    if event_codec.orjson is not None:
+        codecs.append(('json (orjson)', BlobCodec(create_event_codec('json', compress_min_size=0))))
+        codecs.append(('json (orjson) + zlib', BlobCodec(create_event_codec('json', compress_min_size=1))))
+    else:
+        print("orjson not installed: skipping orjson codec")
+    if event_codec.msgpack is not None:
+        codecs.append(('msgpack', BlobCodec(create_event_codec('msgpack', compress_min_size=0))))
+        codecs.append(('msgpack + zlib', BlobCodec(create_event_codec('msgpack', compress_min_size=1))))
+    else:
+        print("msgpack not installed: skipping msgpack codec")
+    
+    for label, lines in (('small payload', 1), ('large payload', 200)):
+        events = [build_event(index, lines) for index in range(events_count if lines == 1 else events_count // 20)]
+        print(f"\n[{label}: {len(events)} events]")
+        for codec_label, codec in codecs:
+            measure(codec_label, codec, events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Integration event codec micro-benchmark")
+    parser.add_argument('--events', type=int, default=20000, help="Eventos con payload pequeño (los grandes son 1/20)")
+    args = parser.parse_args()
+    
+    run(args.events)
+
+
+if __name__ == "__main__":
+    main()
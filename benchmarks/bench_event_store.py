@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia por operación del almacén de eventos SQLite
+
+Compara el esquema anterior (una conexión aiosqlite nueva y un commit por operación,
+con los pragmas por defecto) con EventRepositoryImpl sobre conexiones persistentes,
+perfil de pragmas y group commit.
+
+Uso:
+    python benchmarks/bench_event_store.py --events 500 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+from pathlib import Path
+
+import aiosqlite
+
+# Los repositorios usan imports relativos entre capas, así que el repositorio se
+# registra como paquete para poder importarlos desde un script suelto
+adapter = types.ModuleType('adapter')
+adapter.__path__ = [str(Path(__file__).resolve().parent.parent)]
+sys.modules['adapter'] = adapter
+
+from adapter.domain.entities.integration_event import IntegrationEvent
+from adapter.infrastructure.persistence.event_repository_impl import EventRepositoryImpl
+from adapter.infrastructure.persistence.sqlite_database import SqliteDatabase
+
+
+def build_events(count: int) -> list:
+    return [
+        IntegrationEvent.from_dict({
+            'event_type': 'Update',
+            'entity_type': 'Product',
+            'event_id': f"evt-{index:08d}",
+            'timestamp': '2024-05-01T12:30:45Z',
+            'source_system': {'erp_name': 'erp', 'instance_id': '1'},
+            'payload': {'data': {'id': index, 'name': f"Producto {index}", 'list_price': 10.5}}
+        })
+        for index in range(count)
+    ]
+
+
+class ConnectionPerCallStore:
+    """
+    Reproduce el acceso anterior: aiosqlite.connect() y commit en cada operación
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # Con un commit por conexión los escritores concurrentes esperan el lock del archivo
+        self.timeout = 60
+    
+    async def initialize(self):
+        async with aiosqlite.connect(self.db_path, timeout=self.timeout) as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS integration_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_id TEXT UNIQUE NOT NULL,
+                    event_type TEXT NOT NULL,
+                    entity_type TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    source_system TEXT,
+                    payload TEXT,
+                    context TEXT,
+                    status TEXT DEFAULT 'pending',
+                    error_message TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            await db.commit()
+    
+    async def save_event(self, event: IntegrationEvent):
+        now = datetime.now().isoformat()
+        async with aiosqlite.connect(self.db_path, timeout=self.timeout) as db:
+            await db.execute("""
+                INSERT OR REPLACE INTO integration_events
+                (event_id, event_type, entity_type, timestamp, source_system, payload, context, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                event.event_id, event.event_type.value, event.entity_type.value, event.timestamp.isoformat(),
+                json.dumps(event.source_system.__dict__), json.dumps(event.payload.__dict__), None,
+                'pending', now, now
+            ))
+            await db.commit()
+    
+    async def get_event_by_id(self, event_id: str):
+        async with aiosqlite.connect(self.db_path, timeout=self.timeout) as db:
+            cursor = await db.execute("SELECT * FROM integration_events WHERE event_id = ?", (event_id,))
+            return await cursor.fetchone()
+    
+    async def mark_event_as_processed(self, event_id: str):
+        async with aiosqlite.connect(self.db_path, timeout=self.timeout) as db:
+            await db.execute("""
+                UPDATE integration_events SET status = ?, updated_at = ? WHERE event_id = ?
+            """, ('processed', datetime.now().isoformat(), event_id))
+            await db.commit()
+    
+    async def close(self):
+        pass
+
+
+async def measure_sequential(store, events: list) -> dict:
+    """
+    Latencia de cada operación esperada de a una
+    """
+    timings = {'save_event': [], 'get_event_by_id': [], 'mark_event_as_processed': []}
+    
+    for event in events:
+        started_at = time.perf_counter()
+        await store.save_event(event)
+        timings['save_event'].append(time.perf_counter() - started_at)
+    
+    for event in events:
+        started_at = time.perf_counter()
+        await store.get_event_by_id(event.event_id)
+        timings['get_event_by_id'].append(time.perf_counter() - started_at)
+    
+    for event in events:
+        started_at = time.perf_counter()
+        await store.mark_event_as_processed(event.event_id)
+        timings['mark_event_as_processed'].append(time.perf_counter() - started_at)
+    
+    return timings
+
+
+async def measure_concurrent(store, events: list, concurrency: int) -> float:
+    """
+    Eventos por segundo guardando con varias escrituras en vuelo, como los workers
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def save(event: IntegrationEvent):
+        async with semaphore:
+            await store.save_event(event)
+    
+    started_at = time.perf_counter()
+    await asyncio.gather(*(save(event) for event in events))
+    return len(events) / (time.perf_counter() - started_at)
+
+
+def report(label: str, timings: dict, throughput: float) -> None:
+    print(f"\n[{label}]")
+    for operation, samples in timings.items():
+        samples_ms = sorted(sample * 1000 for sample in samples)
+        p99 = samples_ms[int(len(samples_ms) * 0.99) - 1]
+        print(f"  {operation:<26} mean {statistics.mean(samples_ms):8.3f} ms   p99 {p99:8.3f} ms")
+    print(f"  {'concurrent save_event':<26} {throughput:10.0f} events/s")
+
+
+async def run(events_count: int, concurrency: int) -> None:
+    events = build_events(events_count)
+    concurrent_events = build_events(events_count * 2)[events_count:]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        before = ConnectionPerCallStore(str(Path(directory) / 'before.db'))
+        await before.initialize()
+        report('connection per call', await measure_sequential(before, events),
+               await measure_concurrent(before, concurrent_events, concurrency))
+        
+        # Con la configuración de producción, group commit incluido: la latencia en serie
+        # debe incluir lo que espere cada escritura antes de confirmarse
+        db_path = str(Path(directory) / 'after.db')
+        database = SqliteDatabase(db_path)
+        after = EventRepositoryImpl(db_path, database=database)
+        sequential = await measure_sequential(after, events)
+        throughput = await measure_concurrent(after, concurrent_events, concurrency)
+        await after.close()
+        await database.close()
+        
+        report('persistent connections + pragmas', sequential, throughput)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite event store per-operation latency benchmark")
+    parser.add_argument('--events', type=int, default=500, help="Eventos por medición")
+    parser.add_argument('--concurrency', type=int, default=50, help="Escrituras concurrentes en la medición de throughput")
+    args = parser.parse_args()
+    
+    asyncio.run(run(args.events, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
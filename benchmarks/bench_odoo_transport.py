@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización XML-RPC vs JSON-RPC para lecturas de product.template
+
+Mide el coste de codificar la petición search_read, decodificar la respuesta y el
+tamaño de ambos payloads, sin tráfico de red.
+
+Uso:
+    python benchmarks/bench_odoo_transport.py --records 1000 --repeat 20
+"""
+
+import argparse
+import json
+import sys
+import timeit
+import xmlrpc.client
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from infrastructure.odoo.xmlrpc_transport import AsyncXmlRpcTransport
+from infrastructure.odoo.jsonrpc_transport import AsyncJsonRpcTransport
+
+
+PRODUCT_FIELDS = [
+    'id', 'name', 'default_code', 'barcode', 'list_price', 'standard_price',
+    'active', 'categ_id', 'description', 'weight', 'volume', 'write_date',
+    'product_variant_ids'
+]
+
+
+def build_product_records(count: int) -> list:
+    """
+    Genera registros representativos de un search_read sobre product.template
+    """
+    return [
+        {
+            'id': record_id,
+            'name': f"Producto de prueba {record_id}",
+            'default_code': f"SKU-{record_id:08d}",
+            'barcode': f"{7590000000000 + record_id}",
+            'list_price': round(10 + record_id * 0.37, 2),
+            'standard_price': round(6 + record_id * 0.21, 2),
+            'active': record_id % 17 != 0,
+            'categ_id': [record_id % 40 + 1, f"All / Saleable / Categoría {record_id % 40}"],
+            'description': False if record_id % 3 else f"Descripción larga del producto {record_id} " * 3,
+            'weight': 0.25,
+            'volume': 0.0,
+            'write_date': '2024-05-01 12:30:45',
+            'product_variant_ids': [record_id * 10 + offset for offset in range(3)]
+        }
+        for record_id in range(1, count + 1)
+    ]
+
+
+def encode_xmlrpc_response(records: list) -> bytes:
+    return xmlrpc.client.dumps((records,), methodresponse=True, allow_none=True).encode('utf-8')
+
+
+def encode_jsonrpc_response(records: list) -> bytes:
+    return json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': records}, separators=(',', ':')).encode('utf-8')
+
+
+def measure(label: str, function, repeat: int) -> float:
+    elapsed = min(timeit.repeat(function, number=1, repeat=repeat))
+    print(f"  {label:<28} {elapsed * 1000:10.3f} ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XML-RPC vs JSON-RPC serialization benchmark")
+    parser.add_argument('--records', type=int, default=1000, help="Registros por respuesta search_read")
+    parser.add_argument('--repeat', type=int, default=20, help="Repeticiones por medición (se toma el mínimo)")
+    args = parser.parse_args()
+    
+    records = build_product_records(args.records)
+    request_args = (
+        'odoo_db', 2, 'password', 'product.template', 'search_read',
+        [[('active', '=', True)]], {'fields': PRODUCT_FIELDS, 'limit': args.records}
+    )
+    
+    transports = {
+        'xmlrpc': (AsyncXmlRpcTransport('http://localhost:8069'), encode_xmlrpc_response),
+        'jsonrpc': (AsyncJsonRpcTransport('http://localhost:8069'), encode_jsonrpc_response)
+    }
+    
+    print(f"product.template search_read: {args.records} records, best of {args.repeat}")
+    
+    summary = {}
+    for name, (transport, encode_response) in transports.items():
+        request_body = transport.encode_call('object', 'execute_kw', request_args)
+        response_body = encode_response(records)
+        
+        # Verificar que el transporte decodifica exactamente los registros originales
+        assert transport.decode_response(response_body) == records
+        
+        print(f"\n[{name}]")
+        encode_time = measure('encode request', lambda: transport.encode_call('object', 'execute_kw', request_args), args.repeat)
+        decode_time = measure('decode response', lambda: transport.decode_response(response_body), args.repeat)
+        print(f"  {'request size':<28} {len(request_body):10d} bytes")
+        print(f"  {'response size':<28} {len(response_body):10d} bytes")
+        
+        summary[name] = (encode_time, decode_time, len(response_body))
+    
+    xml_encode, xml_decode, xml_size = summary['xmlrpc']
+    json_encode, json_decode, json_size = summary['jsonrpc']
+    print("\n[jsonrpc vs xmlrpc]")
+    print(f"  {'encode speedup':<28} {xml_encode / json_encode:10.2f}x")
+    print(f"  {'decode speedup':<28} {xml_decode / json_decode:10.2f}x")
+    print(f"  {'response size ratio':<28} {json_size / xml_size:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Optional, Union
+
+from .integration_event import IntegrationEvent, EventType, EntityType, SourceSystem, Payload, Context
+
+
+class EventProjection(Enum):
+    EVENT = "event"  # IntegrationEvent completo, decodificado al leer
+    VIEW = "view"  # EventView: metadatos al leer, cuerpo decodificado al primer acceso
+    METADATA = "metadata"  # EventView sin cuerpo: ni se lee ni se decodifica
+
+
+class EventView:
+    """
+    Fila del almacén de eventos con los metadatos ya disponibles y el cuerpo
+    (origen, payload y contexto) decodificado solo cuando se pide
+    """
+    __slots__ = ('event_id', 'event_type', 'entity_type', 'timestamp', 'status', 'retry_count',
+                 'last_error', 'next_attempt_at', '_loader', '_event')
+    
+    def __init__(self, event_id: str, event_type: EventType, entity_type: EntityType, timestamp: datetime,
+                 status: str, retry_count: int = 0, last_error: Optional[str] = None,
+                 next_attempt_at: Optional[datetime] = None,
+                 loader: Optional[Callable[[], IntegrationEvent]] = None):
+        self.event_id = event_id
+        self.event_type = event_type
+        self.entity_type = entity_type
+        self.timestamp = timestamp
+        self.status = status
+        self.retry_count = retry_count
+        self.last_error = last_error
+        self.next_attempt_at = next_attempt_at
+        self._loader = loader
+        self._event: Optional[IntegrationEvent] = None
+    
+    @property
+    def has_body(self) -> bool:
+        return self._event is not None or self._loader is not None
+    
+    def to_event(self) -> IntegrationEvent:
+        if self._event is None:
+            if self._loader is None:
+                raise ValueError(f"Event {self.event_id} was read without its body")
+            self._event = self._loader()
+            # El blob ya no hace falta una vez decodificado
+            self._loader = None
+        return self._event
+    
+    @property
+    def source_system(self) -> Optional[SourceSystem]:
+        return self.to_event().source_system
+    
+    @property
+    def payload(self) -> Optional[Payload]:
+        return self.to_event().payload
+    
+    @property
+    def context(self) -> Optional[Context]:
+        return self.to_event().context
+    
+    def __repr__(self) -> str:
+        return (f"EventView(event_id={self.event_id!r}, event_type={self.event_type.value}, "
+                f"entity_type={self.entity_type.value}, status={self.status!r}, retry_count={self.retry_count})")
+
+
+# Lo que devuelven las consultas del repositorio según la proyección pedida
+EventRecord = Union[IntegrationEvent, EventView]
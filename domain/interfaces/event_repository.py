@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 from datetime import datetime
 
 from ..entities.integration_event import IntegrationEvent
+from ..entities.event_view import EventProjection, EventRecord
 
 
 class IEventRepository(ABC):
@@ -11,16 +12,38 @@ class IEventRepository(ABC):
     async def save_event(self, event: IntegrationEvent) -> bool:
         pass
     
+    @abstractmethod
+    async def enqueue_event(self, event: IntegrationEvent) -> bool:
+        pass
+    
+    @abstractmethod
+    async def claim_events(self, owner: str, limit: int = 100, lease_seconds: float = 300) -> List[IntegrationEvent]:
+        pass
+    
+    @abstractmethod
+    async def release_events(self, owner: str) -> int:
+        pass
+    
+    @abstractmethod
+    async def extend_leases(self, owner: str, event_ids: List[str], lease_seconds: float = 300) -> int:
+        pass
+    
     @abstractmethod
     async def get_event_by_id(self, event_id: str) -> Optional[IntegrationEvent]:
         pass
     
     @abstractmethod
-    async def get_events_by_entity_type(self, entity_type: str, limit: int = 100) -> List[IntegrationEvent]:
+    async def get_event_statuses(self, event_ids: List[str]) -> Dict[str, str]:
         pass
     
     @abstractmethod
-    async def get_pending_events(self, limit: int = 100) -> List[IntegrationEvent]:
+    async def get_events_by_entity_type(self, entity_type: str, limit: int = 100,
+                                        projection: EventProjection = EventProjection.EVENT) -> List[EventRecord]:
+        pass
+    
+    @abstractmethod
+    async def get_pending_events(self, limit: int = 100,
+                                 projection: EventProjection = EventProjection.EVENT) -> List[EventRecord]:
         pass
     
     @abstractmethod
@@ -28,13 +51,57 @@ class IEventRepository(ABC):
         pass
     
     @abstractmethod
-    async def mark_event_as_failed(self, event_id: str, error_message: str) -> bool:
+    async def mark_event_as_failed(self, event_id: str, error_message: str, retry_count: Optional[int] = None,
+                                   next_attempt_at: Optional[datetime] = None) -> bool:
+        pass
+    
+    @abstractmethod
+    async def mark_event_as_dead_letter(self, event_id: str, error_message: str,
+                                        retry_count: Optional[int] = None) -> bool:
+        pass
+    
+    @abstractmethod
+    async def requeue_due_retries(self, limit: int = 100) -> List[IntegrationEvent]:
         pass
     
     @abstractmethod
-    async def get_failed_events(self, limit: int = 100) -> List[IntegrationEvent]:
+    async def requeue_failed_events(self, event_ids: List[str]) -> List[IntegrationEvent]:
+        pass
+    
+    @abstractmethod
+    async def get_next_retry_at(self) -> Optional[datetime]:
+        pass
+    
+    @abstractmethod
+    async def get_failed_events(self, limit: int = 100,
+                                projection: EventProjection = EventProjection.EVENT) -> List[EventRecord]:
+        pass
+    
+    @abstractmethod
+    def iter_pending(self, page_size: int = 500,
+                     projection: EventProjection = EventProjection.EVENT) -> AsyncIterator[EventRecord]:
+        pass
+    
+    @abstractmethod
+    def iter_failed(self, page_size: int = 500,
+                    projection: EventProjection = EventProjection.EVENT) -> AsyncIterator[EventRecord]:
+        pass
+    
+    @abstractmethod
+    def iter_by_entity(self, entity_type: str, since: Optional[datetime] = None, page_size: int = 500,
+                       projection: EventProjection = EventProjection.EVENT) -> AsyncIterator[EventRecord]:
+        pass
+    
+    @abstractmethod
+    def get_events_since(self, entity_type: str, since: datetime, until: Optional[datetime] = None,
+                         page_size: int = 500,
+                         projection: EventProjection = EventProjection.EVENT) -> AsyncIterator[EventRecord]:
         pass
     
     @abstractmethod
     async def cleanup_old_events(self, older_than: datetime) -> int:
+        pass
+    
+    @abstractmethod
+    async def close(self) -> None:
         pass
\ No newline at end of file
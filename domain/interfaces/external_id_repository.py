@@ -0,0 +1,27 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from ..entities.odoo_record import OdooRecord
+
+
+class IExternalIdRepository(ABC):
+    
+    @abstractmethod
+    async def find_by_external_ids(self, external_ids: List[str]) -> Dict[str, OdooRecord]:
+        pass
+    
+    @abstractmethod
+    async def save_external_ids(self, records: List[OdooRecord], write_date: Optional[str] = None) -> bool:
+        pass
+    
+    @abstractmethod
+    async def delete_external_id(self, external_id: str) -> bool:
+        pass
+    
+    @abstractmethod
+    async def delete_by_record(self, model: str, record_id: int) -> bool:
+        pass
+    
+    @abstractmethod
+    async def count_external_ids(self) -> int:
+        pass
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 
 from ..entities.odoo_record import OdooRecord, OdooSyncResult, OdooOperation
 
@@ -22,10 +22,22 @@ class IOdooRepository(ABC):
     async def create_record(self, model: str, values: Dict[str, Any]) -> OdooSyncResult:
         pass
     
+    @abstractmethod
+    async def create_records(self, model: str, values_list: List[Dict[str, Any]]) -> List[OdooSyncResult]:
+        pass
+    
+    @abstractmethod
+    async def upsert_records(self, model: str, rows: List[Tuple[str, Dict[str, Any]]]) -> List[OdooSyncResult]:
+        pass
+    
     @abstractmethod
     async def update_record(self, model: str, record_id: int, values: Dict[str, Any]) -> OdooSyncResult:
         pass
     
+    @abstractmethod
+    async def update_records(self, model: str, updates: List[Tuple[int, Dict[str, Any]]]) -> List[OdooSyncResult]:
+        pass
+    
     @abstractmethod
     async def delete_record(self, model: str, record_id: int) -> OdooSyncResult:
         pass
@@ -42,6 +54,10 @@ class IOdooRepository(ABC):
     async def search_read(self, model: str, domain: List[tuple], fields: Optional[List[str]] = None, limit: int = 100) -> List[Dict[str, Any]]:
         pass
     
+    @abstractmethod
+    def iter_search_read(self, model: str, domain: List[tuple], fields: Optional[List[str]] = None, page_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+        pass
+    
     @abstractmethod
     async def execute_operation(self, operation: OdooOperation) -> OdooSyncResult:
         pass
@@ -54,6 +70,14 @@ class IOdooRepository(ABC):
     async def find_by_external_id(self, external_id: str) -> Optional[OdooRecord]:
         pass
     
+    @abstractmethod
+    async def find_by_external_ids(self, external_ids: List[str], use_cache: bool = True) -> Dict[str, Optional[OdooRecord]]:
+        pass
+    
+    @abstractmethod
+    async def invalidate_external_ids(self, external_ids: List[str]) -> None:
+        pass
+    
     @abstractmethod
     async def set_external_id(self, model: str, record_id: int, external_id: str) -> bool:
         pass
\ No newline at end of file
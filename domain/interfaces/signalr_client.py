@@ -45,4 +45,16 @@ class ISignalRClient(ABC):
     
     @abstractmethod
     async def stop_listening(self) -> None:
+        pass
+    
+    @abstractmethod
+    async def pause_listening(self) -> bool:
+        pass
+    
+    @abstractmethod
+    async def resume_listening(self) -> bool:
+        pass
+    
+    @abstractmethod
+    def is_paused(self) -> bool:
         pass
\ No newline at end of file
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from ..entities.integration_event import IntegrationEvent
 
@@ -19,7 +19,15 @@ class IWebhookClient(ABC):
         pass
     
     @abstractmethod
-    def on_event_received(self, handler: Callable[[IntegrationEvent], None]) -> None:
+    def on_event_received(self, handler: Callable[[IntegrationEvent], Optional[Awaitable[None]]]) -> None:
+        pass
+    
+    @abstractmethod
+    def on_status_requested(self, provider: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        pass
+    
+    @abstractmethod
+    def on_backpressure_check(self, check: Callable[[], bool]) -> None:
         pass
     
     @abstractmethod
@@ -1,4 +1,5 @@
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import asyncio
 import logging
 from datetime import datetime
 
@@ -6,14 +7,26 @@ from ..entities.integration_event import IntegrationEvent, EntityType, EventType
 from ..entities.odoo_record import OdooRecord, OdooSyncResult, OdooOperation
 from ..interfaces.odoo_repository import IOdooRepository
 from ..interfaces.event_repository import IEventRepository
+from ..interfaces.external_id_repository import IExternalIdRepository
+from .retry_policy import RetryPolicy
 
 
 class IntegrationService:
-    def __init__(self, odoo_repository: IOdooRepository, event_repository: IEventRepository):
+    def __init__(self, odoo_repository: IOdooRepository, event_repository: IEventRepository,
+                 external_id_repository: Optional[IExternalIdRepository] = None,
+                 retry_policy: Optional[RetryPolicy] = None):
         self.odoo_repository = odoo_repository
         self.event_repository = event_repository
+        self.external_id_repository = external_id_repository
+        self.retry_policy = retry_policy
         self.logger = logging.getLogger(__name__)
         
+        # Serializa la búsqueda y creación de categorías entre carriles
+        self._category_lock = asyncio.Lock()
+        
+        # Avisados cada vez que un fallo queda programado para reintento
+        self.retry_scheduled_handlers: List[Callable[[], None]] = []
+        
         # Mapeo de EntityType a modelo Odoo
         self.entity_model_mapping = {
             EntityType.PRODUCT: 'product.template',
@@ -24,20 +37,29 @@ class IntegrationService:
             EntityType.ZETA_REPORT: 'account.report'
         }
     
-    async def process_integration_event(self, event: IntegrationEvent) -> OdooSyncResult:
+    def on_retry_scheduled(self, handler: Callable[[], None]) -> None:
+        """
+        Registra un handler que se llama cada vez que un evento fallido queda programado para reintento
+        """
+        self.retry_scheduled_handlers.append(handler)
+    
+    async def process_integration_event(self, event: IntegrationEvent, persisted: bool = False) -> OdooSyncResult:
         try:
-            await self.event_repository.save_event(event)
-            
-            if not await self.odoo_repository.is_connected():
-                await self.odoo_repository.connect()
+            # Los eventos reclamados de la cola persistente ya están guardados
+            if not persisted:
+                _, duplicates = await self._save_new_events([event])
+                if duplicates:
+                    self.logger.info(f"Ignored duplicate event {event.event_id}")
+                    return duplicates[event.event_id]
             
+            # El cliente re-autentica de forma perezosa, serializado, en la primera llamada
             result = await self._handle_event_by_type(event)
             
             if result.success:
                 await self.event_repository.mark_event_as_processed(event.event_id)
                 self.logger.info(f"Successfully processed event {event.event_id}")
             else:
-                await self.event_repository.mark_event_as_failed(event.event_id, result.message or "Unknown error")
+                await self._mark_event_as_failed(event, result.message or "Unknown error")
                 self.logger.error(f"Failed to process event {event.event_id}: {result.message}")
             
             return result
@@ -45,7 +67,7 @@ class IntegrationService:
         except Exception as e:
             error_msg = f"Error processing event {event.event_id}: {str(e)}"
             self.logger.error(error_msg)
-            await self.event_repository.mark_event_as_failed(event.event_id, error_msg)
+            await self._mark_event_as_failed(event, error_msg)
             
             return OdooSyncResult(
                 success=False,
@@ -53,6 +75,178 @@ class IntegrationService:
                 error_details={'exception': str(e)}
             )
     
+    async def process_integration_events(self, events: List[IntegrationEvent],
+                                         persisted: bool = False) -> Dict[str, OdooSyncResult]:
+        # Los eventos de un lote deben referirse a registros distintos: el orden
+        # entre eventos de un mismo registro lo garantiza quien arma el lote
+        results: Dict[str, OdooSyncResult] = {}
+        received_events = events
+        
+        if not persisted:
+            events, duplicates = await self._save_new_events(events)
+            results.update(duplicates)
+            if not events:
+                return {event.event_id: results[event.event_id] for event in received_events}
+        
+        try:
+            upserts: Dict[str, List[tuple]] = {}
+            updates: List[tuple] = []
+            deletes: List[tuple] = []
+            
+            for event in events:
+                model = self.entity_model_mapping.get(event.entity_type)
+                if not model:
+                    results[event.event_id] = OdooSyncResult(
+                        success=False,
+                        message=f"Unsupported entity type: {event.entity_type.value}"
+                    )
+                    continue
+                
+                data = event.payload.data if event.payload else {}
+                
+                if event.event_type == EventType.CREATE:
+                    external_id = f"{event.source_system.erp_name}_{event.source_system.instance_id}_{data.get('id', event.event_id)}"
+                    upserts.setdefault(model, []).append((event, external_id, data))
+                elif event.event_type == EventType.SYNC:
+                    external_id = f"{event.source_system.erp_name}_{event.source_system.instance_id}_{data.get('id')}"
+                    upserts.setdefault(model, []).append((event, external_id, data))
+                elif event.event_type == EventType.UPDATE:
+                    external_id = f"{event.source_system.erp_name}_{event.source_system.instance_id}_{data.get('id')}"
+                    updates.append((event, model, external_id, data))
+                elif event.event_type == EventType.DELETE:
+                    external_id = f"{event.source_system.erp_name}_{event.source_system.instance_id}_{data.get('id')}"
+                    deletes.append((event, model, external_id))
+                else:
+                    results[event.event_id] = OdooSyncResult(
+                        success=False,
+                        message=f"Unsupported event type: {event.event_type.value}"
+                    )
+            
+            # Las categorías de producto del lote se resuelven juntas, no una búsqueda por fila
+            product_model = self.entity_model_mapping[EntityType.PRODUCT]
+            product_rows = [data for _, _, data in upserts.get(product_model, [])]
+            product_rows += [data for _, model, _, data in updates if model == product_model]
+            categories = await self._resolve_categories([data['category'] for data in product_rows if 'category' in data])
+            
+            # Create y Sync: un load() por modelo que crea o actualiza y registra el external_id
+            for model, pending in upserts.items():
+                rows = []
+                for event, external_id, data in pending:
+                    rows.append((external_id, await self._map_values_to_odoo(model, data, event.entity_type, categories)))
+                
+                model_results = await self.odoo_repository.upsert_records(model, rows)
+                await self._remember_external_ids(model, model_results)
+                for (event, _, _), result in zip(pending, model_results):
+                    results[event.event_id] = result
+            
+            # Resolver todos los external_ids de updates y deletes en un único round trip
+            existing_records = await self._resolve_external_ids(
+                [pending[2] for pending in updates + deletes]
+            ) if updates or deletes else {}
+            
+            # Update: un write por grupo de valores idénticos, resultados repartidos por evento
+            updates_by_model: Dict[str, List[tuple]] = {}
+            for event, model, external_id, data in updates:
+                existing_record = existing_records.get(external_id)
+                if not existing_record or not existing_record.record_id:
+                    results[event.event_id] = OdooSyncResult(
+                        success=False,
+                        message=f"Record not found with external_id: {external_id}"
+                    )
+                    continue
+                
+                mapped_values = await self._map_values_to_odoo(model, data, event.entity_type, categories)
+                updates_by_model.setdefault(model, []).append((event, external_id, existing_record.record_id, mapped_values))
+            
+            for model, pending in updates_by_model.items():
+                model_results = await self.odoo_repository.update_records(
+                    model, [(record_id, values) for _, _, record_id, values in pending]
+                )
+                for (event, external_id, _, _), result in zip(pending, model_results):
+                    results[event.event_id] = result
+                    if not result.success:
+                        await self._forget_external_id(external_id)
+            
+            # Delete: un unlink por registro
+            for event, model, external_id in deletes:
+                existing_record = existing_records.get(external_id)
+                if not existing_record or not existing_record.record_id:
+                    results[event.event_id] = OdooSyncResult(
+                        success=False,
+                        message=f"Record not found with external_id: {external_id}"
+                    )
+                    continue
+                
+                result = await self.odoo_repository.delete_record(model, existing_record.record_id)
+                if result.success and self.external_id_repository:
+                    await self.external_id_repository.delete_by_record(model, existing_record.record_id)
+                elif not result.success:
+                    await self._forget_external_id(external_id)
+                results[event.event_id] = result
+        
+        except Exception as e:
+            error_msg = f"Error processing batch of {len(events)} events: {str(e)}"
+            self.logger.error(error_msg)
+            for event in events:
+                results.setdefault(event.event_id, OdooSyncResult(
+                    success=False,
+                    message=error_msg,
+                    error_details={'exception': str(e)}
+                ))
+        
+        # Los estados se escriben juntos: esperados de a uno, cada evento pagaría por
+        # separado la espera del group commit
+        await asyncio.gather(*(
+            self.event_repository.mark_event_as_processed(event.event_id) if results[event.event_id].success
+            else self._mark_event_as_failed(event, results[event.event_id].message or "Unknown error")
+            for event in events
+        ))
+        
+        success_count = sum(1 for event in events if results[event.event_id].success)
+        self.logger.info(f"Processed batch: {success_count}/{len(events)} events succeeded")
+        return {event.event_id: results[event.event_id] for event in received_events}
+    
+    async def _save_new_events(self, events: List[IntegrationEvent]) -> Tuple[List[IntegrationEvent], Dict[str, OdooSyncResult]]:
+        # Un evento que ya está en la base (reentrega del emisor) se confirma sin volver
+        # a aplicarlo en Odoo; el índice único de event_id es la autoridad
+        statuses = await self.event_repository.get_event_statuses([event.event_id for event in events])
+        
+        new_events = []
+        duplicates: Dict[str, OdooSyncResult] = {}
+        for event in events:
+            if event.event_id in statuses:
+                duplicates[event.event_id] = OdooSyncResult(
+                    success=True,
+                    message=f"Duplicate event {event.event_id} ignored (status: {statuses[event.event_id]})"
+                )
+            else:
+                new_events.append(event)
+        
+        # Una sola transacción del group commit para todo el lote
+        await asyncio.gather(*(self.event_repository.save_event(event) for event in new_events))
+        
+        return new_events, duplicates
+    
+    async def _mark_event_as_failed(self, event: IntegrationEvent, error_message: str) -> None:
+        retry_count = event.context.retry_count if event.context else 0
+        
+        if not self.retry_policy:
+            await self.event_repository.mark_event_as_failed(event.event_id, error_message, retry_count)
+        elif self.retry_policy.should_retry(retry_count):
+            # El scheduler de reintentos lo devolverá a la cola cuando venza el backoff
+            await self.event_repository.mark_event_as_failed(
+                event.event_id, error_message, retry_count,
+                next_attempt_at=self.retry_policy.next_attempt_at(retry_count)
+            )
+            for handler in self.retry_scheduled_handlers:
+                try:
+                    handler()
+                except Exception as e:
+                    self.logger.error(f"Error in retry scheduled handler: {str(e)}")
+        else:
+            await self.event_repository.mark_event_as_dead_letter(event.event_id, error_message, retry_count)
+            self.logger.warning(f"Event {event.event_id} moved to dead letter after {retry_count} retries")
+    
     async def _handle_event_by_type(self, event: IntegrationEvent) -> OdooSyncResult:
         model = self.entity_model_mapping.get(event.entity_type)
         if not model:
@@ -79,18 +273,16 @@ class IntegrationService:
     
     async def _handle_create_event(self, model: str, data: Dict[str, Any], event: IntegrationEvent) -> OdooSyncResult:
         mapped_values = await self._map_values_to_odoo(model, data, event.entity_type)
+        external_id = f"{event.source_system.erp_name}_{event.source_system.instance_id}_{data.get('id', event.event_id)}"
         
-        result = await self.odoo_repository.create_record(model, mapped_values)
-        
-        if result.success and result.record_id:
-            external_id = f"{event.source_system.erp_name}_{event.source_system.instance_id}_{data.get('id', event.event_id)}"
-            await self.odoo_repository.set_external_id(model, result.record_id, external_id)
-        
-        return result
+        # load() crea el registro y su external_id de forma atómica en una sola llamada
+        results = await self.odoo_repository.upsert_records(model, [(external_id, mapped_values)])
+        await self._remember_external_ids(model, results)
+        return results[0]
     
     async def _handle_update_event(self, model: str, data: Dict[str, Any], event: IntegrationEvent) -> OdooSyncResult:
         external_id = f"{event.source_system.erp_name}_{event.source_system.instance_id}_{data.get('id')}"
-        existing_record = await self.odoo_repository.find_by_external_id(external_id)
+        existing_record = (await self._resolve_external_ids([external_id])).get(external_id)
         
         if not existing_record or not existing_record.record_id:
             return OdooSyncResult(
@@ -100,11 +292,15 @@ class IntegrationService:
         
         mapped_values = await self._map_values_to_odoo(model, data, event.entity_type)
         
-        return await self.odoo_repository.update_record(model, existing_record.record_id, mapped_values)
+        result = await self.odoo_repository.update_record(model, existing_record.record_id, mapped_values)
+        if not result.success:
+            # El registro pudo eliminarse en Odoo: volver a resolverlo en el próximo intento
+            await self._forget_external_id(external_id)
+        return result
     
     async def _handle_delete_event(self, model: str, data: Dict[str, Any], event: IntegrationEvent) -> OdooSyncResult:
         external_id = f"{event.source_system.erp_name}_{event.source_system.instance_id}_{data.get('id')}"
-        existing_record = await self.odoo_repository.find_by_external_id(external_id)
+        existing_record = (await self._resolve_external_ids([external_id])).get(external_id)
         
         if not existing_record or not existing_record.record_id:
             return OdooSyncResult(
@@ -112,25 +308,108 @@ class IntegrationService:
                 message=f"Record not found with external_id: {external_id}"
             )
         
-        return await self.odoo_repository.delete_record(model, existing_record.record_id)
+        result = await self.odoo_repository.delete_record(model, existing_record.record_id)
+        if result.success and self.external_id_repository:
+            await self.external_id_repository.delete_by_record(model, existing_record.record_id)
+        elif not result.success:
+            # El registro pudo eliminarse ya en Odoo: volver a resolverlo en el próximo intento
+            await self._forget_external_id(external_id)
+        return result
     
     async def _handle_sync_event(self, model: str, data: Dict[str, Any], event: IntegrationEvent) -> OdooSyncResult:
         external_id = f"{event.source_system.erp_name}_{event.source_system.instance_id}_{data.get('id')}"
-        existing_record = await self.odoo_repository.find_by_external_id(external_id)
-        
         mapped_values = await self._map_values_to_odoo(model, data, event.entity_type)
         
-        if existing_record and existing_record.record_id:
-            return await self.odoo_repository.update_record(model, existing_record.record_id, mapped_values)
-        else:
-            result = await self.odoo_repository.create_record(model, mapped_values)
-            if result.success and result.record_id:
-                await self.odoo_repository.set_external_id(model, result.record_id, external_id)
-            return result
+        # Crear o actualizar según el external_id, sin búsqueda previa
+        results = await self.odoo_repository.upsert_records(model, [(external_id, mapped_values)])
+        await self._remember_external_ids(model, results)
+        return results[0]
+    
+    async def _resolve_external_ids(self, external_ids: List[str]) -> Dict[str, Optional[OdooRecord]]:
+        # Primero el espejo local en SQLite; solo los fallos se consultan en Odoo
+        resolved: Dict[str, Optional[OdooRecord]] = {}
+        if self.external_id_repository:
+            resolved.update(await self.external_id_repository.find_by_external_ids(external_ids))
+        
+        missing = [external_id for external_id in external_ids if external_id not in resolved]
+        if missing:
+            # Con espejo se consulta ir.model.data sin la caché del cliente: un acierto de la
+            # caché puede ser justo el res_id que se acaba de olvidar y volvería al espejo
+            found = await self.odoo_repository.find_by_external_ids(
+                missing, use_cache=self.external_id_repository is None
+            )
+            resolved.update(found)
+            
+            if self.external_id_repository:
+                await self.external_id_repository.save_external_ids(
+                    [record for record in found.values() if record]
+                )
+        
+        return resolved
+    
+    async def _remember_external_ids(self, model: str, results: List[OdooSyncResult]) -> None:
+        if not self.external_id_repository:
+            return
+        
+        await self.external_id_repository.save_external_ids([
+            OdooRecord(model=model, record_id=result.record_id, external_id=result.external_id)
+            for result in results
+            if result.success and result.record_id and result.external_id
+        ])
+    
+    async def _forget_external_id(self, external_id: str) -> None:
+        # En el espejo y en la caché del cliente: si quedara en cualquiera de los dos, cada
+        # reintento volvería a usar el res_id obsoleto hasta acabar en dead letter
+        if self.external_id_repository:
+            await self.external_id_repository.delete_external_id(external_id)
+        await self.odoo_repository.invalidate_external_ids([external_id])
+    
+    async def warm_external_id_mirror(self, modules: List[str], page_size: int = 1000) -> int:
+        if not self.external_id_repository:
+            return 0
+        
+        domain = [
+            ('module', 'in', modules),
+            ('model', 'in', list(set(self.entity_model_mapping.values())))
+        ]
+        
+        warmed = 0
+        batch: List[OdooRecord] = []
+        try:
+            async for row in self.odoo_repository.iter_search_read(
+                'ir.model.data', domain,
+                fields=['module', 'name', 'model', 'res_id', 'write_date'],
+                page_size=page_size
+            ):
+                # Los external_ids sin módulo se registran en __import__
+                external_id = row['name'] if row['module'] == '__import__' else f"{row['module']}.{row['name']}"
+                batch.append(OdooRecord(
+                    model=row['model'],
+                    record_id=row['res_id'],
+                    external_id=external_id,
+                    values={'write_date': row.get('write_date')}
+                ))
+                
+                if len(batch) >= page_size:
+                    await self.external_id_repository.save_external_ids(batch)
+                    warmed += len(batch)
+                    batch = []
+            
+            if batch:
+                await self.external_id_repository.save_external_ids(batch)
+                warmed += len(batch)
+            
+            self.logger.info(f"Warmed external ID mirror with {warmed} entries from modules {modules}")
+            
+        except Exception as e:
+            self.logger.error(f"Failed to warm external ID mirror after {warmed} entries: {str(e)}")
+        
+        return warmed
     
-    async def _map_values_to_odoo(self, model: str, data: Dict[str, Any], entity_type: EntityType) -> Dict[str, Any]:
+    async def _map_values_to_odoo(self, model: str, data: Dict[str, Any], entity_type: EntityType,
+                                  categories: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
         if entity_type == EntityType.PRODUCT:
-            return await self._map_product_values(data)
+            return await self._map_product_values(data, categories)
         elif entity_type == EntityType.USER:
             return await self._map_user_values(data)
         elif entity_type == EntityType.STORE:
@@ -140,7 +419,8 @@ class IntegrationService:
         else:
             return data
     
-    async def _map_product_values(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _map_product_values(self, data: Dict[str, Any],
+                                  categories: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
         mapped = {}
         
         if 'name' in data:
@@ -154,7 +434,10 @@ class IntegrationService:
         if 'barcode' in data:
             mapped['barcode'] = data['barcode']
         if 'category' in data:
-            mapped['categ_id'] = await self._find_or_create_category(data['category'])
+            if categories is None:
+                categories = await self._resolve_categories([data['category']])
+            # Sin categoría resuelta se usa la categoría raíz
+            mapped['categ_id'] = categories.get(data['category'], 1)
         if 'active' in data:
             mapped['active'] = data['active']
             
@@ -203,12 +486,29 @@ class IntegrationService:
             
         return mapped
     
-    async def _find_or_create_category(self, category_name: str) -> int:
-        domain = [('name', '=', category_name)]
-        category_ids = await self.odoo_repository.search_records('product.category', domain, limit=1)
+    async def _resolve_categories(self, category_names: List[str]) -> Dict[str, int]:
+        names = list(dict.fromkeys(category_names))
+        if not names:
+            return {}
         
-        if category_ids:
-            return category_ids[0]
-        
-        result = await self.odoo_repository.create_record('product.category', {'name': category_name})
-        return result.record_id if result.success else 1
\ No newline at end of file
+        # Búsqueda y creación bajo el mismo lock: dos carriles que no encuentran la misma
+        # categoría la crearían dos veces
+        async with self._category_lock:
+            categories: Dict[str, int] = {}
+            # Por id ascendente: con duplicados previos se usa siempre la más antigua. Un fallo
+            # de la búsqueda se propaga en lugar de tomarse por "no existe" y duplicarlas
+            async for row in self.odoo_repository.iter_search_read(
+                'product.category', [('name', 'in', names)], fields=['name']
+            ):
+                categories.setdefault(row['name'], row['id'])
+            
+            missing = [name for name in names if name not in categories]
+            if missing:
+                results = await self.odoo_repository.create_records(
+                    'product.category', [{'name': name} for name in missing]
+                )
+                for name, result in zip(missing, results):
+                    if result.success:
+                        categories[name] = result.record_id
+            
+            return categories
\ No newline at end of file
@@ -0,0 +1,28 @@
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 5.0  # segundos antes del primer reintento
+    max_delay: float = 3600.0
+    jitter: float = 0.5  # fracción del retraso que se vuelve aleatoria
+    
+    def should_retry(self, retry_count: int) -> bool:
+        """
+        Indica si un evento que ya se reintentó retry_count veces admite otro intento
+        """
+        return retry_count < self.max_attempts
+    
+    def next_delay(self, retry_count: int) -> float:
+        """
+        Backoff exponencial con jitter: base_delay * 2^retry_count, acotado a max_delay
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** retry_count))
+        # El jitter reparte en el tiempo los reintentos de eventos que fallaron juntos
+        return delay * (1 - self.jitter * random.random())
+    
+    def next_attempt_at(self, retry_count: int) -> datetime:
+        return datetime.now() + timedelta(seconds=self.next_delay(retry_count))
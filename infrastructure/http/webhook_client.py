@@ -1,6 +1,7 @@
 import asyncio
+import inspect
 import logging
-from typing import Callable, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 import uvicorn
@@ -21,7 +22,7 @@ class WebhookEventModel(BaseModel):
 
 
 class WebhookClientImpl(IWebhookClient):
-    def __init__(self):
+    def __init__(self, retry_after: int = 5):
         self.app = FastAPI(title="Odoo Integration Webhook Server")
         self.server = None
         self.host = "0.0.0.0"
@@ -30,12 +31,24 @@ class WebhookClientImpl(IWebhookClient):
         self.logger = logging.getLogger(__name__)
         
         self.event_received_handlers = []
+        self.status_provider: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None
+        self.backpressure_check: Optional[Callable[[], bool]] = None
+        self.retry_after = retry_after
         
         self._setup_routes()
     
     def _setup_routes(self):
         @self.app.post("/webhook/events")
         async def receive_event(event_data: WebhookEventModel):
+            # Con la cola saturada se rechaza el evento para que el emisor lo reintente
+            if self.backpressure_check and self.backpressure_check():
+                self.logger.warning(f"Rejecting webhook event {event_data.eventId}: event queue is full")
+                return JSONResponse(
+                    status_code=429,
+                    content={"success": False, "message": "Event queue is full, retry later"},
+                    headers={"Retry-After": str(self.retry_after)}
+                )
+            
             try:
                 self.logger.debug(f"Received webhook event: {event_data.dict()}")
                 
@@ -52,12 +65,12 @@ class WebhookClientImpl(IWebhookClient):
                 
                 integration_event = IntegrationEvent.from_dict(event_dict)
                 
-                # Llamar a los handlers registrados
+                # Llamar a los handlers registrados; los asíncronos se esperan para que un
+                # fallo al persistir el evento llegue al emisor como 500 y lo reintente
                 for handler in self.event_received_handlers:
-                    try:
-                        handler(integration_event)
-                    except Exception as e:
-                        self.logger.error(f"Error in event handler: {str(e)}")
+                    result = handler(integration_event)
+                    if inspect.isawaitable(result):
+                        await result
                 
                 return JSONResponse(
                     status_code=200,
@@ -79,6 +92,16 @@ class WebhookClientImpl(IWebhookClient):
                 content={"status": "healthy", "service": "Odoo Integration Webhook"}
             )
         
+        @self.app.get("/status")
+        async def status():
+            if not self.status_provider:
+                raise HTTPException(status_code=404, detail="Status provider not configured")
+            
+            return JSONResponse(
+                status_code=200,
+                content=await self.status_provider()
+            )
+        
         @self.app.post("/webhook/test")
         async def test_endpoint():
             return JSONResponse(
@@ -128,9 +151,15 @@ class WebhookClientImpl(IWebhookClient):
     def is_running(self) -> bool:
         return self.is_server_running
     
-    def on_event_received(self, handler: Callable[[IntegrationEvent], None]) -> None:
+    def on_event_received(self, handler: Callable[[IntegrationEvent], Optional[Awaitable[None]]]) -> None:
         self.event_received_handlers.append(handler)
     
+    def on_status_requested(self, provider: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        self.status_provider = provider
+    
+    def on_backpressure_check(self, check: Callable[[], bool]) -> None:
+        self.backpressure_check = check
+    
     def get_webhook_url(self) -> Optional[str]:
         if self.is_server_running:
             return f"http://{self.host}:{self.port}/webhook/events"
@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+
+class ExternalIdCache:
+    def __init__(self, max_size: int = 10000, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        
+        # external_id -> (model, res_id, expira_en), en orden LRU
+        self._entries: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+        # (model, res_id) -> external_ids, para invalidar al eliminar registros
+        self._by_record: Dict[Tuple[str, int], Set[str]] = {}
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+    
+    def get(self, external_id: str) -> Optional[Tuple[str, int]]:
+        entry = self._entries.get(external_id)
+        
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        model, res_id, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(external_id)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(external_id)
+        self.hits += 1
+        return model, res_id
+    
+    def put(self, external_id: str, model: str, res_id: int) -> None:
+        if not self.enabled:
+            return
+        
+        if external_id in self._entries:
+            self._remove(external_id)
+        
+        self._entries[external_id] = (model, res_id, time.monotonic() + self.ttl)
+        self._by_record.setdefault((model, res_id), set()).add(external_id)
+        
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+    
+    def invalidate(self, external_id: str) -> None:
+        if external_id in self._entries:
+            self._remove(external_id)
+            self.invalidations += 1
+    
+    def invalidate_record(self, model: str, res_id: int) -> None:
+        for external_id in list(self._by_record.get((model, res_id), ())):
+            self.invalidate(external_id)
+    
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_record.clear()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+    
+    def _remove(self, external_id: str) -> None:
+        model, res_id, _ = self._entries.pop(external_id)
+        external_ids = self._by_record.get((model, res_id))
+        if external_ids is not None:
+            external_ids.discard(external_id)
+            if not external_ids:
+                del self._by_record[(model, res_id)]
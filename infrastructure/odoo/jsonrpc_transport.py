@@ -0,0 +1,45 @@
+import itertools
+import json
+from typing import Any
+
+from .transport import OdooTransport, OdooRpcFault
+
+
+class AsyncJsonRpcTransport(OdooTransport):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._request_ids = itertools.count(1)
+    
+    @property
+    def content_type(self) -> str:
+        return 'application/json'
+    
+    def endpoint(self, service: str) -> str:
+        # Odoo expone todos los servicios (common, object, db) en un único endpoint
+        return '/jsonrpc'
+    
+    def encode_call(self, service: str, method: str, args: tuple) -> bytes:
+        return json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {
+                'service': service,
+                'method': method,
+                'args': list(args)
+            },
+            'id': next(self._request_ids)
+        }, separators=(',', ':')).encode('utf-8')
+    
+    def decode_response(self, content: bytes) -> Any:
+        response = json.loads(content)
+        
+        error = response.get('error')
+        if error:
+            data = error.get('data') or {}
+            raise OdooRpcFault(
+                error.get('code'),
+                data.get('message') or error.get('message', 'Unknown error'),
+                name=data.get('name')
+            )
+        
+        return response.get('result')
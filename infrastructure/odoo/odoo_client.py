@@ -1,14 +1,47 @@
+import asyncio
+import json
 import logging
-from typing import List, Optional, Dict, Any
-import xmlrpc.client
+from enum import Enum
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 from datetime import datetime
 
+import httpx
+
+from .transport import OdooTransport, OdooRpcFault, create_transport
+from .external_id_cache import ExternalIdCache
 from ...domain.interfaces.odoo_repository import IOdooRepository
 from ...domain.entities.odoo_record import OdooRecord, OdooSyncResult, OdooOperation
 
 
+class ConnectionState(Enum):
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+
+
+# Errores de transporte tras los que se reconecta; con la conexión cortada a mitad de
+# respuesta (RemoteProtocolError) la petición pudo llegar a aplicarse en Odoo
+RETRYABLE_TRANSPORT_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    httpx.RemoteProtocolError,
+)
+
+# Métodos que pueden repetirse tras un error de transporte sin duplicar efectos: un
+# create reenviado después de aplicarse crearía el registro dos veces
+IDEMPOTENT_METHODS = frozenset({'read', 'search', 'search_read', 'search_count', 'fields_get', 'write', 'load'})
+
+# Códigos de error que Odoo devuelve para AccessDenied (XML-RPC) y sesión expirada (JSON-RPC)
+ACCESS_DENIED_FAULT_CODE = 3
+SESSION_EXPIRED_FAULT_CODE = 100
+
+
 class OdooClientImpl(IOdooRepository):
-    def __init__(self, url: str, database: str, username: str, password: str):
+    def __init__(self, url: str, database: str, username: str, password: str,
+                 timeout: float = 30.0, max_connections: int = 20, batch_size: int = 500,
+                 protocol: str = 'xmlrpc', external_id_cache_size: int = 10000,
+                 external_id_cache_ttl: float = 300):
         self.url = url.rstrip('/')
         self.database = database
         self.username = username
@@ -16,67 +49,198 @@ class OdooClientImpl(IOdooRepository):
         self.uid: Optional[int] = None
         self.logger = logging.getLogger(__name__)
         
-        # Inicializar conexiones XML-RPC
-        self.common = None
-        self.models = None
-        self._connected = False
+        # Transporte asíncrono (XML-RPC o JSON-RPC) con pool de conexiones compartido
+        self.protocol = protocol
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.transport: Optional[OdooTransport] = None
+        
+        # Máquina de estados de la sesión: se asume sana hasta que una llamada falle
+        self._state = ConnectionState.DISCONNECTED
+        self._session_generation = 0
+        self._reconnect_lock = asyncio.Lock()
+        self._reconnect_count = 0
+        self._last_error: Optional[str] = None
+        
+        # Sonda de salud en segundo plano (resultado cacheado para /status)
+        self._probe_task: Optional[asyncio.Task] = None
+        self._last_probe_at: Optional[datetime] = None
+        self._last_probe_ok: Optional[bool] = None
+        
+        # Tamaño máximo de lote para operaciones masivas
+        self.batch_size = max(1, batch_size)
+        
+        # Caché LRU external_id -> (model, res_id) delante de ir.model.data
+        self.external_id_cache = ExternalIdCache(
+            max_size=external_id_cache_size,
+            ttl=external_id_cache_ttl
+        )
+        
+        # Tipos de campo por modelo (fields_get), necesarios para formatear load()
+        self._field_types: Dict[str, Dict[str, str]] = {}
     
     async def connect(self) -> bool:
         try:
-            # Configurar conexiones XML-RPC
-            self.common = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/common')
-            self.models = xmlrpc.client.ServerProxy(f'{self.url}/xmlrpc/2/object')
+            # Configurar transporte RPC
+            if self.transport is None:
+                self.transport = create_transport(
+                    self.protocol,
+                    self.url,
+                    timeout=self.timeout,
+                    max_connections=self.max_connections
+                )
             
             # Verificar versión de Odoo
-            version = self.common.version()
+            version = await self.transport.call('common', 'version')
             self.logger.info(f"Connecting to Odoo {version.get('server_version', 'Unknown')}")
             
             # Autenticar usuario
-            self.uid = self.common.authenticate(self.database, self.username, self.password, {})
+            self.uid = await self.transport.call(
+                'common', 'authenticate',
+                self.database, self.username, self.password, {}
+            )
             
             if not self.uid:
                 self.logger.error("Authentication failed - invalid credentials")
+                self._state = ConnectionState.DISCONNECTED
+                self._last_error = "Authentication failed - invalid credentials"
                 return False
             
-            self._connected = True
+            self._state = ConnectionState.CONNECTED
+            self._session_generation += 1
+            self._last_error = None
             self.logger.info(f"Successfully connected to Odoo as user ID: {self.uid}")
             return True
             
         except Exception as e:
             self.logger.error(f"Failed to connect to Odoo: {str(e)}")
-            self._connected = False
+            self._state = ConnectionState.DISCONNECTED
+            self._last_error = str(e)
             return False
     
     async def disconnect(self) -> None:
-        self._connected = False
+        await self.stop_health_probe()
+        self._state = ConnectionState.DISCONNECTED
         self.uid = None
-        self.common = None
-        self.models = None
+        if self.transport:
+            await self.transport.close()
+            self.transport = None
         self.logger.info("Disconnected from Odoo")
     
-    async def is_connected(self) -> bool:
-        if not self._connected or not self.uid:
-            return False
+    async def _execute_kw(self, model: str, method: str, args: list, kwargs: Optional[Dict[str, Any]] = None) -> Any:
+        if self._state != ConnectionState.CONNECTED:
+            if not await self._reconnect(self._session_generation):
+                raise ConnectionError(f"Not connected to Odoo: {self._last_error}")
         
+        generation = self._session_generation
         try:
-            # Verificar conexión haciendo una llamada simple
-            self.models.execute_kw(
-                self.database, self.uid, self.password,
-                'res.users', 'check_access_rights',
-                ['read'], {'raise_exception': False}
+            return await self._call_object(model, method, args, kwargs)
+        except Exception as e:
+            if not self._is_retryable(method, e):
+                raise
+            
+            # La sesión o la conexión cayó: re-autenticar de forma perezosa y reintentar una vez
+            self.logger.warning(f"Odoo call {model}.{method} failed with {type(e).__name__}, reconnecting: {str(e)}")
+            self._state = ConnectionState.DISCONNECTED
+            self._last_error = str(e)
+            if not await self._reconnect(generation):
+                raise
+            return await self._call_object(model, method, args, kwargs)
+    
+    async def _call_object(self, model: str, method: str, args: list, kwargs: Optional[Dict[str, Any]] = None) -> Any:
+        return await self.transport.call(
+            'object', 'execute_kw',
+            self.database, self.uid, self.password,
+            model, method, args, kwargs or {}
+        )
+    
+    async def _reconnect(self, generation: int) -> bool:
+        async with self._reconnect_lock:
+            # Otra corrutina ya restableció la sesión mientras esperábamos el lock
+            if self._state == ConnectionState.CONNECTED and self._session_generation != generation:
+                return True
+            
+            self._state = ConnectionState.CONNECTING
+            self._reconnect_count += 1
+            return await self.connect()
+    
+    def _is_retryable(self, method: str, error: Exception) -> bool:
+        # Un fallo de sesión rechaza la llamada antes de ejecutarla, así que cualquier método
+        # se reintenta; tras un error de transporte solo los idempotentes
+        if isinstance(error, RETRYABLE_TRANSPORT_ERRORS):
+            return method in IDEMPOTENT_METHODS
+        return self._is_session_error(error)
+    
+    def _is_session_error(self, error: Exception) -> bool:
+        if isinstance(error, OdooRpcFault):
+            return (
+                error.code in (ACCESS_DENIED_FAULT_CODE, SESSION_EXPIRED_FAULT_CODE)
+                or error.name == 'odoo.exceptions.AccessDenied'
+                or 'AccessDenied' in error.message
+                or 'Access Denied' in error.message
+                or 'Session expired' in error.message
             )
-            return True
-        except Exception:
-            self._connected = False
-            return False
+        return False
+    
+    async def is_connected(self) -> bool:
+        # Estado cacheado: no hace round trip a Odoo
+        return self._state == ConnectionState.CONNECTED and bool(self.uid)
+    
+    async def probe(self) -> bool:
+        try:
+            if self._state != ConnectionState.CONNECTED:
+                healthy = await self._reconnect(self._session_generation)
+            else:
+                await self._call_object(
+                    'res.users', 'check_access_rights',
+                    ['read'], {'raise_exception': False}
+                )
+                healthy = True
+        except Exception as e:
+            self.logger.warning(f"Odoo health probe failed: {str(e)}")
+            self._state = ConnectionState.DISCONNECTED
+            self._last_error = str(e)
+            healthy = False
+        
+        self._last_probe_at = datetime.now()
+        self._last_probe_ok = healthy
+        return healthy
+    
+    def start_health_probe(self, interval: float = 60) -> None:
+        if self._probe_task and not self._probe_task.done():
+            return
+        self._probe_task = asyncio.create_task(self._probe_loop(interval))
+    
+    async def stop_health_probe(self) -> None:
+        if self._probe_task and not self._probe_task.done():
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+        self._probe_task = None
+    
+    async def _probe_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.probe()
+    
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        return self.external_id_cache.get_metrics()
+    
+    def get_connection_status(self) -> Dict[str, Any]:
+        return {
+            'state': self._state.value,
+            'uid': self.uid,
+            'last_probe_at': self._last_probe_at.isoformat() if self._last_probe_at else None,
+            'last_probe_ok': self._last_probe_ok,
+            'last_error': self._last_error,
+            'reconnect_count': self._reconnect_count
+        }
     
     async def create_record(self, model: str, values: Dict[str, Any]) -> OdooSyncResult:
         try:
-            if not await self.is_connected():
-                await self.connect()
-            
-            record_id = self.models.execute_kw(
-                self.database, self.uid, self.password,
+            record_id = await self._execute_kw(
                 model, 'create', [values]
             )
             
@@ -98,13 +262,63 @@ class OdooClientImpl(IOdooRepository):
                 error_details={'exception': str(e), 'model': model, 'values': values}
             )
     
-    async def update_record(self, model: str, record_id: int, values: Dict[str, Any]) -> OdooSyncResult:
+    async def create_records(self, model: str, values_list: List[Dict[str, Any]]) -> List[OdooSyncResult]:
+        if not values_list:
+            return []
+        
+        results: List[OdooSyncResult] = []
+        for start in range(0, len(values_list), self.batch_size):
+            chunk = values_list[start:start + self.batch_size]
+            results.extend(await self._create_chunk(model, chunk))
+        
+        created = sum(1 for result in results if result.success)
+        self.logger.info(f"Bulk created {created}/{len(values_list)} records in {model}")
+        return results
+    
+    async def _create_chunk(self, model: str, values_list: List[Dict[str, Any]]) -> List[OdooSyncResult]:
         try:
-            if not await self.is_connected():
-                await self.connect()
+            # create() con una lista devuelve los ids en el mismo orden de entrada
+            record_ids = await self._execute_kw(model, 'create', [values_list])
+            
+            return [
+                OdooSyncResult(
+                    success=True,
+                    record_id=record_id,
+                    message=f"Record created successfully in {model}"
+                )
+                for record_id in record_ids
+            ]
+            
+        except OdooRpcFault as e:
+            # Odoo revierte el lote completo: dividirlo hasta aislar los registros inválidos
+            if len(values_list) > 1:
+                middle = len(values_list) // 2
+                self.logger.warning(f"Batch create of {len(values_list)} records in {model} failed, splitting: {e.message}")
+                return (
+                    await self._create_chunk(model, values_list[:middle])
+                    + await self._create_chunk(model, values_list[middle:])
+                )
+            
+            error_msg = f"Failed to create record in {model}: {e.message}"
+            self.logger.error(error_msg)
+            return [OdooSyncResult(
+                success=False,
+                message=error_msg,
+                error_details={'exception': e.message, 'model': model, 'values': values_list[0]}
+            )]
             
-            success = self.models.execute_kw(
-                self.database, self.uid, self.password,
+        except Exception as e:
+            # Errores de transporte: no tiene sentido dividir, falla el lote completo
+            error_msg = f"Failed to create records in {model}: {str(e)}"
+            self.logger.error(error_msg)
+            return [
+                OdooSyncResult(success=False, message=error_msg, error_details={'exception': str(e), 'model': model, 'values': values})
+                for values in values_list
+            ]
+    
+    async def update_record(self, model: str, record_id: int, values: Dict[str, Any]) -> OdooSyncResult:
+        try:
+            success = await self._execute_kw(
                 model, 'write', [[record_id], values]
             )
             
@@ -135,17 +349,211 @@ class OdooClientImpl(IOdooRepository):
                 error_details={'exception': str(e), 'model': model, 'record_id': record_id, 'values': values}
             )
     
-    async def delete_record(self, model: str, record_id: int) -> OdooSyncResult:
+    async def upsert_records(self, model: str, rows: List[Tuple[str, Dict[str, Any]]]) -> List[OdooSyncResult]:
+        if not rows:
+            return []
+        
+        results: List[Optional[OdooSyncResult]] = [None] * len(rows)
+        
+        try:
+            field_types = await self._get_field_types(model)
+        except Exception as e:
+            error_msg = f"Failed to upsert records in {model}: {str(e)}"
+            self.logger.error(error_msg)
+            return [
+                OdooSyncResult(success=False, external_id=external_id, message=error_msg, error_details={'exception': str(e), 'model': model, 'values': values})
+                for external_id, values in rows
+            ]
+        
+        # load() exige las mismas columnas en todas las filas: agrupar por conjunto de campos
+        # para no sobrescribir con vacío los campos que un evento no trae
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for index, (_, values) in enumerate(rows):
+            groups.setdefault(tuple(sorted(values)), []).append(index)
+        
+        for field_names, indexes in groups.items():
+            for start in range(0, len(indexes), self.batch_size):
+                chunk = indexes[start:start + self.batch_size]
+                chunk_results = await self._load_chunk(model, list(field_names), [rows[index] for index in chunk], field_types)
+                for index, result in zip(chunk, chunk_results):
+                    results[index] = result
+        
+        upserted = sum(1 for result in results if result.success)
+        self.logger.info(f"Upserted {upserted}/{len(rows)} records in {model} via load()")
+        return results
+    
+    async def _load_chunk(self, model: str, field_names: List[str], rows: List[Tuple[str, Dict[str, Any]]],
+                          field_types: Dict[str, str]) -> List[OdooSyncResult]:
+        columns = ['id'] + [
+            f"{name}/.id" if field_types.get(name) in ('many2one', 'many2many', 'one2many') else name
+            for name in field_names
+        ]
+        data = [
+            [self._qualify_external_id(external_id)] + [
+                self._to_load_value(values[name], field_types.get(name)) for name in field_names
+            ]
+            for external_id, values in rows
+        ]
+        
         try:
-            if not await self.is_connected():
-                await self.connect()
+            # load() crea o actualiza según el xmlid y lo registra en la misma transacción
+            response = await self._execute_kw(model, 'load', [columns, data])
+        except Exception as e:
+            error_msg = f"Failed to upsert records in {model}: {str(e)}"
+            self.logger.error(error_msg)
+            return [
+                OdooSyncResult(success=False, external_id=external_id, message=error_msg, error_details={'exception': str(e), 'model': model, 'values': values})
+                for external_id, values in rows
+            ]
+        
+        record_ids = response.get('ids')
+        if record_ids:
+            results = []
+            for (external_id, _), record_id in zip(rows, record_ids):
+                self.external_id_cache.put(external_id, model, record_id)
+                results.append(OdooSyncResult(
+                    success=True,
+                    record_id=record_id,
+                    external_id=external_id,
+                    message=f"Record upserted successfully in {model}"
+                ))
+            return results
+        
+        # load() revierte el lote completo: dividirlo hasta aislar las filas inválidas
+        messages = [message.get('message', '') for message in response.get('messages', []) if message.get('type') == 'error']
+        if len(rows) > 1:
+            middle = len(rows) // 2
+            self.logger.warning(f"Batch load of {len(rows)} records in {model} failed, splitting: {'; '.join(messages)}")
+            return (
+                await self._load_chunk(model, field_names, rows[:middle], field_types)
+                + await self._load_chunk(model, field_names, rows[middle:], field_types)
+            )
+        
+        external_id, values = rows[0]
+        error_msg = f"Failed to upsert record {external_id} in {model}: {'; '.join(messages) or 'Unknown error'}"
+        self.logger.error(error_msg)
+        return [OdooSyncResult(
+            success=False,
+            external_id=external_id,
+            message=error_msg,
+            error_details={'messages': response.get('messages', []), 'model': model, 'values': values}
+        )]
+    
+    async def _get_field_types(self, model: str) -> Dict[str, str]:
+        if model not in self._field_types:
+            fields = await self._execute_kw(model, 'fields_get', [], {'attributes': ['type']})
+            self._field_types[model] = {name: attributes.get('type') for name, attributes in fields.items()}
+        return self._field_types[model]
+    
+    def _to_load_value(self, value: Any, field_type: Optional[str]) -> str:
+        # load() recibe valores en formato de importación (texto)
+        if field_type == 'boolean':
+            return '1' if value else '0'
+        if value is None or value is False:
+            return ''
+        if isinstance(value, (list, tuple)):
+            return ','.join(str(item) for item in value)
+        return str(value)
+    
+    def _qualify_external_id(self, external_id: str) -> str:
+        module, name = self._split_external_id(external_id)
+        return f"{module}.{name}"
+    
+    async def update_records(self, model: str, updates: List[Tuple[int, Dict[str, Any]]]) -> List[OdooSyncResult]:
+        if not updates:
+            return []
+        
+        results: List[Optional[OdooSyncResult]] = [None] * len(updates)
+        
+        rpc_count = 0
+        for round_groups in self._group_updates(updates):
+            for values, entries in round_groups:
+                for start in range(0, len(entries), self.batch_size):
+                    chunk = entries[start:start + self.batch_size]
+                    chunk_results = await self._write_chunk(model, [record_id for _, record_id in chunk], values)
+                    rpc_count += 1
+                    for (index, _), result in zip(chunk, chunk_results):
+                        results[index] = result
+        
+        updated = sum(1 for result in results if result.success)
+        self.logger.info(f"Bulk updated {updated}/{len(updates)} records in {model} with {rpc_count} write calls")
+        return results
+    
+    def _group_updates(self, updates: List[Tuple[int, Dict[str, Any]]]) -> List[List[Tuple[Dict[str, Any], List[Tuple[int, int]]]]]:
+        # Agrupa las actualizaciones por diccionario de valores idéntico. Si un mismo
+        # registro vuelve a aparecer se abre una nueva ronda para conservar el orden
+        rounds = []
+        groups: Dict[str, Tuple[Dict[str, Any], List[Tuple[int, int]]]] = {}
+        seen_ids = set()
+        
+        for index, (record_id, values) in enumerate(updates):
+            if record_id in seen_ids:
+                rounds.append(list(groups.values()))
+                groups = {}
+                seen_ids = set()
+            
+            key = json.dumps(values, sort_keys=True, default=str)
+            if key not in groups:
+                groups[key] = (values, [])
+            groups[key][1].append((index, record_id))
+            seen_ids.add(record_id)
+        
+        if groups:
+            rounds.append(list(groups.values()))
+        return rounds
+    
+    async def _write_chunk(self, model: str, record_ids: List[int], values: Dict[str, Any]) -> List[OdooSyncResult]:
+        try:
+            success = await self._execute_kw(model, 'write', [record_ids, values])
             
-            success = self.models.execute_kw(
-                self.database, self.uid, self.password,
+            if success:
+                return [
+                    OdooSyncResult(
+                        success=True,
+                        record_id=record_id,
+                        message=f"Record {record_id} updated successfully in {model}"
+                    )
+                    for record_id in record_ids
+                ]
+            
+            error_msg = f"Failed to update records {record_ids} in {model}"
+            self.logger.error(error_msg)
+            return [OdooSyncResult(success=False, message=error_msg) for _ in record_ids]
+            
+        except OdooRpcFault as e:
+            # write() es atómico: dividir el lote hasta aislar los registros que fallan
+            if len(record_ids) > 1:
+                middle = len(record_ids) // 2
+                self.logger.warning(f"Batch write of {len(record_ids)} records in {model} failed, splitting: {e.message}")
+                return (
+                    await self._write_chunk(model, record_ids[:middle], values)
+                    + await self._write_chunk(model, record_ids[middle:], values)
+                )
+            
+            error_msg = f"Failed to update record {record_ids[0]} in {model}: {e.message}"
+            self.logger.error(error_msg)
+            return [OdooSyncResult(
+                success=False,
+                message=error_msg,
+                error_details={'exception': e.message, 'model': model, 'record_id': record_ids[0], 'values': values}
+            )]
+            
+        except Exception as e:
+            error_msg = f"Failed to update records in {model}: {str(e)}"
+            self.logger.error(error_msg)
+            return [
+                OdooSyncResult(success=False, message=error_msg, error_details={'exception': str(e), 'model': model, 'record_id': record_id, 'values': values})
+                for record_id in record_ids
+            ]
+    
+    async def delete_record(self, model: str, record_id: int) -> OdooSyncResult:
+        try:
+            success = await self._execute_kw(
                 model, 'unlink', [[record_id]]
             )
             
             if success:
+                self.external_id_cache.invalidate_record(model, record_id)
                 self.logger.info(f"Deleted record {record_id} from {model}")
                 
                 return OdooSyncResult(
@@ -174,11 +582,7 @@ class OdooClientImpl(IOdooRepository):
     
     async def search_records(self, model: str, domain: List[tuple], limit: int = 100) -> List[int]:
         try:
-            if not await self.is_connected():
-                await self.connect()
-            
-            record_ids = self.models.execute_kw(
-                self.database, self.uid, self.password,
+            record_ids = await self._execute_kw(
                 model, 'search', [domain],
                 {'limit': limit}
             )
@@ -192,11 +596,7 @@ class OdooClientImpl(IOdooRepository):
     
     async def read_records(self, model: str, record_ids: List[int], fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         try:
-            if not await self.is_connected():
-                await self.connect()
-            
-            records = self.models.execute_kw(
-                self.database, self.uid, self.password,
+            records = await self._execute_kw(
                 model, 'read', [record_ids],
                 {'fields': fields} if fields else {}
             )
@@ -210,11 +610,7 @@ class OdooClientImpl(IOdooRepository):
     
     async def search_read(self, model: str, domain: List[tuple], fields: Optional[List[str]] = None, limit: int = 100) -> List[Dict[str, Any]]:
         try:
-            if not await self.is_connected():
-                await self.connect()
-            
-            records = self.models.execute_kw(
-                self.database, self.uid, self.password,
+            records = await self._execute_kw(
                 model, 'search_read', [domain],
                 {'fields': fields, 'limit': limit} if fields else {'limit': limit}
             )
@@ -226,6 +622,42 @@ class OdooClientImpl(IOdooRepository):
             self.logger.error(f"Failed to search-read records in {model}: {str(e)}")
             return []
     
+    async def iter_search_read(self, model: str, domain: List[tuple], fields: Optional[List[str]] = None, page_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+        kwargs: Dict[str, Any] = {'limit': page_size, 'order': 'id asc'}
+        if fields:
+            kwargs['fields'] = list(fields) if 'id' in fields else list(fields) + ['id']
+        
+        async def fetch_page(last_id: int) -> List[Dict[str, Any]]:
+            # Paginación por keyset sobre id: cada página es un index scan, sin OFFSET
+            return await self._execute_kw(
+                model, 'search_read', [list(domain) + [('id', '>', last_id)]], kwargs
+            )
+        
+        next_page: Optional[asyncio.Task] = asyncio.create_task(fetch_page(0))
+        total = 0
+        try:
+            while next_page is not None:
+                page = await next_page
+                next_page = None
+                
+                # Precargar la siguiente página mientras se consume la actual
+                if len(page) >= page_size:
+                    next_page = asyncio.create_task(fetch_page(page[-1]['id']))
+                
+                for record in page:
+                    yield record
+                total += len(page)
+            
+            self.logger.debug(f"Iterated {total} records from {model}")
+            
+        except Exception as e:
+            self.logger.error(f"Failed to iterate records in {model} after {total} records: {str(e)}")
+            raise
+        
+        finally:
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
+    
     async def execute_operation(self, operation: OdooOperation) -> OdooSyncResult:
         if operation.operation_type == 'create':
             return await self.create_record(operation.model, operation.values)
@@ -267,35 +699,67 @@ class OdooClientImpl(IOdooRepository):
             return None
     
     async def find_by_external_id(self, external_id: str) -> Optional[OdooRecord]:
-        try:
-            external_data = await self.search_read(
-                'ir.model.data',
-                [('complete_name', '=', external_id)],
-                fields=['model', 'res_id'],
-                limit=1
-            )
-            
-            if external_data:
-                data = external_data[0]
-                return OdooRecord(
-                    model=data['model'],
-                    record_id=data['res_id'],
-                    external_id=external_id
-                )
-            return None
-            
-        except Exception as e:
-            self.logger.error(f"Failed to find record by external ID {external_id}: {str(e)}")
-            return None
+        records = await self.find_by_external_ids([external_id])
+        return records.get(external_id)
+    
+    async def find_by_external_ids(self, external_ids: List[str], use_cache: bool = True) -> Dict[str, Optional[OdooRecord]]:
+        results: Dict[str, Optional[OdooRecord]] = {}
+        names_by_module: Dict[str, Dict[str, str]] = {}
+        
+        for external_id in dict.fromkeys(external_ids):
+            cached = self.external_id_cache.get(external_id) if use_cache else None
+            if cached:
+                model, record_id = cached
+                results[external_id] = OdooRecord(model=model, record_id=record_id, external_id=external_id)
+                continue
+            
+            results[external_id] = None
+            module, name = self._split_external_id(external_id)
+            names_by_module.setdefault(module, {})[name] = external_id
+        
+        # Un search_read por módulo filtrando por (module, name), que sí están indexados,
+        # en lugar de complete_name que es un campo calculado
+        for module, names in names_by_module.items():
+            name_list = list(names)
+            for start in range(0, len(name_list), self.batch_size):
+                chunk = name_list[start:start + self.batch_size]
+                try:
+                    rows = await self._execute_kw(
+                        'ir.model.data', 'search_read',
+                        [[('module', '=', module), ('name', 'in', chunk)]],
+                        {'fields': ['name', 'model', 'res_id'], 'limit': len(chunk)}
+                    )
+                except Exception as e:
+                    # Un fallo de transporte no equivale a "no encontrado": el llamador debe
+                    # fallar los eventos con la causa real
+                    self.logger.error(f"Failed to find records by external IDs in module {module}: {str(e)}")
+                    raise
+                
+                for row in rows:
+                    external_id = names[row['name']]
+                    self.external_id_cache.put(external_id, row['model'], row['res_id'])
+                    results[external_id] = OdooRecord(
+                        model=row['model'],
+                        record_id=row['res_id'],
+                        external_id=external_id
+                    )
+        
+        return results
+    
+    async def invalidate_external_ids(self, external_ids: List[str]) -> None:
+        for external_id in external_ids:
+            self.external_id_cache.invalidate(external_id)
+    
+    def _split_external_id(self, external_id: str) -> Tuple[str, str]:
+        # Separar módulo y nombre del external_id
+        if '.' in external_id:
+            module, name = external_id.split('.', 1)
+            return module, name
+        return '__import__', external_id
     
     async def set_external_id(self, model: str, record_id: int, external_id: str) -> bool:
         try:
-            # Separar módulo y nombre del external_id
-            if '.' in external_id:
-                module, name = external_id.split('.', 1)
-            else:
-                module = '__import__'
-                name = external_id
+            module, name = self._split_external_id(external_id)
             
             result = await self.create_record('ir.model.data', {
                 'name': name,
@@ -305,6 +769,9 @@ class OdooClientImpl(IOdooRepository):
                 'noupdate': True
             })
             
+            if result.success:
+                self.external_id_cache.put(external_id, model, record_id)
+            
             return result.success
             
         except Exception as e:
@@ -0,0 +1,87 @@
+from abc import ABC, abstractmethod
+import logging
+from typing import Any, Optional
+
+import httpx
+
+
+class OdooRpcFault(Exception):
+    def __init__(self, code: Any, message: str, name: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.name = name
+    
+    def __str__(self) -> str:
+        return f"<OdooRpcFault {self.code}: {self.message}>"
+
+
+class OdooTransport(ABC):
+    def __init__(self, url: str, timeout: float = 30.0, max_connections: int = 20,
+                 max_keepalive_connections: int = 10):
+        self.url = url.rstrip('/')
+        self.logger = logging.getLogger(__name__)
+        self._timeout = timeout
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    @abstractmethod
+    def content_type(self) -> str:
+        pass
+    
+    @abstractmethod
+    def endpoint(self, service: str) -> str:
+        pass
+    
+    @abstractmethod
+    def encode_call(self, service: str, method: str, args: tuple) -> bytes:
+        pass
+    
+    @abstractmethod
+    def decode_response(self, content: bytes) -> Any:
+        pass
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                timeout=self._timeout,
+                limits=self._limits,
+                headers={'Content-Type': self.content_type}
+            )
+        return self._client
+    
+    async def call(self, service: str, method: str, *args: Any) -> Any:
+        # Serializar la llamada y enviarla por el pool sin bloquear el event loop
+        body = self.encode_call(service, method, args)
+        
+        response = await self._get_client().post(self.endpoint(service), content=body)
+        response.raise_for_status()
+        
+        # decode_response() lanza OdooRpcFault si Odoo devuelve un error
+        return self.decode_response(response.content)
+    
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_transport(protocol: str, url: str, timeout: float = 30.0, max_connections: int = 20) -> OdooTransport:
+    from .xmlrpc_transport import AsyncXmlRpcTransport
+    from .jsonrpc_transport import AsyncJsonRpcTransport
+    
+    transports = {
+        'xmlrpc': AsyncXmlRpcTransport,
+        'jsonrpc': AsyncJsonRpcTransport
+    }
+    
+    transport_class = transports.get((protocol or 'xmlrpc').lower())
+    if not transport_class:
+        raise ValueError(f"Unsupported Odoo protocol: {protocol}")
+    
+    return transport_class(url, timeout=timeout, max_connections=max_connections)
@@ -0,0 +1,23 @@
+from typing import Any
+import xmlrpc.client
+
+from .transport import OdooTransport, OdooRpcFault
+
+
+class AsyncXmlRpcTransport(OdooTransport):
+    @property
+    def content_type(self) -> str:
+        return 'text/xml'
+    
+    def endpoint(self, service: str) -> str:
+        return f'/xmlrpc/2/{service}'
+    
+    def encode_call(self, service: str, method: str, args: tuple) -> bytes:
+        return xmlrpc.client.dumps(tuple(args), methodname=method, allow_none=True).encode('utf-8')
+    
+    def decode_response(self, content: bytes) -> Any:
+        try:
+            result, _ = xmlrpc.client.loads(content)
+        except xmlrpc.client.Fault as e:
+            raise OdooRpcFault(e.faultCode, e.faultString) from None
+        return result[0] if result else None
@@ -0,0 +1,154 @@
+import json
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict
+
+from ...domain.entities.integration_event import IntegrationEvent
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack es opcional
+    msgpack = None
+
+
+# Cabecera de cada blob: formato de serialización y flags. Permite leer filas escritas
+# con otro codec o sin compresión aunque la configuración cambie después
+FORMAT_JSON = 1
+FORMAT_MSGPACK = 2
+
+FLAG_ZLIB = 0x01
+
+# Partes del evento que van en el blob; el resto son columnas propias para las consultas
+BODY_FIELDS = ('source_system', 'payload', 'context')
+
+
+class EventCodec(ABC):
+    def __init__(self, compress_min_size: int = 4096, compression_level: int = 6):
+        # 0 desactiva la compresión; payloads pequeños no ganan nada con zlib
+        self.compress_min_size = compress_min_size
+        self.compression_level = compression_level
+    
+    @property
+    @abstractmethod
+    def format_id(self) -> int:
+        pass
+    
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        pass
+    
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        pass
+    
+    def encode(self, event: IntegrationEvent) -> bytes:
+        """
+        Serializa origen, payload y contexto del evento en un único blob
+        """
+        # to_dict recorre los dataclasses anidados (MetaData, Header), que json.dumps(__dict__) no admite
+        event_dict = event.to_dict()
+        return self.encode_body({field: event_dict[field] for field in BODY_FIELDS if field in event_dict})
+    
+    def encode_body(self, body: Dict[str, Any]) -> bytes:
+        data = self.dumps(body)
+        
+        flags = 0
+        if self.compress_min_size and len(data) >= self.compress_min_size:
+            compressed = zlib.compress(data, self.compression_level)
+            if len(compressed) < len(data):
+                data = compressed
+                flags |= FLAG_ZLIB
+        
+        return bytes((self.format_id, flags)) + data
+    
+    def decode(self, blob: bytes) -> Dict[str, Any]:
+        """
+        Devuelve las partes del evento guardadas en el blob, en el formato de IntegrationEvent.to_dict
+        """
+        format_id, flags = blob[0], blob[1]
+        data = blob[2:]
+        if flags & FLAG_ZLIB:
+            data = zlib.decompress(data)
+        
+        codec = self if format_id == self.format_id else _codec_for_format(format_id)
+        return codec.loads(data)
+    
+    def decode_event(self, blob: bytes, event_type: str, entity_type: str, event_id: str,
+                     timestamp: str) -> IntegrationEvent:
+        return IntegrationEvent.from_dict({
+            'event_type': event_type,
+            'entity_type': entity_type,
+            'event_id': event_id,
+            'timestamp': timestamp,
+            **(self.decode(blob) if blob else {})
+        })
+
+
+class JsonEventCodec(EventCodec):
+    """
+    JSON compacto; usa orjson cuando está instalado y json de la biblioteca estándar si no
+    """
+    
+    @property
+    def format_id(self) -> int:
+        return FORMAT_JSON
+    
+    def dumps(self, value: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(value)
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    
+    def loads(self, data: bytes) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackEventCodec(EventCodec):
+    def __init__(self, compress_min_size: int = 4096, compression_level: int = 6):
+        if msgpack is None:
+            raise ImportError("msgpack is required for the msgpack event codec")
+        super().__init__(compress_min_size, compression_level)
+    
+    @property
+    def format_id(self) -> int:
+        return FORMAT_MSGPACK
+    
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+    
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+@lru_cache(maxsize=None)
+def _codec_for_format(format_id: int) -> EventCodec:
+    codecs = {
+        FORMAT_JSON: JsonEventCodec,
+        FORMAT_MSGPACK: MsgpackEventCodec
+    }
+    
+    codec_class = codecs.get(format_id)
+    if not codec_class:
+        raise ValueError(f"Unknown event codec format: {format_id}")
+    
+    return codec_class()
+
+
+def create_event_codec(name: str = 'json', compress_min_size: int = 4096, compression_level: int = 6) -> EventCodec:
+    codecs = {
+        'json': JsonEventCodec,
+        'msgpack': MsgpackEventCodec
+    }
+    
+    codec_class = codecs.get((name or 'json').lower())
+    if not codec_class:
+        raise ValueError(f"Unsupported event codec: {name}")
+    
+    return codec_class(compress_min_size=compress_min_size, compression_level=compression_level)
@@ -0,0 +1,285 @@
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import aiosqlite
+
+
+DAY_MS = 86400000
+WEEK_MS = 7 * DAY_MS
+# El 1 de enero de 1970 fue jueves: las semanas empiezan el lunes siguiente, 4 días después
+WEEK_OFFSET_MS = 4 * DAY_MS
+
+PARTITION_INTERVALS = {
+    'day': (DAY_MS, 0),
+    'week': (WEEK_MS, WEEK_OFFSET_MS)
+}
+
+PARTITION_PREFIX = 'integration_events'
+# Tabla anterior al particionado: se conserva como primera partición hasta que vence entera
+LEGACY_PARTITION = 'integration_events'
+# Filas abiertas de particiones ya eliminadas y eventos que llegan con fecha anterior a ellas
+RETAINED_PARTITION = 'integration_events_retained'
+
+# event_id -> partición que guarda el evento: la unicidad de event_id es global aunque
+# cada partición solo pueda garantizarla entre sus propias filas
+EVENT_ID_INDEX = 'event_ids'
+
+# Cada partición numera sus ids desde su día de inicio * ID_SPACE, así los ids siguen
+# siendo únicos cuando las filas abiertas se mueven a la partición retenida
+ID_SPACE = 10 ** 9
+
+# Columnas comunes a todas las particiones, incluida la tabla anterior al particionado
+PARTITION_COLUMNS = ("id, event_id, event_type, entity_type, timestamp, timestamp_ms, body, status, last_error, "
+                     "retry_count, next_attempt_at, lease_owner, lease_expires_at, created_at, updated_at")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EventPartition:
+    name: str
+    start_ms: Optional[int]  # None: sin límite inferior
+    end_ms: int
+    
+    def contains(self, timestamp_ms: int) -> bool:
+        return (self.start_ms is None or self.start_ms <= timestamp_ms) and timestamp_ms < self.end_ms
+    
+    def overlaps(self, since_ms: Optional[int] = None, until_ms: Optional[int] = None) -> bool:
+        if since_ms is not None and self.end_ms <= since_ms:
+            return False
+        if until_ms is not None and self.start_ms is not None and self.start_ms >= until_ms:
+            return False
+        return True
+
+
+def partition_bounds(timestamp_ms: int, interval: str) -> Tuple[int, int]:
+    """
+    Devuelve el intervalo [inicio, fin) en milisegundos UTC del día o semana que contiene timestamp_ms
+    """
+    length, offset = PARTITION_INTERVALS[interval]
+    start_ms = (timestamp_ms - offset) // length * length + offset
+    return start_ms, start_ms + length
+
+
+async def create_partition_catalog(db: aiosqlite.Connection) -> None:
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS event_partitions (
+            name TEXT PRIMARY KEY,
+            start_ms INTEGER,
+            end_ms INTEGER NOT NULL
+        )
+    """)
+
+
+async def create_event_id_index(db: aiosqlite.Connection) -> None:
+    await db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {EVENT_ID_INDEX} (
+            event_id TEXT PRIMARY KEY,
+            partition TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    # Para retirar las entradas de una partición al eliminarla
+    await db.execute(f"CREATE INDEX IF NOT EXISTS idx_{EVENT_ID_INDEX}_partition ON {EVENT_ID_INDEX}(partition)")
+
+
+async def create_partition_table(db: aiosqlite.Connection, name: str) -> None:
+    await db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id TEXT UNIQUE NOT NULL,
+            event_type TEXT NOT NULL,
+            entity_type TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            timestamp_ms INTEGER NOT NULL,
+            body BLOB,
+            status TEXT DEFAULT 'pending',
+            last_error TEXT,
+            retry_count INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at INTEGER,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    
+    # Los mismos índices parciales que la tabla única; no hace falta índice por fecha
+    # porque la retención elimina la partición entera
+    for index in (f"idx_{name}_pending ON {name}(timestamp_ms, id) WHERE status = 'pending'",
+                  f"idx_{name}_failed ON {name}(timestamp_ms, id) WHERE status = 'failed'",
+                  f"idx_{name}_lease ON {name}(lease_expires_at) WHERE status = 'processing'",
+                  f"idx_{name}_retry_due ON {name}(next_attempt_at) WHERE status = 'failed'",
+                  f"idx_{name}_open ON {name}(id) WHERE status != 'processed'",
+                  f"idx_{name}_entity_time ON {name}(entity_type, timestamp_ms)"):
+        await db.execute(f"CREATE INDEX IF NOT EXISTS {index}")
+
+
+class PartitionCatalog:
+    """
+    Particiones del almacén de eventos, ordenadas por fecha, y su ciclo de vida: creación
+    al llegar el primer evento del periodo y eliminación al vencer la retención
+    """
+    
+    def __init__(self, interval: str = 'week', ttl: float = 1.0):
+        if interval not in PARTITION_INTERVALS:
+            raise ValueError(f"Unsupported partition interval: {interval}")
+        
+        self.interval = interval
+        # Otro proceso sobre el mismo archivo puede crear o eliminar particiones; la copia
+        # en memoria se relee pasado este tiempo
+        self.ttl = ttl
+        self.partitions: List[EventPartition] = []
+        self._loaded_at: Optional[float] = None
+    
+    async def load(self, db: aiosqlite.Connection) -> None:
+        cursor = await db.execute("SELECT name, start_ms, end_ms FROM event_partitions ORDER BY end_ms ASC")
+        self.partitions = [EventPartition(row[0], row[1], row[2]) for row in await cursor.fetchall()]
+        self._loaded_at = time.monotonic()
+    
+    async def refresh(self, db: aiosqlite.Connection) -> None:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            await self.load(db)
+    
+    def invalidate(self) -> None:
+        self._loaded_at = None
+    
+    def find(self, timestamp_ms: int) -> Optional[EventPartition]:
+        for partition in self.partitions:
+            if partition.contains(timestamp_ms):
+                return partition
+        return None
+    
+    def ordered(self, since_ms: Optional[int] = None, until_ms: Optional[int] = None,
+                descending: bool = False) -> List[EventPartition]:
+        """
+        Particiones que se solapan con [since_ms, until_ms), de la más antigua a la más reciente
+        """
+        partitions = [partition for partition in self.partitions if partition.overlaps(since_ms, until_ms)]
+        return partitions[::-1] if descending else partitions
+    
+    def following(self, end_ms: Optional[int], since_ms: Optional[int] = None,
+                  until_ms: Optional[int] = None) -> Optional[EventPartition]:
+        """
+        Primera partición posterior a la que termina en end_ms, según el catálogo actual
+        """
+        for partition in self.ordered(since_ms, until_ms):
+            if end_ms is None or partition.end_ms > end_ms:
+                return partition
+        return None
+    
+    async def ensure(self, db: aiosqlite.Connection, timestamp_ms: int) -> EventPartition:
+        """
+        Devuelve la partición de timestamp_ms, creándola dentro de la transacción en curso
+        """
+        partition = self.find(timestamp_ms)
+        if partition:
+            return partition
+        
+        # Otro proceso pudo crearla después de la última lectura del catálogo
+        await self.load(db)
+        partition = self.find(timestamp_ms)
+        if partition:
+            return partition
+        
+        # El periodo se recorta a los huecos entre particiones existentes por si el
+        # intervalo configurado cambió desde que se crearon
+        start_ms, end_ms = partition_bounds(timestamp_ms, self.interval)
+        for existing in self.partitions:
+            if existing.end_ms <= timestamp_ms:
+                start_ms = max(start_ms, existing.end_ms)
+            elif existing.start_ms is not None:
+                end_ms = min(end_ms, existing.start_ms)
+        
+        name = f"{PARTITION_PREFIX}_{datetime.fromtimestamp(start_ms / 1000, timezone.utc):%Y%m%d}"
+        await create_partition_table(db, name)
+        await db.execute("""
+            INSERT INTO sqlite_sequence (name, seq) SELECT ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+        """, (name, start_ms // DAY_MS * ID_SPACE, name))
+        await db.execute("""
+            INSERT OR IGNORE INTO event_partitions (name, start_ms, end_ms) VALUES (?, ?, ?)
+        """, (name, start_ms, end_ms))
+        
+        partition = EventPartition(name, start_ms, end_ms)
+        self.partitions = sorted([*self.partitions, partition], key=lambda item: item.end_ms)
+        return partition
+    
+    async def drop_expired(self, db: aiosqlite.Connection, cutoff_ms: int) -> Tuple[int, int]:
+        """
+        Elimina las particiones que terminan antes de cutoff_ms y devuelve los eventos
+        procesados descartados y las particiones eliminadas. Las filas abiertas pasan a
+        la partición retenida
+        """
+        await self.load(db)
+        expired = [partition for partition in self.partitions
+                   if partition.end_ms <= cutoff_ms and partition.name != RETAINED_PARTITION]
+        has_retained = any(partition.name == RETAINED_PARTITION for partition in self.partitions)
+        
+        if expired:
+            await create_partition_table(db, RETAINED_PARTITION)
+            expired = [partition for partition in expired if not await self._conflicts_with_retained(db, partition)]
+        
+        removed_count = 0
+        if expired:
+            horizon_ms = max(partition.end_ms for partition in expired)
+            await db.execute("""
+                INSERT INTO event_partitions (name, start_ms, end_ms) VALUES (?, NULL, ?)
+                ON CONFLICT(name) DO UPDATE SET end_ms = MAX(end_ms, excluded.end_ms)
+            """, (RETAINED_PARTITION, horizon_ms))
+            
+            for partition in expired:
+                cursor = await db.execute(f"SELECT COUNT(*) FROM {partition.name}")
+                total_count = (await cursor.fetchone())[0]
+                # Pendientes, fallidos y dead letter no caducan: solo se mueven sus filas. Sin
+                # OR IGNORE: un conflicto haría fallar la limpieza en lugar de perder el evento
+                cursor = await db.execute(f"""
+                    INSERT INTO {RETAINED_PARTITION} ({PARTITION_COLUMNS})
+                    SELECT {PARTITION_COLUMNS} FROM {partition.name} WHERE status != 'processed'
+                """)
+                removed_count += total_count - cursor.rowcount
+                
+                await db.execute(f"""
+                    UPDATE {EVENT_ID_INDEX} SET partition = ?
+                    WHERE partition = ? AND event_id IN (
+                        SELECT event_id FROM {partition.name} WHERE status != 'processed'
+                    )
+                """, (RETAINED_PARTITION, partition.name))
+                await db.execute(f"DELETE FROM {EVENT_ID_INDEX} WHERE partition = ?", (partition.name,))
+                await db.execute(f"DROP TABLE {partition.name}")
+                await db.execute("DELETE FROM event_partitions WHERE name = ?", (partition.name,))
+            has_retained = True
+        
+        if has_retained:
+            # Los eventos retenidos que se procesaron después caducan fila a fila
+            await db.execute(f"""
+                DELETE FROM {EVENT_ID_INDEX}
+                WHERE partition = ? AND event_id IN (
+                    SELECT event_id FROM {RETAINED_PARTITION} WHERE status = 'processed' AND timestamp_ms < ?
+                )
+            """, (RETAINED_PARTITION, cutoff_ms))
+            cursor = await db.execute(f"""
+                DELETE FROM {RETAINED_PARTITION} WHERE status = 'processed' AND timestamp_ms < ?
+            """, (cutoff_ms,))
+            removed_count += cursor.rowcount
+        
+        await self.load(db)
+        return removed_count, len(expired)
+    
+    async def _conflicts_with_retained(self, db: aiosqlite.Connection, partition: EventPartition) -> bool:
+        """
+        Indica si algún evento abierto de la partición ya tiene su event_id en la partición
+        retenida; en ese caso la partición se conserva para no perder ninguno de los dos
+        """
+        # Solo es posible con duplicados anteriores al índice global de event_ids
+        cursor = await db.execute(f"""
+            SELECT COUNT(*) FROM {partition.name} AS expired
+            JOIN {RETAINED_PARTITION} AS retained ON retained.event_id = expired.event_id
+            WHERE expired.status != 'processed'
+        """)
+        conflicts = (await cursor.fetchone())[0]
+        if conflicts:
+            logger.warning(f"Keeping expired partition {partition.name}: {conflicts} open events "
+                           f"already exist in {RETAINED_PARTITION}")
+        return conflicts > 0
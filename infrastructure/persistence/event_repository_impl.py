@@ -1,65 +1,273 @@
 import sqlite3
+import asyncio
 import json
 import logging
-from typing import List, Optional
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 import aiosqlite
 
 from ...domain.interfaces.event_repository import IEventRepository
-from ...domain.entities.integration_event import IntegrationEvent
+from ...domain.entities.integration_event import IntegrationEvent, EventType, EntityType
+from ...domain.entities.event_view import EventProjection, EventRecord, EventView
+from .event_codec import BODY_FIELDS, EventCodec, create_event_codec
+from .event_partitions import (EVENT_ID_INDEX, LEGACY_PARTITION, EventPartition, PartitionCatalog, create_event_id_index,
+                               create_partition_catalog, partition_bounds)
+from .migrations import Migration, apply_migrations
+from .sqlite_database import SqliteDatabase
+
+
+async def _create_events_table(db: aiosqlite.Connection) -> None:
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS integration_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id TEXT UNIQUE NOT NULL,
+            event_type TEXT NOT NULL,
+            entity_type TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            source_system TEXT,
+            payload TEXT,
+            context TEXT,
+            status TEXT DEFAULT 'pending',
+            error_message TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    
+    for index in ('idx_event_id ON integration_events(event_id)',
+                  'idx_entity_type ON integration_events(entity_type)',
+                  'idx_status ON integration_events(status)',
+                  'idx_timestamp ON integration_events(timestamp)'):
+        await db.execute(f"CREATE INDEX IF NOT EXISTS {index}")
+
+
+async def _add_lease_columns(db: aiosqlite.Connection) -> None:
+    # Bases anteriores al mecanismo de migraciones pueden tener ya las columnas
+    cursor = await db.execute("PRAGMA table_info(integration_events)")
+    columns = {row[1] for row in await cursor.fetchall()}
+    for column, definition in (('lease_owner', 'TEXT'), ('lease_expires_at', 'REAL')):
+        if column not in columns:
+            await db.execute(f"ALTER TABLE integration_events ADD COLUMN {column} {definition}")
+
+
+async def _status_indexes(db: aiosqlite.Connection) -> None:
+    # Índices parciales por estado: solo contienen las filas abiertas, que son pocas
+    # frente a las procesadas, y ya vienen ordenados para las consultas de la cola
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_pending ON integration_events(timestamp, id)
+        WHERE status = 'pending'
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_failed ON integration_events(timestamp, id)
+        WHERE status = 'failed'
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_lease ON integration_events(lease_expires_at)
+        WHERE status = 'processing'
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_entity_timestamp ON integration_events(entity_type, timestamp)
+    """)
+    
+    # event_id ya tiene el índice de su restricción UNIQUE; status y entity_type
+    # quedan cubiertos por los índices anteriores
+    for index in ('idx_event_id', 'idx_status', 'idx_entity_type'):
+        await db.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+def to_epoch_ms(value: datetime) -> int:
+    """
+    Convierte una fecha a milisegundos Unix; las fechas sin zona se toman como hora local
+    """
+    return int(value.timestamp() * 1000)
+
+
+async def _numeric_timestamps(db: aiosqlite.Connection) -> None:
+    # El texto ISO solo ordena bien si todas las fechas comparten zona horaria; los
+    # milisegundos Unix ordenan y comparan igual sin importar el offset de origen
+    await db.execute("ALTER TABLE integration_events ADD COLUMN timestamp_ms INTEGER")
+    
+    cursor = await db.execute("SELECT id, timestamp FROM integration_events")
+    while True:
+        rows = await cursor.fetchmany(1000)
+        if not rows:
+            break
+        await db.executemany("""
+            UPDATE integration_events SET timestamp_ms = ? WHERE id = ?
+        """, [(to_epoch_ms(datetime.fromisoformat(row[1])), row[0]) for row in rows])
+    
+    for index in ('idx_events_pending', 'idx_events_failed', 'idx_events_entity_timestamp', 'idx_timestamp'):
+        await db.execute(f"DROP INDEX IF EXISTS {index}")
+    
+    await db.execute("""
+        CREATE INDEX idx_events_pending ON integration_events(timestamp_ms, id)
+        WHERE status = 'pending'
+    """)
+    await db.execute("""
+        CREATE INDEX idx_events_failed ON integration_events(timestamp_ms, id)
+        WHERE status = 'failed'
+    """)
+    await db.execute("""
+        CREATE INDEX idx_events_entity_time ON integration_events(entity_type, timestamp_ms)
+    """)
+    await db.execute("""
+        CREATE INDEX idx_events_time ON integration_events(timestamp_ms)
+    """)
+
+
+async def _retry_state(db: aiosqlite.Connection) -> None:
+    # El estado de reintento vive en columnas propias: el contador del contexto JSON
+    # solo se incrementaba en memoria y nunca se guardaba
+    await db.execute("ALTER TABLE integration_events RENAME COLUMN error_message TO last_error")
+    await db.execute("ALTER TABLE integration_events ADD COLUMN retry_count INTEGER NOT NULL DEFAULT 0")
+    await db.execute("ALTER TABLE integration_events ADD COLUMN next_attempt_at INTEGER")
+    
+    await db.execute("""
+        UPDATE integration_events SET retry_count = COALESCE(json_extract(context, '$.retry_count'), 0)
+        WHERE context IS NOT NULL
+    """)
+    # Los fallidos existentes vencen ya: el scheduler los reintenta o los pasa a dead letter
+    await db.execute("""
+        UPDATE integration_events SET next_attempt_at = ? WHERE status = 'failed'
+    """, (to_epoch_ms(datetime.now()),))
+    
+    await db.execute("""
+        CREATE INDEX idx_events_retry_due ON integration_events(next_attempt_at)
+        WHERE status = 'failed'
+    """)
+
+
+async def _event_body_blob(db: aiosqlite.Connection) -> None:
+    # Origen, payload y contexto pasan de tres columnas JSON a un único blob del codec
+    await db.execute("ALTER TABLE integration_events ADD COLUMN body BLOB")
+    
+    codec = create_event_codec()
+    cursor = await db.execute("SELECT id, source_system, payload, context FROM integration_events")
+    while True:
+        rows = await cursor.fetchmany(1000)
+        if not rows:
+            break
+        await db.executemany("""
+            UPDATE integration_events SET body = ? WHERE id = ?
+        """, [
+            (codec.encode_body({field: json.loads(value) for field, value in zip(BODY_FIELDS, row[1:]) if value}), row[0])
+            for row in rows
+        ])
+    
+    for column in BODY_FIELDS:
+        await db.execute(f"ALTER TABLE integration_events DROP COLUMN {column}")
+
+
+async def _partitioned_storage(db: aiosqlite.Connection) -> None:
+    # Los eventos pasan a una tabla por día o semana y la retención elimina particiones
+    # enteras; las tablas de cada periodo se crean al llegar su primer evento
+    await create_partition_catalog(db)
+    
+    cursor = await db.execute("SELECT MAX(timestamp_ms) FROM integration_events")
+    row = await cursor.fetchone()
+    if row[0] is None:
+        await db.execute("DROP TABLE integration_events")
+        return
+    
+    # La tabla existente sigue como primera partición hasta que vence entera
+    _, end_ms = partition_bounds(row[0], 'week')
+    await db.execute("""
+        INSERT INTO event_partitions (name, start_ms, end_ms) VALUES (?, NULL, ?)
+    """, (LEGACY_PARTITION, end_ms))
+    await db.execute("""
+        CREATE INDEX idx_events_open ON integration_events(id) WHERE status != 'processed'
+    """)
+
+
+async def _global_event_ids(db: aiosqlite.Connection) -> None:
+    # Cada partición solo detecta duplicados entre sus filas: una reentrega con otra fecha
+    # caería en otra partición. El índice global pasa a ser la autoridad de unicidad
+    await create_event_id_index(db)
+    
+    cursor = await db.execute("SELECT name FROM event_partitions ORDER BY end_ms ASC")
+    for (name,) in await cursor.fetchall():
+        await db.execute(f"""
+            INSERT OR IGNORE INTO {EVENT_ID_INDEX} (event_id, partition) SELECT event_id, ? FROM {name}
+        """, (name,))
+
+
+EVENT_MIGRATIONS: List[Migration] = [
+    ('integration_events_0001_create_table', _create_events_table),
+    ('integration_events_0002_lease_columns', _add_lease_columns),
+    ('integration_events_0003_status_indexes', _status_indexes),
+    ('integration_events_0004_numeric_timestamps', _numeric_timestamps),
+    ('integration_events_0005_retry_state', _retry_state),
+    ('integration_events_0006_event_body_blob', _event_body_blob),
+    ('integration_events_0007_partitioned_storage', _partitioned_storage),
+    ('integration_events_0008_global_event_ids', _global_event_ids)
+]
+
+
+# Columnas leídas según la proyección: los listados de estado no necesitan el cuerpo
+METADATA_COLUMNS = ("id, event_id, event_type, entity_type, timestamp, timestamp_ms, status, "
+                    "retry_count, last_error, next_attempt_at")
+PROJECTION_COLUMNS = {
+    EventProjection.EVENT: f"{METADATA_COLUMNS}, body",
+    EventProjection.VIEW: f"{METADATA_COLUMNS}, body",
+    EventProjection.METADATA: METADATA_COLUMNS
+}
+
+
+def _is_missing_table(error: Exception) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and 'no such table' in str(error)
 
 
 class EventRepositoryImpl(IEventRepository):
-    def __init__(self, db_path: str = "integration_events.db"):
+    def __init__(self, db_path: str = "integration_events.db", group_commit_interval_ms: float = 10,
+                 group_commit_max_ops: int = 256, database: Optional[SqliteDatabase] = None,
+                 codec: Optional[EventCodec] = None, partition_interval: str = 'week'):
         self.db_path = db_path
+        self.codec = codec or create_event_codec()
+        # Conexiones compartidas con el resto de repositorios del mismo archivo
+        self._owns_database = database is None
+        self.database = database or SqliteDatabase(db_path)
         self.logger = logging.getLogger(__name__)
         self._initialized = False
+        self._init_lock = asyncio.Lock()
+        
+        # Una tabla por día o semana según timestamp_ms; las consultas recorren las
+        # particiones en orden y la retención elimina las vencidas sin borrar fila a fila
+        self.partitions = PartitionCatalog(partition_interval)
+        
+        # Group commit: inserts y cambios de estado se acumulan y un único writer los
+        # confirma en una sola transacción cada interval_ms o al juntar max_ops
+        self.group_commit_interval = max(0.0, group_commit_interval_ms) / 1000
+        self.group_commit_max_ops = max(1, group_commit_max_ops)
+        self._pending_writes: List[Tuple[str, tuple, Optional[Tuple[int, str]], asyncio.Future]] = []
+        self._writes_available = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._write_task: Optional[asyncio.Task] = None
+        self._closing = False
+        
+        self._commits = 0
+        self._committed_writes = 0
+        self._failed_commits = 0
+        self._duplicate_events = 0
+        self._dropped_partitions = 0
     
     async def _ensure_initialized(self):
-        if not self._initialized:
-            await self._initialize_database()
-            self._initialized = True
+        if self._initialized:
+            return
+        
+        # Con escrituras concurrentes solo la primera llamada debe crear el esquema
+        async with self._init_lock:
+            if not self._initialized:
+                await self._initialize_database()
+                self._initialized = True
     
     async def _initialize_database(self):
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    CREATE TABLE IF NOT EXISTS integration_events (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        event_id TEXT UNIQUE NOT NULL,
-                        event_type TEXT NOT NULL,
-                        entity_type TEXT NOT NULL,
-                        timestamp TEXT NOT NULL,
-                        source_system TEXT,
-                        payload TEXT,
-                        context TEXT,
-                        status TEXT DEFAULT 'pending',
-                        error_message TEXT,
-                        created_at TEXT NOT NULL,
-                        updated_at TEXT NOT NULL
-                    )
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_event_id ON integration_events(event_id)
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_entity_type ON integration_events(entity_type)
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_status ON integration_events(status)
-                """)
-                
-                await db.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_timestamp ON integration_events(timestamp)
-                """)
-                
-                await db.commit()
-                
+            await apply_migrations(self.database, EVENT_MIGRATIONS)
+            async with self.database.transaction() as db:
+                await self.partitions.load(db)
             self.logger.info(f"Database initialized at {self.db_path}")
-            
+        
         except Exception as e:
             self.logger.error(f"Failed to initialize database: {str(e)}")
             raise
@@ -70,91 +278,265 @@ class EventRepositoryImpl(IEventRepository):
             
             now = datetime.now().isoformat()
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT OR REPLACE INTO integration_events 
-                    (event_id, event_type, entity_type, timestamp, source_system, payload, context, status, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    event.event_id,
-                    event.event_type.value,
-                    event.entity_type.value,
-                    event.timestamp.isoformat(),
-                    json.dumps(event.source_system.__dict__) if event.source_system else None,
-                    json.dumps(event.payload.__dict__) if event.payload else None,
-                    json.dumps(event.context.__dict__) if event.context else None,
-                    'pending',
-                    now,
-                    now
-                ))
-                
-                await db.commit()
-                
+            # Nunca se reemplaza una fila existente: una reentrega no debe devolver a
+            # pending un evento ya procesado. El índice global de event_ids detecta el
+            # duplicado aunque la reentrega traiga otra fecha y caiga en otra partición
+            inserted = await self._write("""
+                INSERT INTO {table}
+                (event_id, event_type, entity_type, timestamp, timestamp_ms, body, status, retry_count, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(event_id) DO NOTHING
+            """, (
+                event.event_id,
+                event.event_type.value,
+                event.entity_type.value,
+                event.timestamp.isoformat(),
+                to_epoch_ms(event.timestamp),
+                self.codec.encode(event),
+                'pending',
+                event.context.retry_count if event.context else 0,
+                now,
+                now
+            ), (to_epoch_ms(event.timestamp), event.event_id))
+            
+            if not inserted:
+                self._duplicate_events += 1
+                self.logger.debug(f"Event {event.event_id} was already stored")
+                return True
+            
             self.logger.debug(f"Saved event {event.event_id} to database")
             return True
-            
+        
         except Exception as e:
             self.logger.error(f"Failed to save event {event.event_id}: {str(e)}")
             return False
     
-    async def get_event_by_id(self, event_id: str) -> Optional[IntegrationEvent]:
+    async def enqueue_event(self, event: IntegrationEvent) -> bool:
+        try:
+            await self._ensure_initialized()
+            
+            now = datetime.now().isoformat()
+            
+            # Un evento ya encolado (reentrega del emisor) no pierde su estado
+            inserted = await self._write("""
+                INSERT INTO {table}
+                (event_id, event_type, entity_type, timestamp, timestamp_ms, body, status, retry_count, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(event_id) DO NOTHING
+            """, (
+                event.event_id,
+                event.event_type.value,
+                event.entity_type.value,
+                event.timestamp.isoformat(),
+                to_epoch_ms(event.timestamp),
+                self.codec.encode(event),
+                'pending',
+                event.context.retry_count if event.context else 0,
+                now,
+                now
+            ), (to_epoch_ms(event.timestamp), event.event_id))
+            
+            if not inserted:
+                self._duplicate_events += 1
+                self.logger.debug(f"Event {event.event_id} was already enqueued")
+                return True
+            
+            self.logger.debug(f"Enqueued event {event.event_id}")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Failed to enqueue event {event.event_id}: {str(e)}")
+            return False
+    
+    async def claim_events(self, owner: str, limit: int = 100, lease_seconds: float = 300) -> List[IntegrationEvent]:
         try:
             await self._ensure_initialized()
             
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
-                cursor = await db.execute("""
-                    SELECT * FROM integration_events WHERE event_id = ?
-                """, (event_id,))
+            now = time.time()
+            
+            rows = []
+            async with self.database.transaction() as db:
+                await self.partitions.refresh(db)
                 
-                row = await cursor.fetchone()
+                # Todas las particiones en la misma transacción y de la más antigua a la
+                # más reciente, así el orden (timestamp_ms, id) se mantiene entre ellas
+                for partition in self.partitions.ordered():
+                    remaining = limit - len(rows)
+                    if remaining <= 0:
+                        break
+                    
+                    # Una sola sentencia: SQLite la ejecuta bajo el lock de escritura, así que
+                    # dos procesos nunca reclaman la misma fila. Los leases vencidos vuelven a
+                    # estar disponibles (entrega al menos una vez), también los propios: el
+                    # dueño renueva los que siguen en sus carriles y descarta los que ya tiene.
+                    # Cada rama de la unión usa su índice parcial; con un OR el planificador
+                    # recorrería toda la tabla
+                    cursor = await db.execute(f"""
+                        UPDATE {partition.name}
+                        SET status = 'processing', lease_owner = ?, lease_expires_at = ?, updated_at = ?
+                        WHERE id IN (
+                            SELECT id FROM (
+                                SELECT * FROM (
+                                    SELECT id, timestamp_ms FROM {partition.name}
+                                    WHERE status = 'pending'
+                                    ORDER BY timestamp_ms ASC, id ASC
+                                    LIMIT ?
+                                )
+                                UNION ALL
+                                SELECT * FROM (
+                                    SELECT id, timestamp_ms FROM {partition.name}
+                                    WHERE status = 'processing' AND lease_expires_at < ?
+                                    ORDER BY timestamp_ms ASC, id ASC
+                                    LIMIT ?
+                                )
+                            )
+                            ORDER BY timestamp_ms ASC, id ASC
+                            LIMIT ?
+                        )
+                        RETURNING *
+                    """, (owner, now + lease_seconds, datetime.now().isoformat(), remaining, now, remaining, remaining))
+                    
+                    # RETURNING no garantiza orden
+                    rows.extend(sorted(await cursor.fetchall(), key=lambda row: (row['timestamp_ms'], row['id'])))
+            
+            if rows:
+                self.logger.debug(f"Claimed {len(rows)} events for {owner}")
+            return [self._row_to_event(row) for row in rows]
+        
+        except Exception as e:
+            self.partitions.invalidate()
+            self.logger.error(f"Failed to claim events for {owner}: {str(e)}")
+            return []
+    
+    async def release_events(self, owner: str) -> int:
+        try:
+            await self._ensure_initialized()
+            
+            released_count = 0
+            async with self.database.transaction() as db:
+                await self.partitions.refresh(db)
                 
-                if row:
-                    return self._row_to_event(row)
-                return None
+                for partition in self.partitions.ordered():
+                    cursor = await db.execute(f"""
+                        UPDATE {partition.name}
+                        SET status = 'pending', lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                        WHERE status = 'processing' AND lease_owner = ?
+                    """, (datetime.now().isoformat(), owner))
+                    released_count += cursor.rowcount
+            
+            if released_count:
+                self.logger.info(f"Released {released_count} claimed events for {owner}")
+            return released_count
+        
+        except Exception as e:
+            self.partitions.invalidate()
+            self.logger.error(f"Failed to release events for {owner}: {str(e)}")
+            return 0
+    
+    async def extend_leases(self, owner: str, event_ids: List[str], lease_seconds: float = 300) -> int:
+        try:
+            await self._ensure_initialized()
+            
+            extended_count = 0
+            async with self.database.transaction() as db:
+                await self.partitions.refresh(db)
+                
+                # Solo los eventos que el dueño aún tiene en curso: una fila reclamada cuyo
+                # procesamiento falló sin cambiar de estado debe vencer y volver a reclamarse
+                for partition in self.partitions.ordered(descending=True):
+                    # En tramos para no superar el límite de parámetros de SQLite
+                    for offset in range(0, len(event_ids), 500):
+                        chunk = event_ids[offset:offset + 500]
+                        cursor = await db.execute(f"""
+                            UPDATE {partition.name} SET lease_expires_at = ?
+                            WHERE event_id IN ({', '.join('?' for _ in chunk)})
+                            AND status = 'processing' AND lease_owner = ?
+                        """, (time.time() + lease_seconds, *chunk, owner))
+                        extended_count += cursor.rowcount
+            
+            return extended_count
+            
+        except Exception as e:
+            self.partitions.invalidate()
+            self.logger.error(f"Failed to extend leases for {owner}: {str(e)}")
+            return 0
+    
+    async def get_event_by_id(self, event_id: str) -> Optional[IntegrationEvent]:
+        try:
+            await self._ensure_initialized()
+            
+            async with self.database.read() as db:
+                await self.partitions.refresh(db)
                 
+                # Casi siempre se busca un evento reciente: primero las particiones nuevas
+                for partition in self.partitions.ordered(descending=True):
+                    rows = await self._select(db, partition, """
+                        SELECT * FROM {table} WHERE event_id = ?
+                    """, (event_id,))
+                    
+                    if rows:
+                        return self._row_to_event(rows[0])
+                return None
+        
         except Exception as e:
             self.logger.error(f"Failed to get event {event_id}: {str(e)}")
             return None
     
-    async def get_events_by_entity_type(self, entity_type: str, limit: int = 100) -> List[IntegrationEvent]:
+    async def get_event_statuses(self, event_ids: List[str]) -> Dict[str, str]:
         try:
             await self._ensure_initialized()
             
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
-                cursor = await db.execute("""
-                    SELECT * FROM integration_events 
-                    WHERE entity_type = ? 
-                    ORDER BY timestamp DESC 
-                    LIMIT ?
-                """, (entity_type, limit))
-                
-                rows = await cursor.fetchall()
-                
-                return [self._row_to_event(row) for row in rows]
+            statuses: Dict[str, str] = {}
+            async with self.database.read() as db:
+                await self.partitions.refresh(db)
                 
+                for partition in self.partitions.ordered(descending=True):
+                    missing = [event_id for event_id in event_ids if event_id not in statuses]
+                    # En tramos para no superar el límite de parámetros de SQLite
+                    for offset in range(0, len(missing), 500):
+                        chunk = missing[offset:offset + 500]
+                        rows = await self._select(db, partition, f"""
+                            SELECT event_id, status FROM {{table}}
+                            WHERE event_id IN ({', '.join('?' for _ in chunk)})
+                        """, chunk)
+                        
+                        for row in rows:
+                            statuses[row['event_id']] = row['status']
+            
+            return statuses
+        
+        except Exception as e:
+            self.logger.error(f"Failed to get event statuses: {str(e)}")
+            return {}
+    
+    async def get_events_by_entity_type(self, entity_type: str, limit: int = 100,
+                                        projection: EventProjection = EventProjection.EVENT) -> List[EventRecord]:
+        try:
+            await self._ensure_initialized()
+            
+            return await self._select_ordered(f"""
+                SELECT {PROJECTION_COLUMNS[projection]} FROM {{table}}
+                WHERE entity_type = ?
+                ORDER BY timestamp_ms DESC
+                LIMIT ?
+            """, (entity_type,), limit, projection, descending=True)
+        
         except Exception as e:
             self.logger.error(f"Failed to get events by entity type {entity_type}: {str(e)}")
             return []
     
-    async def get_pending_events(self, limit: int = 100) -> List[IntegrationEvent]:
+    async def get_pending_events(self, limit: int = 100,
+                                 projection: EventProjection = EventProjection.EVENT) -> List[EventRecord]:
         try:
             await self._ensure_initialized()
             
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
-                cursor = await db.execute("""
-                    SELECT * FROM integration_events 
-                    WHERE status = 'pending' 
-                    ORDER BY timestamp ASC 
-                    LIMIT ?
-                """, (limit,))
-                
-                rows = await cursor.fetchall()
-                
-                return [self._row_to_event(row) for row in rows]
-                
+            return await self._select_ordered(f"""
+                SELECT {PROJECTION_COLUMNS[projection]} FROM {{table}}
+                WHERE status = 'pending'
+                ORDER BY timestamp_ms ASC
+                LIMIT ?
+            """, (), limit, projection)
+        
         except Exception as e:
             self.logger.error(f"Failed to get pending events: {str(e)}")
             return []
@@ -162,64 +544,258 @@ class EventRepositoryImpl(IEventRepository):
     async def mark_event_as_processed(self, event_id: str) -> bool:
         return await self._update_event_status(event_id, 'processed')
     
-    async def mark_event_as_failed(self, event_id: str, error_message: str) -> bool:
+    async def mark_event_as_failed(self, event_id: str, error_message: str, retry_count: Optional[int] = None,
+                                   next_attempt_at: Optional[datetime] = None) -> bool:
         try:
             await self._ensure_initialized()
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    UPDATE integration_events 
-                    SET status = 'failed', error_message = ?, updated_at = ?
-                    WHERE event_id = ?
-                """, ('failed', error_message, datetime.now().isoformat(), event_id))
-                
-                await db.commit()
-                
+            # Sin next_attempt_at el evento solo se reintenta a demanda
+            await self._write("""
+                UPDATE {table}
+                SET status = 'failed', last_error = ?, retry_count = COALESCE(?, retry_count),
+                    next_attempt_at = ?, updated_at = ?, lease_owner = NULL, lease_expires_at = NULL
+                WHERE event_id = ?
+            """, (
+                error_message,
+                retry_count,
+                to_epoch_ms(next_attempt_at) if next_attempt_at else None,
+                datetime.now().isoformat(),
+                event_id
+            ))
+            
             self.logger.debug(f"Marked event {event_id} as failed")
             return True
-            
+        
         except Exception as e:
             self.logger.error(f"Failed to mark event {event_id} as failed: {str(e)}")
             return False
     
-    async def get_failed_events(self, limit: int = 100) -> List[IntegrationEvent]:
+    async def mark_event_as_dead_letter(self, event_id: str, error_message: str,
+                                        retry_count: Optional[int] = None) -> bool:
         try:
             await self._ensure_initialized()
             
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
-                cursor = await db.execute("""
-                    SELECT * FROM integration_events 
-                    WHERE status = 'failed' 
-                    ORDER BY timestamp DESC 
-                    LIMIT ?
-                """, (limit,))
-                
-                rows = await cursor.fetchall()
+            await self._write("""
+                UPDATE {table}
+                SET status = 'dead_letter', last_error = ?, retry_count = COALESCE(?, retry_count),
+                    next_attempt_at = NULL, updated_at = ?, lease_owner = NULL, lease_expires_at = NULL
+                WHERE event_id = ?
+            """, (error_message, retry_count, datetime.now().isoformat(), event_id))
+            
+            self.logger.debug(f"Moved event {event_id} to dead letter")
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Failed to move event {event_id} to dead letter: {str(e)}")
+            return False
+    
+    async def requeue_due_retries(self, limit: int = 100) -> List[IntegrationEvent]:
+        try:
+            await self._ensure_initialized()
+            
+            rows = []
+            async with self.database.transaction() as db:
+                await self.partitions.refresh(db)
                 
-                return [self._row_to_event(row) for row in rows]
+                for partition in self.partitions.ordered():
+                    remaining = limit - len(rows)
+                    if remaining <= 0:
+                        break
+                    
+                    # Los vencidos vuelven a pending y se devuelven para encolar solo esos; al ser
+                    # una sola transacción, dos procesos nunca reencolan el mismo evento
+                    cursor = await db.execute(f"""
+                        UPDATE {partition.name}
+                        SET status = 'pending', retry_count = retry_count + 1, next_attempt_at = NULL, updated_at = ?
+                        WHERE id IN (
+                            SELECT id FROM {partition.name}
+                            WHERE status = 'failed' AND next_attempt_at <= ?
+                            ORDER BY next_attempt_at ASC
+                            LIMIT ?
+                        )
+                        RETURNING *
+                    """, (datetime.now().isoformat(), to_epoch_ms(datetime.now()), remaining))
+                    
+                    # RETURNING no garantiza orden
+                    rows.extend(sorted(await cursor.fetchall(), key=lambda row: (row['timestamp_ms'], row['id'])))
+            
+            return [self._row_to_event(row) for row in rows]
+        
+        except Exception as e:
+            self.partitions.invalidate()
+            self.logger.error(f"Failed to requeue due retries: {str(e)}")
+            return []
+    
+    async def requeue_failed_events(self, event_ids: List[str]) -> List[IntegrationEvent]:
+        try:
+            await self._ensure_initialized()
+            
+            rows = []
+            async with self.database.transaction() as db:
+                await self.partitions.refresh(db)
                 
+                # Igual que un reintento vencido pero sin esperar su backoff: solo los que siguen
+                # en failed, así un evento ya reencolado por el scheduler no se toma dos veces
+                for partition in self.partitions.ordered(descending=True):
+                    # En tramos para no superar el límite de parámetros de SQLite
+                    for offset in range(0, len(event_ids), 500):
+                        chunk = event_ids[offset:offset + 500]
+                        cursor = await db.execute(f"""
+                            UPDATE {partition.name}
+                            SET status = 'pending', retry_count = retry_count + 1, next_attempt_at = NULL, updated_at = ?
+                            WHERE event_id IN ({', '.join('?' for _ in chunk)}) AND status = 'failed'
+                            RETURNING *
+                        """, (datetime.now().isoformat(), *chunk))
+                        rows.extend(await cursor.fetchall())
+            
+            rows.sort(key=lambda row: (row['timestamp_ms'], row['id']))
+            return [self._row_to_event(row) for row in rows]
+        
         except Exception as e:
-            self.logger.error(f"Failed to get failed events: {str(e)}")
+            self.partitions.invalidate()
+            self.logger.error(f"Failed to requeue failed events: {str(e)}")
             return []
     
-    async def cleanup_old_events(self, older_than: datetime) -> int:
+    async def get_next_retry_at(self) -> Optional[datetime]:
+        try:
+            await self._ensure_initialized()
+            
+            next_attempts = []
+            async with self.database.read() as db:
+                await self.partitions.refresh(db)
+                
+                for partition in self.partitions.ordered():
+                    rows = await self._select(db, partition, """
+                        SELECT MIN(next_attempt_at) FROM {table} WHERE status = 'failed'
+                    """, ())
+                    
+                    if rows and rows[0][0] is not None:
+                        next_attempts.append(rows[0][0])
+            
+            if next_attempts:
+                return datetime.fromtimestamp(min(next_attempts) / 1000)
+            return None
+        
+        except Exception as e:
+            self.logger.error(f"Failed to get next retry time: {str(e)}")
+            return None
+    
+    async def get_failed_events(self, limit: int = 100,
+                                projection: EventProjection = EventProjection.EVENT) -> List[EventRecord]:
         try:
             await self._ensure_initialized()
             
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute("""
-                    DELETE FROM integration_events 
-                    WHERE timestamp < ? AND status = 'processed'
-                """, (older_than.isoformat(),))
+            return await self._select_ordered(f"""
+                SELECT {PROJECTION_COLUMNS[projection]} FROM {{table}}
+                WHERE status = 'failed'
+                ORDER BY timestamp_ms DESC
+                LIMIT ?
+            """, (), limit, projection, descending=True)
+        
+        except Exception as e:
+            self.logger.error(f"Failed to get failed events: {str(e)}")
+            return []
+    
+    def iter_pending(self, page_size: int = 500,
+                     projection: EventProjection = EventProjection.EVENT) -> AsyncIterator[EventRecord]:
+        return self._iter_events("status = 'pending'", (), page_size, projection)
+    
+    def iter_failed(self, page_size: int = 500,
+                    projection: EventProjection = EventProjection.EVENT) -> AsyncIterator[EventRecord]:
+        return self._iter_events("status = 'failed'", (), page_size, projection)
+    
+    def iter_by_entity(self, entity_type: str, since: Optional[datetime] = None, page_size: int = 500,
+                       projection: EventProjection = EventProjection.EVENT) -> AsyncIterator[EventRecord]:
+        if since is None:
+            return self._iter_events("entity_type = ?", (entity_type,), page_size, projection)
+        return self.get_events_since(entity_type, since, page_size=page_size, projection=projection)
+    
+    def get_events_since(self, entity_type: str, since: datetime, until: Optional[datetime] = None,
+                         page_size: int = 500,
+                         projection: EventProjection = EventProjection.EVENT) -> AsyncIterator[EventRecord]:
+        # Solo se visitan las particiones del intervalo y, en cada una, el rango de su
+        # índice (entity_type, timestamp_ms)
+        since_ms = to_epoch_ms(since)
+        if until is None:
+            return self._iter_events("entity_type = ? AND timestamp_ms >= ?",
+                                     (entity_type, since_ms), page_size, projection, since_ms=since_ms)
+        until_ms = to_epoch_ms(until)
+        return self._iter_events("entity_type = ? AND timestamp_ms >= ? AND timestamp_ms < ?",
+                                 (entity_type, since_ms, until_ms), page_size, projection,
+                                 since_ms=since_ms, until_ms=until_ms)
+    
+    async def _iter_events(self, where: str, params: tuple, page_size: int,
+                           projection: EventProjection = EventProjection.EVENT, since_ms: Optional[int] = None,
+                           until_ms: Optional[int] = None) -> AsyncIterator[EventRecord]:
+        """
+        Recorre los eventos que cumplen el filtro en orden (timestamp_ms, id), página a página
+        """
+        await self._ensure_initialized()
+        
+        # Las particiones se recorren de la más antigua a la más reciente y la siguiente se
+        # busca en el catálogo al terminar cada una, por si se crearon nuevas mientras tanto
+        partition = None
+        while True:
+            try:
+                async with self.database.read() as db:
+                    await self.partitions.refresh(db)
+            except Exception as e:
+                self.logger.error(f"Failed to iterate events ({where}): {str(e)}")
+                raise
+            
+            partition = self.partitions.following(partition.end_ms if partition else None, since_ms, until_ms)
+            if partition is None:
+                break
+            
+            # Keyset sobre (timestamp_ms, id): cada página sigue a la anterior por índice, sin
+            # OFFSET, y las filas que cambian de estado mientras se itera no desplazan a las demás
+            last_key = None
+            while True:
+                try:
+                    async with self.database.read() as db:
+                        if last_key is None:
+                            rows = await self._select(db, partition, f"""
+                                SELECT {PROJECTION_COLUMNS[projection]} FROM {{table}}
+                                WHERE {where}
+                                ORDER BY timestamp_ms ASC, id ASC
+                                LIMIT ?
+                            """, (*params, page_size))
+                        else:
+                            rows = await self._select(db, partition, f"""
+                                SELECT {PROJECTION_COLUMNS[projection]} FROM {{table}}
+                                WHERE {where} AND (timestamp_ms, id) > (?, ?)
+                                ORDER BY timestamp_ms ASC, id ASC
+                                LIMIT ?
+                            """, (*params, *last_key, page_size))
                 
-                await db.commit()
+                except Exception as e:
+                    self.logger.error(f"Failed to iterate events ({where}): {str(e)}")
+                    raise
                 
-                deleted_count = cursor.rowcount
-                self.logger.info(f"Cleaned up {deleted_count} old events")
-                return deleted_count
+                # La conexión se devuelve al pool antes de entregar los eventos al consumidor
+                for row in rows:
+                    yield self._convert_row(row, projection)
                 
+                if len(rows) < page_size:
+                    break
+                
+                last_key = (rows[-1]['timestamp_ms'], rows[-1]['id'])
+    
+    async def cleanup_old_events(self, older_than: datetime) -> int:
+        try:
+            await self._ensure_initialized()
+            
+            async with self.database.transaction(immediate=True) as db:
+                # Las particiones vencidas se eliminan enteras con DROP TABLE; solo sus filas
+                # abiertas se copian antes a la partición retenida
+                deleted_count, dropped_count = await self.partitions.drop_expired(db, to_epoch_ms(older_than))
+            
+            self._dropped_partitions += dropped_count
+            self.logger.info(f"Cleaned up {deleted_count} old events ({dropped_count} partitions dropped)")
+            return deleted_count
+        
         except Exception as e:
+            self.partitions.invalidate()
             self.logger.error(f"Failed to cleanup old events: {str(e)}")
             return 0
     
@@ -227,46 +803,226 @@ class EventRepositoryImpl(IEventRepository):
         try:
             await self._ensure_initialized()
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    UPDATE integration_events 
-                    SET status = ?, updated_at = ?
-                    WHERE event_id = ?
-                """, (status, datetime.now().isoformat(), event_id))
-                
-                await db.commit()
-                
+            await self._write("""
+                UPDATE {table}
+                SET status = ?, updated_at = ?, lease_owner = NULL, lease_expires_at = NULL
+                WHERE event_id = ?
+            """, (status, datetime.now().isoformat(), event_id))
+            
             self.logger.debug(f"Updated event {event_id} status to {status}")
             return True
-            
+        
         except Exception as e:
             self.logger.error(f"Failed to update event {event_id} status: {str(e)}")
             return False
     
-    def _row_to_event(self, row) -> IntegrationEvent:
-        from ...domain.entities.integration_event import EventType, EntityType, SourceSystem, Payload, Context
+    async def close(self) -> None:
+        """
+        Confirma las escrituras pendientes y detiene el writer
+        """
+        if self._write_task and not self._write_task.done():
+            self._closing = True
+            self._writes_available.set()
+            self._batch_full.set()
+            await self._write_task
+        
+        self._write_task = None
+        self._closing = False
+        
+        if self._owns_database:
+            await self.database.close()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'pending_writes': len(self._pending_writes),
+            'commits': self._commits,
+            'committed_writes': self._committed_writes,
+            'avg_writes_per_commit': round(self._committed_writes / self._commits, 2) if self._commits else 0.0,
+            'failed_commits': self._failed_commits,
+            'duplicate_events': self._duplicate_events,
+            'partition_interval': self.partitions.interval,
+            'partitions': len(self.partitions.partitions),
+            'dropped_partitions': self._dropped_partitions
+        }
+    
+    async def _select(self, db: aiosqlite.Connection, partition: EventPartition, sql: str, params) -> list:
+        """
+        Ejecuta una lectura sobre una partición; una partición eliminada por otro proceso se da por vacía
+        """
+        try:
+            cursor = await db.execute(sql.format(table=partition.name), params)
+            return await cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            if not _is_missing_table(e):
+                raise
+            self.partitions.invalidate()
+            return []
+    
+    async def _select_ordered(self, sql: str, params: tuple, limit: int, projection: EventProjection,
+                              descending: bool = False) -> List[EventRecord]:
+        """
+        Ejecuta un listado con LIMIT partición a partición hasta completar el límite
+        """
+        rows = []
+        async with self.database.read() as db:
+            await self.partitions.refresh(db)
+            
+            # Las particiones no se solapan en el tiempo: recorrerlas en el orden del listado
+            # y concatenar mantiene el orden global
+            for partition in self.partitions.ordered(descending=descending):
+                if len(rows) >= limit:
+                    break
+                rows.extend(await self._select(db, partition, sql, (*params, limit - len(rows))))
         
-        source_system = None
-        if row['source_system']:
-            source_data = json.loads(row['source_system'])
-            source_system = SourceSystem(**source_data)
+        return [self._convert_row(row, projection) for row in rows]
+    
+    async def _write(self, sql: str, params: tuple, new_event: Optional[Tuple[int, str]] = None) -> int:
+        """
+        Encola una escritura para el próximo group commit y espera a que sea durable
+        
+        La sentencia usa {table} en lugar del nombre de la tabla. Con new_event, un
+        (timestamp_ms, event_id), inserta un evento: se ejecuta en la partición de esa
+        fecha (creándola si no existe) solo si el event_id no figura en el índice global.
+        Sin él, en la partición que contenga el evento, buscando desde la más reciente
+        """
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._writer_loop())
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending_writes.append((sql, params, new_event, future))
+        
+        self._writes_available.set()
+        if len(self._pending_writes) >= self.group_commit_max_ops:
+            self._batch_full.set()
+        
+        return await future
+    
+    async def _writer_loop(self) -> None:
+        batch: List[Tuple[str, tuple, Optional[Tuple[int, str]], asyncio.Future]] = []
+        try:
+            db = await self.database.writer()
+            while True:
+                if not self._pending_writes:
+                    if self._closing:
+                        break
+                    self._writes_available.clear()
+                    await self._writes_available.wait()
+                    continue
+                
+                # Dar tiempo a que lleguen más escrituras solo si hay otras en cola: una
+                # escritura sola (quien espera la suya antes de emitir la siguiente) se
+                # confirma ya, o cada llamada en serie pagaría el intervalo completo
+                if 1 < len(self._pending_writes) < self.group_commit_max_ops and not self._closing:
+                    self._batch_full.clear()
+                    try:
+                        await asyncio.wait_for(self._batch_full.wait(), timeout=self.group_commit_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                
+                batch = self._pending_writes[:self.group_commit_max_ops]
+                del self._pending_writes[:self.group_commit_max_ops]
+                async with self.database.write_lock:
+                    await self._flush_writes(db, batch)
+                batch = []
+        
+        except Exception as e:
+            self.logger.error(f"Event writer stopped: {str(e)}")
+            pending, self._pending_writes = batch + self._pending_writes, []
+            for _, _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+    
+    async def _flush_writes(self, db: aiosqlite.Connection,
+                            batch: List[Tuple[str, tuple, Optional[Tuple[int, str]], asyncio.Future]]) -> None:
+        try:
+            await self.partitions.refresh(db)
+            rowcounts = []
+            for sql, params, new_event, _ in batch:
+                rowcounts.append(await self._execute_write(db, sql, params, new_event))
+            await db.commit()
         
-        payload = None
-        if row['payload']:
-            payload_data = json.loads(row['payload'])
-            payload = Payload(**payload_data)
+        except Exception as e:
+            # Una escritura inválida no debe tumbar al resto: se reintentan de a una. Las
+            # particiones creadas en la transacción fallida ya no existen
+            await db.rollback()
+            await self.partitions.load(db)
+            self._failed_commits += 1
+            self.logger.warning(f"Group commit of {len(batch)} writes failed, retrying individually: {str(e)}")
+            
+            for sql, params, new_event, future in batch:
+                try:
+                    rowcount = await self._execute_write(db, sql, params, new_event)
+                    await db.commit()
+                    self._commits += 1
+                    self._committed_writes += 1
+                    if not future.done():
+                        future.set_result(rowcount)
+                except Exception as write_error:
+                    await db.rollback()
+                    await self.partitions.load(db)
+                    if not future.done():
+                        future.set_exception(write_error)
+            return
         
-        context = None
-        if row['context']:
-            context_data = json.loads(row['context'])
-            context = Context(**context_data)
+        self._commits += 1
+        self._committed_writes += len(batch)
+        for (_, _, _, future), rowcount in zip(batch, rowcounts):
+            if not future.done():
+                future.set_result(rowcount)
+    
+    async def _execute_write(self, db: aiosqlite.Connection, sql: str, params: tuple,
+                             new_event: Optional[Tuple[int, str]]) -> int:
+        if new_event is not None:
+            timestamp_ms, event_id = new_event
+            partition = await self.partitions.ensure(db, timestamp_ms)
+            # En la misma transacción que el insert: el índice global decide si es duplicado
+            cursor = await db.execute(f"""
+                INSERT INTO {EVENT_ID_INDEX} (event_id, partition) VALUES (?, ?)
+                ON CONFLICT(event_id) DO NOTHING
+            """, (event_id, partition.name))
+            if not cursor.rowcount:
+                return 0
+            
+            cursor = await db.execute(sql.format(table=partition.name), params)
+            return cursor.rowcount
         
-        return IntegrationEvent(
+        # Los cambios de estado afectan a un solo evento: se para en la primera partición
+        # que lo contiene, casi siempre la más reciente
+        for partition in self.partitions.ordered(descending=True):
+            cursor = await db.execute(sql.format(table=partition.name), params)
+            if cursor.rowcount:
+                return cursor.rowcount
+        return 0
+    
+    def _convert_row(self, row, projection: EventProjection) -> EventRecord:
+        if projection is EventProjection.EVENT:
+            return self._row_to_event(row)
+        return self._row_to_view(row, with_body=projection is EventProjection.VIEW)
+    
+    def _row_to_view(self, row, with_body: bool) -> EventView:
+        return EventView(
+            event_id=row['event_id'],
             event_type=EventType(row['event_type']),
             entity_type=EntityType(row['entity_type']),
-            event_id=row['event_id'],
             timestamp=datetime.fromisoformat(row['timestamp']),
-            source_system=source_system,
-            payload=payload,
-            context=context
-        )
\ No newline at end of file
+            status=row['status'],
+            retry_count=row['retry_count'],
+            last_error=row['last_error'],
+            next_attempt_at=datetime.fromtimestamp(row['next_attempt_at'] / 1000) if row['next_attempt_at'] else None,
+            # La fila se retiene hasta decodificarla: el cuerpo sigue siendo el blob sin tocar
+            loader=(lambda: self._row_to_event(row)) if with_body else None
+        )
+    
+    def _row_to_event(self, row) -> IntegrationEvent:
+        from ...domain.entities.integration_event import Context
+        
+        event = self.codec.decode_event(
+            row['body'], row['event_type'], row['entity_type'], row['event_id'], row['timestamp']
+        )
+        
+        # La columna es la fuente del contador de reintentos
+        if row['retry_count']:
+            event.context = event.context or Context()
+            event.context.retry_count = row['retry_count']
+        
+        return event
\ No newline at end of file
@@ -0,0 +1,147 @@
+import logging
+from typing import Dict, List, Optional
+from datetime import datetime
+import aiosqlite
+
+from ...domain.interfaces.external_id_repository import IExternalIdRepository
+from ...domain.entities.odoo_record import OdooRecord
+from .migrations import Migration, apply_migrations
+from .sqlite_database import SqliteDatabase
+
+
+async def _create_mirror_table(db: aiosqlite.Connection) -> None:
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS external_id_mirror (
+            external_id TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            res_id INTEGER NOT NULL,
+            write_date TEXT,
+            synced_at TEXT NOT NULL
+        )
+    """)
+    
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_external_id_mirror_record ON external_id_mirror(model, res_id)
+    """)
+
+
+EXTERNAL_ID_MIGRATIONS: List[Migration] = [
+    ('external_id_mirror_0001_create_table', _create_mirror_table)
+]
+
+
+class ExternalIdRepositoryImpl(IExternalIdRepository):
+    # Límite de parámetros por sentencia en SQLite
+    _MAX_VARIABLES = 500
+    
+    def __init__(self, db_path: str = "integration_events.db", database: Optional[SqliteDatabase] = None):
+        self.db_path = db_path
+        self.database = database or SqliteDatabase(db_path)
+        self.logger = logging.getLogger(__name__)
+        self._initialized = False
+    
+    async def _ensure_initialized(self):
+        if not self._initialized:
+            await self._initialize_database()
+            self._initialized = True
+    
+    async def _initialize_database(self):
+        try:
+            await apply_migrations(self.database, EXTERNAL_ID_MIGRATIONS)
+            self.logger.info(f"External ID mirror initialized at {self.db_path}")
+            
+        except Exception as e:
+            self.logger.error(f"Failed to initialize external ID mirror: {str(e)}")
+            raise
+    
+    async def find_by_external_ids(self, external_ids: List[str]) -> Dict[str, OdooRecord]:
+        try:
+            await self._ensure_initialized()
+            
+            unique_ids = list(dict.fromkeys(external_ids))
+            records: Dict[str, OdooRecord] = {}
+            
+            async with self.database.read() as db:
+                for start in range(0, len(unique_ids), self._MAX_VARIABLES):
+                    chunk = unique_ids[start:start + self._MAX_VARIABLES]
+                    placeholders = ','.join('?' for _ in chunk)
+                    cursor = await db.execute(f"""
+                        SELECT external_id, model, res_id FROM external_id_mirror
+                        WHERE external_id IN ({placeholders})
+                    """, chunk)
+                    
+                    for external_id, model, res_id in await cursor.fetchall():
+                        records[external_id] = OdooRecord(model=model, record_id=res_id, external_id=external_id)
+                
+            return records
+            
+        except Exception as e:
+            self.logger.error(f"Failed to find external IDs in mirror: {str(e)}")
+            return {}
+    
+    async def save_external_ids(self, records: List[OdooRecord], write_date: Optional[str] = None) -> bool:
+        try:
+            await self._ensure_initialized()
+            
+            now = datetime.now().isoformat()
+            write_date = write_date or datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            
+            async with self.database.transaction() as db:
+                await db.executemany("""
+                    INSERT OR REPLACE INTO external_id_mirror (external_id, model, res_id, write_date, synced_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [
+                    (record.external_id, record.model, record.record_id, record.values.get('write_date', write_date), now)
+                    for record in records
+                    if record.external_id and record.record_id
+                ])
+                
+            self.logger.debug(f"Saved {len(records)} external IDs to mirror")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Failed to save external IDs to mirror: {str(e)}")
+            return False
+    
+    async def delete_external_id(self, external_id: str) -> bool:
+        try:
+            await self._ensure_initialized()
+            
+            async with self.database.transaction() as db:
+                await db.execute("""
+                    DELETE FROM external_id_mirror WHERE external_id = ?
+                """, (external_id,))
+                
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Failed to delete external ID {external_id} from mirror: {str(e)}")
+            return False
+    
+    async def delete_by_record(self, model: str, record_id: int) -> bool:
+        try:
+            await self._ensure_initialized()
+            
+            async with self.database.transaction() as db:
+                await db.execute("""
+                    DELETE FROM external_id_mirror WHERE model = ? AND res_id = ?
+                """, (model, record_id))
+                
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Failed to delete external IDs of {model}.{record_id} from mirror: {str(e)}")
+            return False
+    
+    async def count_external_ids(self) -> int:
+        try:
+            await self._ensure_initialized()
+            
+            async with self.database.read() as db:
+                cursor = await db.execute("SELECT COUNT(*) FROM external_id_mirror")
+                row = await cursor.fetchone()
+                return row[0]
+                
+        except Exception as e:
+            self.logger.error(f"Failed to count external IDs in mirror: {str(e)}")
+            return 0
@@ -0,0 +1,46 @@
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, List, Sequence, Tuple
+import aiosqlite
+
+from .sqlite_database import SqliteDatabase
+
+
+# Una migración es (nombre único, función que recibe la conexión dentro de la transacción).
+# Los nombres llevan el prefijo del repositorio dueño de las tablas, porque varios
+# repositorios comparten el mismo archivo y cada uno aplica solo las suyas
+Migration = Tuple[str, Callable[[aiosqlite.Connection], Awaitable[None]]]
+
+logger = logging.getLogger(__name__)
+
+
+async def apply_migrations(database: SqliteDatabase, migrations: Sequence[Migration]) -> List[str]:
+    """
+    Aplica en orden las migraciones que aún no figuran en schema_migrations
+    """
+    async with database.transaction() as db:
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TEXT NOT NULL
+            )
+        """)
+    
+    applied = []
+    for name, migrate in migrations:
+        # Cada migración corre en su propia transacción inmediata y vuelve a comprobar
+        # si ya está aplicada, por si otro proceso la aplicó mientras tanto
+        async with database.transaction(immediate=True) as db:
+            cursor = await db.execute("SELECT 1 FROM schema_migrations WHERE name = ?", (name,))
+            if await cursor.fetchone():
+                continue
+            
+            await migrate(db)
+            await db.execute("""
+                INSERT INTO schema_migrations (name, applied_at) VALUES (?, ?)
+            """, (name, datetime.now().isoformat()))
+        
+        logger.info(f"Applied migration {name}")
+        applied.append(name)
+    
+    return applied
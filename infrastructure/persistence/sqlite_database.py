@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+import aiosqlite
+
+
+# Perfil por defecto: WAL permite leer mientras se escribe y synchronous=NORMAL
+# solo sincroniza en los checkpoints, suficiente con WAL para no corromper la base
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,  # 256 MB
+    'cache_size': -65536,  # en KiB: 64 MB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000
+}
+
+# Pragmas que modifican el archivo y no pueden aplicarse desde una conexión de solo lectura
+WRITE_ONLY_PRAGMAS = {'journal_mode', 'synchronous'}
+
+
+class SqliteDatabase:
+    def __init__(self, db_path: str = "integration_events.db", read_pool_size: int = 4,
+                 pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.read_pool_size = max(1, read_pool_size)
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.logger = logging.getLogger(__name__)
+        
+        # Una sola conexión de escritura: SQLite serializa las escrituras de todos modos,
+        # así que el lock solo evita que dos transacciones se mezclen en la misma conexión
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_lock = asyncio.Lock()
+        self.write_lock = asyncio.Lock()
+        
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: asyncio.Queue = asyncio.Queue()
+        self._readers_lock = asyncio.Lock()
+    
+    async def writer(self) -> aiosqlite.Connection:
+        """
+        Devuelve la conexión de escritura, abriéndola la primera vez
+        """
+        if self._writer is None:
+            async with self._writer_lock:
+                if self._writer is None:
+                    connection = await aiosqlite.connect(self.db_path)
+                    connection.row_factory = aiosqlite.Row
+                    await self._apply_pragmas(connection, read_only=False)
+                    self._writer = connection
+                    self.logger.info(f"Opened SQLite database at {self.db_path} with pragmas {self.pragmas}")
+        
+        return self._writer
+    
+    @asynccontextmanager
+    async def transaction(self, immediate: bool = False) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Ejecuta una transacción de escritura: commit al salir, rollback si hay error
+        
+        Con immediate=True se toma el lock de escritura del archivo al empezar, lo que
+        además incluye las sentencias DDL en la transacción
+        """
+        db = await self.writer()
+        
+        async with self.write_lock:
+            try:
+                if immediate:
+                    await db.execute("BEGIN IMMEDIATE")
+                yield db
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+    
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Presta una conexión de solo lectura del pool
+        """
+        connection = await self._acquire_reader()
+        try:
+            yield connection
+        finally:
+            self._idle_readers.put_nowait(connection)
+    
+    async def close(self) -> None:
+        for connection in self._readers:
+            await connection.close()
+        self._readers = []
+        self._idle_readers = asyncio.Queue()
+        
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+    
+    async def _acquire_reader(self) -> aiosqlite.Connection:
+        if self._idle_readers.empty() and len(self._readers) < self.read_pool_size:
+            async with self._readers_lock:
+                if len(self._readers) < self.read_pool_size:
+                    # El archivo debe existir antes de abrirlo en modo solo lectura
+                    await self.writer()
+                    
+                    uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+                    connection = await aiosqlite.connect(uri, uri=True)
+                    connection.row_factory = aiosqlite.Row
+                    await self._apply_pragmas(connection, read_only=True)
+                    self._readers.append(connection)
+                    return connection
+        
+        return await self._idle_readers.get()
+    
+    async def _apply_pragmas(self, connection: aiosqlite.Connection, read_only: bool) -> None:
+        for name, value in self.pragmas.items():
+            if read_only and name in WRITE_ONLY_PRAGMAS:
+                continue
+            await connection.execute(f"PRAGMA {name} = {value}")
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import threading
 from typing import Callable, Optional, Any
 from signalrcore.hub_connection_builder import HubConnectionBuilder
 from signalrcore.messages.completion_message import CompletionMessage
@@ -9,11 +10,17 @@ from ...domain.entities.integration_event import IntegrationEvent
 
 
 class SignalRClientImpl(ISignalRClient):
-    def __init__(self):
+    def __init__(self, hold_timeout: float = 30.0):
         self.connection = None
         self.url: Optional[str] = None
         self.subscription_id: Optional[str] = None
         self.is_listening = False
+        self.is_consumption_paused = False
+        # Pausado, el hilo de signalrcore espera aquí antes de entregar cada evento: deja
+        # de leer del socket y los mensajes quedan retenidos en lugar de perderse
+        self.hold_timeout = hold_timeout
+        self._consumption_allowed = threading.Event()
+        self._consumption_allowed.set()
         self.logger = logging.getLogger(__name__)
         
         self.event_received_handlers = []
@@ -118,8 +125,32 @@ class SignalRClientImpl(ISignalRClient):
     
     async def stop_listening(self) -> None:
         self.is_listening = False
+        self._consumption_allowed.set()
         self.logger.info("Stopped listening for SignalR events")
     
+    async def pause_listening(self) -> bool:
+        # Se sigue en el grupo del tenant: el hub no guarda los mensajes de grupo para
+        # conexiones fuera de él, así que salir perdería todo lo publicado en la pausa
+        if self.is_consumption_paused:
+            return False
+        
+        self.is_consumption_paused = True
+        self._consumption_allowed.clear()
+        self.logger.warning("Paused SignalR event consumption")
+        return True
+    
+    async def resume_listening(self) -> bool:
+        if not self.is_consumption_paused:
+            return False
+        
+        self.is_consumption_paused = False
+        self._consumption_allowed.set()
+        self.logger.info("Resumed SignalR event consumption")
+        return True
+    
+    def is_paused(self) -> bool:
+        return self.is_consumption_paused
+    
     def _setup_connection_handlers(self):
         if not self.connection:
             return
@@ -134,6 +165,11 @@ class SignalRClientImpl(ISignalRClient):
             if not self.is_listening:
                 return
             
+            # Espera acotada: retener el hilo demasiado tiempo haría que el hub cerrase la
+            # conexión por falta de keep-alive; vencida, el evento se entrega igualmente
+            if not self._consumption_allowed.wait(timeout=self.hold_timeout):
+                self.logger.warning(f"SignalR consumption still paused after {self.hold_timeout}s, delivering event")
+            
             self.logger.debug(f"Received SignalR event: {event_data}")
             
             if isinstance(event_data, list) and len(event_data) > 0:
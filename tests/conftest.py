@@ -0,0 +1,9 @@
+import sys
+import types
+from pathlib import Path
+
+# Los módulos del repositorio usan imports relativos entre capas, así que el repositorio
+# se registra como paquete para poder importarlos desde los tests
+adapter = types.ModuleType('adapter')
+adapter.__path__ = [str(Path(__file__).resolve().parent.parent)]
+sys.modules.setdefault('adapter', adapter)
@@ -0,0 +1,120 @@
+"""
+Cola persistente del EventHandler
+
+El reclamador llena los carriles solo hasta la marca baja, de modo que un backlog en la
+base no activa la contrapresión, y lo reclamado cuyo procesamiento falla vuelve a
+reclamarse cuando vence su lease.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from adapter.application.handlers.event_handler import EventHandler
+from adapter.domain.entities.integration_event import IntegrationEvent
+from adapter.domain.entities.odoo_record import OdooSyncResult
+from adapter.infrastructure.persistence.event_repository_impl import EventRepositoryImpl
+
+
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_event(index: int) -> IntegrationEvent:
+    return IntegrationEvent.from_dict({
+        'event_type': 'Update',
+        'entity_type': 'Product',
+        'event_id': f"evt-{index}",
+        'timestamp': (BASE + timedelta(seconds=index)).isoformat(),
+        'payload': {'data': {'id': index}}
+    })
+
+
+class RecordingService:
+    """
+    Sustituto del IntegrationService: registra los eventos recibidos y los marca
+    procesados, salvo los de fail_once la primera vez, que fallan sin cambiar de estado
+    """
+    
+    def __init__(self, event_repository: EventRepositoryImpl, fail_once=()):
+        self.event_repository = event_repository
+        self.received = []
+        self.fail_once = set(fail_once)
+        self.gate = asyncio.Event()
+        self.gate.set()
+    
+    async def process_integration_events(self, events, persisted=False):
+        await self.gate.wait()
+        self.received.extend(event.event_id for event in events)
+        if self.fail_once & {event.event_id for event in events}:
+            self.fail_once.clear()
+            raise RuntimeError("Odoo unavailable")
+        
+        for event in events:
+            await self.event_repository.mark_event_as_processed(event.event_id)
+        return {event.event_id: OdooSyncResult(success=True) for event in events}
+
+
+async def run_handler(service, handler, until, timeout: float = 10) -> None:
+    processing = asyncio.create_task(handler.start_processing())
+    try:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not until() and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.01)
+    finally:
+        service.gate.set()
+        await handler.stop_processing(drain_timeout=5)
+        await processing
+
+
+def test_claimer_fills_lanes_only_up_to_the_low_watermark(tmp_path):
+    async def main():
+        repository = EventRepositoryImpl(str(tmp_path / 'events.db'))
+        for index in range(300):
+            await repository.enqueue_event(make_event(index))
+        
+        service = RecordingService(repository)
+        service.gate.clear()
+        handler = EventHandler(service, max_concurrent_events=4, batch_size=10, queue_max_size=100,
+                               durable_queue=True, claim_interval=0.05)
+        transitions = []
+        handler.on_backpressure_changed(transitions.append)
+        
+        depths = []
+        
+        def sample():
+            depths.append(handler.get_queue_size())
+            return len(depths) > 30
+        
+        await run_handler(service, handler, sample)
+        pending = await repository.get_pending_events(limit=1000)
+        await repository.close()
+        return handler, transitions, depths, service.received, pending
+    
+    handler, transitions, depths, received, pending = asyncio.run(main())
+    
+    assert max(depths) == handler.low_watermark == 50
+    assert transitions == []
+    # Lo reclamado y no procesado se devuelve a pending al detenerse
+    assert len(received) + len(pending) == 300
+
+
+def test_failed_claimed_events_are_reclaimed_after_lease_expiry(tmp_path):
+    async def main():
+        repository = EventRepositoryImpl(str(tmp_path / 'events.db'))
+        for index in range(5):
+            await repository.enqueue_event(make_event(index))
+        
+        service = RecordingService(repository, fail_once={'evt-0'})
+        handler = EventHandler(service, max_concurrent_events=1, batch_size=10, batch_linger_ms=0,
+                               durable_queue=True, lease_seconds=0.3, claim_interval=0.05)
+        
+        await run_handler(service, handler, lambda: len(service.received) >= 10)
+        pending = await repository.get_pending_events(limit=10)
+        await repository.close()
+        return service.received, pending
+    
+    received, pending = asyncio.run(main())
+    
+    # El lote que falló sigue en processing y el heartbeat no lo renueva: al vencer su
+    # lease se reclama y se procesa otra vez, en el mismo orden
+    assert received == [f"evt-{index}" for index in range(5)] * 2
+    assert pending == []
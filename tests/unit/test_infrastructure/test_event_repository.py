@@ -0,0 +1,223 @@
+"""
+Comportamiento del almacén de eventos
+
+Cubre la cola persistente (reclamo bajo lease, vencimiento y renovación), el group
+commit de las escrituras y la rotación de particiones con su índice global de event_ids.
+"""
+
+import asyncio
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+from adapter.domain.entities.integration_event import IntegrationEvent
+from adapter.infrastructure.persistence.event_partitions import EVENT_ID_INDEX, RETAINED_PARTITION
+from adapter.infrastructure.persistence.event_repository_impl import EventRepositoryImpl
+
+
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)  # lunes: inicio de una partición semanal
+
+
+def make_event(event_id: str, timestamp: datetime = BASE) -> IntegrationEvent:
+    return IntegrationEvent.from_dict({
+        'event_type': 'Update',
+        'entity_type': 'Product',
+        'event_id': event_id,
+        'timestamp': timestamp.isoformat(),
+        'payload': {'data': {'id': event_id}}
+    })
+
+
+def run(db_path: str, scenario, **options):
+    """
+    Ejecuta un escenario contra un repositorio nuevo y lo cierra aunque falle
+    """
+    async def main():
+        repository = EventRepositoryImpl(db_path, **options)
+        try:
+            return await scenario(repository)
+        finally:
+            await repository.close()
+    
+    return asyncio.run(main())
+
+
+def query(db_path: str, sql: str, params: tuple = ()) -> list:
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute(sql, params).fetchall()
+    finally:
+        connection.close()
+
+
+def test_claimed_events_are_not_claimed_again_until_the_lease_expires(tmp_path):
+    async def scenario(repository):
+        for index in range(3):
+            await repository.enqueue_event(make_event(f"evt-{index}", BASE + timedelta(seconds=index)))
+        
+        first = await repository.claim_events('owner-a', limit=2, lease_seconds=0.2)
+        second = await repository.claim_events('owner-b', limit=10, lease_seconds=0.2)
+        await asyncio.sleep(0.3)
+        reclaimed = await repository.claim_events('owner-b', limit=10, lease_seconds=60)
+        return first, second, reclaimed
+    
+    first, second, reclaimed = run(str(tmp_path / 'events.db'), scenario)
+    
+    assert [event.event_id for event in first] == ['evt-0', 'evt-1']
+    assert [event.event_id for event in second] == ['evt-2']
+    # Vencido el lease, las filas vuelven a reclamarse en orden, sea cual sea su dueño
+    assert [event.event_id for event in reclaimed] == ['evt-0', 'evt-1', 'evt-2']
+
+
+def test_extend_leases_renews_only_the_given_events(tmp_path):
+    async def scenario(repository):
+        for index in range(2):
+            await repository.enqueue_event(make_event(f"evt-{index}", BASE + timedelta(seconds=index)))
+        
+        await repository.claim_events('owner-a', limit=2, lease_seconds=0.2)
+        extended = await repository.extend_leases('owner-a', ['evt-1'], lease_seconds=60)
+        # Otro dueño no prorroga leases ajenos
+        foreign = await repository.extend_leases('owner-b', ['evt-0'], lease_seconds=60)
+        await asyncio.sleep(0.3)
+        reclaimed = await repository.claim_events('owner-b', limit=10, lease_seconds=60)
+        return extended, foreign, reclaimed
+    
+    extended, foreign, reclaimed = run(str(tmp_path / 'events.db'), scenario)
+    
+    assert (extended, foreign) == (1, 0)
+    assert [event.event_id for event in reclaimed] == ['evt-0']
+
+
+def test_release_events_returns_claimed_rows_to_pending(tmp_path):
+    async def scenario(repository):
+        await repository.enqueue_event(make_event('evt-0'))
+        await repository.claim_events('owner-a', limit=10, lease_seconds=60)
+        released = await repository.release_events('owner-a')
+        reclaimed = await repository.claim_events('owner-b', limit=10, lease_seconds=60)
+        return released, reclaimed
+    
+    released, reclaimed = run(str(tmp_path / 'events.db'), scenario)
+    
+    assert released == 1
+    assert [event.event_id for event in reclaimed] == ['evt-0']
+
+
+def test_requeue_failed_events_only_takes_events_still_failed(tmp_path):
+    async def scenario(repository):
+        for index in range(3):
+            await repository.enqueue_event(make_event(f"evt-{index}", BASE + timedelta(seconds=index)))
+        await repository.mark_event_as_failed('evt-0', 'Odoo unavailable', retry_count=1)
+        await repository.mark_event_as_failed('evt-1', 'Odoo unavailable', retry_count=0,
+                                              next_attempt_at=datetime.now() + timedelta(hours=1))
+        
+        requeued = await repository.requeue_failed_events(['evt-0', 'evt-1', 'evt-2'])
+        # Ya reencolados: una segunda petición no los toma otra vez
+        again = await repository.requeue_failed_events(['evt-0', 'evt-1'])
+        return requeued, again
+    
+    requeued, again = run(str(tmp_path / 'events.db'), scenario)
+    
+    assert [(event.event_id, event.context.retry_count) for event in requeued] == [('evt-0', 2), ('evt-1', 1)]
+    assert again == []
+
+
+def test_lone_write_commits_without_waiting_for_the_group_interval(tmp_path):
+    async def scenario(repository):
+        await repository.enqueue_event(make_event('evt-0'))
+        
+        started_at = time.monotonic()
+        for _ in range(5):
+            await repository.mark_event_as_processed('evt-0')
+        return time.monotonic() - started_at, repository.get_metrics()
+    
+    elapsed, metrics = run(str(tmp_path / 'events.db'), scenario, group_commit_interval_ms=1000)
+    
+    # Cada escritura secuencial se confirma sola: esperar el intervalo costaría 5 s
+    assert elapsed < 2
+    assert metrics['commits'] == metrics['committed_writes'] == 6
+
+
+def test_concurrent_writes_share_commits(tmp_path):
+    async def scenario(repository):
+        results = await asyncio.gather(*(
+            repository.enqueue_event(make_event(f"evt-{index}", BASE + timedelta(seconds=index)))
+            for index in range(50)
+        ))
+        return results, repository.get_metrics()
+    
+    db_path = str(tmp_path / 'events.db')
+    results, metrics = run(db_path, scenario)
+    
+    assert all(results)
+    assert metrics['committed_writes'] == 50
+    assert metrics['commits'] < 50
+    assert len(query(db_path, f"SELECT event_id FROM {EVENT_ID_INDEX}")) == 50
+
+
+def test_redelivery_in_another_partition_is_a_duplicate(tmp_path):
+    async def scenario(repository):
+        await repository.save_event(make_event('evt-0'))
+        await repository.mark_event_as_processed('evt-0')
+        # La reentrega trae otra fecha y caería en la partición de otra semana
+        await repository.save_event(make_event('evt-0', BASE + timedelta(days=10)))
+        return await repository.get_event_by_id('evt-0'), repository.get_metrics()
+    
+    event, metrics = run(str(tmp_path / 'events.db'), scenario)
+    
+    assert event.timestamp == BASE
+    assert metrics['duplicate_events'] == 1
+
+
+def test_cleanup_drops_expired_partitions_and_keeps_open_events(tmp_path):
+    async def scenario(repository):
+        await repository.save_event(make_event('evt-done'))
+        await repository.mark_event_as_processed('evt-done')
+        await repository.save_event(make_event('evt-open'))
+        await repository.save_event(make_event('evt-next', BASE + timedelta(days=7)))
+        
+        dropped = await repository.cleanup_old_events(BASE + timedelta(days=7))
+        # El evento procesado y eliminado vuelve a aceptarse; el abierto sigue deduplicado
+        await repository.save_event(make_event('evt-done', BASE + timedelta(days=7)))
+        await repository.save_event(make_event('evt-open', BASE + timedelta(days=7)))
+        return dropped, repository.get_metrics()
+    
+    db_path = str(tmp_path / 'events.db')
+    dropped, metrics = run(db_path, scenario)
+    
+    assert dropped == 1
+    assert metrics['dropped_partitions'] == 1
+    assert metrics['duplicate_events'] == 1
+    assert query(db_path, f"SELECT event_id, status FROM {RETAINED_PARTITION}") == [('evt-open', 'pending')]
+    assert dict(query(db_path, f"SELECT event_id, partition FROM {EVENT_ID_INDEX}")) == {
+        'evt-open': RETAINED_PARTITION,
+        'evt-next': 'integration_events_20240108',
+        'evt-done': 'integration_events_20240108'
+    }
+
+
+def test_cleanup_keeps_a_partition_whose_open_events_clash_with_retained_ones(tmp_path):
+    db_path = str(tmp_path / 'events.db')
+    
+    async def prepare(repository):
+        await repository.save_event(make_event('evt-old'))
+        await repository.save_event(make_event('evt-clash', BASE + timedelta(days=7)))
+        # Deja creada la partición retenida con evt-old abierto
+        await repository.cleanup_old_events(BASE + timedelta(days=7))
+    
+    run(db_path, prepare)
+    
+    # Una base anterior al índice global pudo guardar el mismo event_id en dos particiones
+    connection = sqlite3.connect(db_path)
+    connection.execute(f"""
+        INSERT INTO {RETAINED_PARTITION}
+        (event_id, event_type, entity_type, timestamp, timestamp_ms, status, created_at, updated_at)
+        VALUES ('evt-clash', 'Update', 'Product', '', 0, 'failed', '', '')
+    """)
+    connection.commit()
+    connection.close()
+    
+    async def cleanup(repository):
+        return await repository.cleanup_old_events(BASE + timedelta(days=14))
+    
+    assert run(db_path, cleanup) == 0
+    assert query(db_path, "SELECT event_id, status FROM integration_events_20240108") == [('evt-clash', 'pending')]
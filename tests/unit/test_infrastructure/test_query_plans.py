@@ -0,0 +1,235 @@
+"""
+Planes de consulta del almacén de eventos
+
+Ejecuta las operaciones de EventRepositoryImpl sobre una partición con filas, captura con
+set_trace_callback las sentencias que realmente emite y pasa cada una por EXPLAIN QUERY
+PLAN: deben usar su índice, sin recorrer la partición completa ni ordenar en un B-tree
+temporal. Así, cambiar una consulta del repositorio sin su índice hace fallar el test.
+"""
+
+import asyncio
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import pytest
+
+from adapter.domain.entities.integration_event import IntegrationEvent
+from adapter.infrastructure.persistence.event_partitions import LEGACY_PARTITION
+from adapter.infrastructure.persistence.event_repository_impl import EVENT_MIGRATIONS, EventRepositoryImpl
+from adapter.infrastructure.persistence.migrations import apply_migrations
+from adapter.infrastructure.persistence.sqlite_database import SqliteDatabase
+
+
+ROWS = 20000
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)  # lunes: toda la carga cae en una partición semanal
+BASE_MS = int(BASE.timestamp() * 1000)
+
+# Índices que deben aparecer en los planes de las sentencias de cada operación;
+# {table} es la partición de prueba
+EXPECTED_INDEXES = {
+    'get_pending_events': ['idx_{table}_pending'],
+    'get_failed_events': ['idx_{table}_failed'],
+    'get_events_by_entity_type': ['idx_{table}_entity_time'],
+    'get_event_by_id': ['sqlite_autoindex_{table}_1'],
+    'get_event_statuses': ['sqlite_autoindex_{table}_1'],
+    'iter_pending': ['idx_{table}_pending'],
+    'iter_failed': ['idx_{table}_failed'],
+    'get_events_since': ['idx_{table}_entity_time'],
+    'claim_events': ['idx_{table}_pending', 'idx_{table}_lease'],
+    'extend_leases': ['sqlite_autoindex_{table}_1'],
+    'release_events': ['idx_{table}_lease'],
+    'requeue_failed_events': ['sqlite_autoindex_{table}_1'],
+    'requeue_due_retries': ['idx_{table}_retry_due'],
+    'get_next_retry_at': ['idx_{table}_retry_due'],
+    'mark_event_as_processed': ['sqlite_autoindex_{table}_1'],
+    'cleanup_old_events': ['idx_{table}_open']
+}
+
+# claim_events une las dos ramas, ya limitadas por sus índices, y las ordena en
+# memoria: como mucho 2 * limit filas
+ALLOWED_TEMP_SORTS = {'claim_events'}
+
+# Índices que la migración 0003 sustituyó por los parciales
+REMOVED_INDEXES = ['idx_event_id', 'idx_status', 'idx_entity_type', 'idx_timestamp', 'idx_events_entity_timestamp']
+
+QUERY_KEYWORDS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+
+class PlanRecorder:
+    """
+    Callback de traza que explica cada sentencia en el momento en que se ejecuta, antes
+    de que una limpieza posterior elimine la partición
+    """
+    
+    def __init__(self, db_path: str):
+        self.explain = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.operation = None
+        self.plans: Dict[str, List[Tuple[str, List[str]]]] = {}
+    
+    def __call__(self, statement: str) -> None:
+        if self.operation is None or not statement.lstrip().upper().startswith(QUERY_KEYWORDS):
+            return
+        
+        with self.lock:
+            try:
+                plan = [row[3] for row in self.explain.execute(f"EXPLAIN QUERY PLAN {statement}")]
+            except sqlite3.Error as e:
+                plan = [f"EXPLAIN failed: {e}"]
+            self.plans.setdefault(self.operation, []).append((statement, plan))
+
+
+def populate(db_path: str, table: str, rows: int) -> None:
+    """
+    Carga filas con la proporción típica de estados para que ANALYZE tenga estadísticas realistas
+    """
+    connection = sqlite3.connect(db_path)
+    statuses = ['processed'] * 17 + ['pending', 'failed', 'processing']
+    connection.executemany(f"""
+        INSERT INTO {table}
+        (event_id, event_type, entity_type, timestamp, timestamp_ms, status, next_attempt_at,
+         lease_owner, lease_expires_at, created_at, updated_at)
+        VALUES (?, 'Update', ?, ?, ?, ?, ?, ?, ?, '', '')
+    """, [
+        (f"evt-{index}", ['Product', 'User', 'Invoice'][index % 3],
+         (BASE + timedelta(seconds=index)).isoformat(), BASE_MS + index * 1000,
+         statuses[index % len(statuses)],
+         BASE_MS + index * 1000 if statuses[index % len(statuses)] == 'failed' else None,
+         'other-owner' if statuses[index % len(statuses)] == 'processing' else None,
+         0 if statuses[index % len(statuses)] == 'processing' else None)
+        for index in range(rows)
+    ])
+    connection.commit()
+    connection.execute("ANALYZE")
+    connection.close()
+
+
+async def take(iterator, count: int) -> None:
+    # Suficientes filas para pedir páginas siguientes por keyset
+    taken = 0
+    async for _ in iterator:
+        taken += 1
+        if taken >= count:
+            break
+    await iterator.aclose()
+
+
+async def record_plans(db_path: str) -> Tuple[str, Dict[str, List[Tuple[str, List[str]]]]]:
+    repository = EventRepositoryImpl(db_path)
+    # El primer evento aplica las migraciones y crea la partición de su semana; la de dos
+    # semanas antes vence en la primera limpieza y deja creada la partición retenida, como
+    # en una base en uso
+    for event_id, timestamp in (('evt-seed', BASE), ('evt-expired', BASE - timedelta(days=14))):
+        await repository.save_event(IntegrationEvent.from_dict({
+            'event_type': 'Update',
+            'entity_type': 'Product',
+            'event_id': event_id,
+            'timestamp': timestamp.isoformat()
+        }))
+    await repository.cleanup_old_events(BASE - timedelta(days=7))
+    await repository.close()
+    
+    connection = sqlite3.connect(db_path)
+    table = connection.execute("SELECT name FROM event_partitions WHERE start_ms = ?", (BASE_MS,)).fetchone()[0]
+    connection.close()
+    populate(db_path, table, ROWS)
+    
+    recorder = PlanRecorder(db_path)
+    # Un solo lector: todas las conexiones del repositorio quedan trazadas
+    database = SqliteDatabase(db_path, read_pool_size=1)
+    repository = EventRepositoryImpl(db_path, group_commit_interval_ms=0, database=database)
+    await (await database.writer()).set_trace_callback(recorder)
+    async with database.read() as db:
+        await db.set_trace_callback(recorder)
+    
+    operations = [
+        ('get_pending_events', lambda: repository.get_pending_events(limit=100)),
+        ('get_failed_events', lambda: repository.get_failed_events(limit=100)),
+        ('get_events_by_entity_type', lambda: repository.get_events_by_entity_type('Product', limit=100)),
+        ('get_event_by_id', lambda: repository.get_event_by_id('evt-1')),
+        ('get_event_statuses', lambda: repository.get_event_statuses(['evt-1', 'evt-2'])),
+        ('iter_pending', lambda: take(repository.iter_pending(page_size=100), 250)),
+        ('iter_failed', lambda: take(repository.iter_failed(page_size=100), 250)),
+        ('get_events_since', lambda: take(repository.get_events_since('Product', BASE, page_size=100), 250)),
+        ('claim_events', lambda: repository.claim_events('plans', limit=10, lease_seconds=60)),
+        ('extend_leases', lambda: repository.extend_leases('plans', ['plans-1', 'plans-2'], lease_seconds=60)),
+        ('release_events', lambda: repository.release_events('plans')),
+        ('requeue_failed_events', lambda: repository.requeue_failed_events(['evt-18', 'evt-38'])),
+        ('requeue_due_retries', lambda: repository.requeue_due_retries(limit=100)),
+        ('get_next_retry_at', lambda: repository.get_next_retry_at()),
+        ('mark_event_as_processed', lambda: repository.mark_event_as_processed('evt-2')),
+        ('cleanup_old_events', lambda: repository.cleanup_old_events(BASE + timedelta(days=30)))
+    ]
+    for operation, call in operations:
+        recorder.operation = operation
+        await call()
+        recorder.operation = None
+    
+    await repository.close()
+    await database.close()
+    recorder.explain.close()
+    return table, recorder.plans
+
+
+@pytest.fixture(scope='module')
+def recorded_plans(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp('plans') / 'plans.db')
+    return asyncio.run(record_plans(db_path))
+
+
+@pytest.mark.parametrize('operation', list(EXPECTED_INDEXES))
+def test_repository_queries_use_indexes(recorded_plans, operation):
+    table, plans = recorded_plans
+    # Solo interesan las sentencias sobre la partición cargada, no las del catálogo
+    statements = [(sql, plan) for sql, plan in plans.get(operation, []) if re.search(rf"\b{table}\b", sql)]
+    assert statements, f"{operation} issued no statement on {table}"
+    
+    steps = [step for _, plan in statements for step in plan]
+    for index in EXPECTED_INDEXES[operation]:
+        index = index.format(table=table)
+        assert any(index in step for step in steps), f"{operation}: expected {index} in {steps}"
+    
+    for sql, plan in statements:
+        full_scans = [step for step in plan if step.startswith(f"SCAN {table}") and 'INDEX' not in step]
+        assert not full_scans, f"{operation}: full table scan in {plan}\n{sql}"
+        if operation not in ALLOWED_TEMP_SORTS:
+            assert not any('TEMP B-TREE' in step for step in plan), f"{operation}: sort in temp b-tree in {plan}\n{sql}"
+
+
+def test_migrated_legacy_table_drops_redundant_indexes(tmp_path):
+    db_path = str(tmp_path / 'legacy.db')
+    
+    async def migrate():
+        # Una base con datos anteriores al particionado conserva su tabla como primera partición
+        database = SqliteDatabase(db_path)
+        await apply_migrations(database, [
+            migration for migration in EVENT_MIGRATIONS if migration[0] < 'integration_events_0007'
+        ])
+        async with database.transaction() as db:
+            await db.execute("""
+                INSERT INTO integration_events
+                (event_id, event_type, entity_type, timestamp, timestamp_ms, status, created_at, updated_at)
+                VALUES ('evt-legacy', 'Update', 'Product', ?, ?, 'pending', '', '')
+            """, (BASE.isoformat(), BASE_MS))
+        await database.close()
+        
+        repository = EventRepositoryImpl(db_path)
+        pending = await repository.get_pending_events(limit=10)
+        await repository.close()
+        return pending
+    
+    pending = asyncio.run(migrate())
+    assert [event.event_id for event in pending] == ['evt-legacy']
+    
+    connection = sqlite3.connect(db_path)
+    partitions = [row[0] for row in connection.execute("SELECT name FROM event_partitions")]
+    indexes = {row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (LEGACY_PARTITION,)
+    )}
+    connection.close()
+    
+    assert partitions == [LEGACY_PARTITION]
+    assert not indexes & set(REMOVED_INDEXES)